@@ -0,0 +1,315 @@
+'''Headless drift monitor of the registry check.
+
+Rescans the registry every `interval` seconds with a CompareSession, so the
+result files of the GUI (result_reg_data.json, compared_result_reg_data.json
+and redundant_data.json in the data folder) stay current without anyone
+pressing Compare, and appends every status change to a change feed, one JSON
+object per line:
+
+    {"time": "2024-05-02T10:15:00", "file": "result_reg_data.json",
+     "key": "Software\\\\...\\\\Port", "from": "Pass", "to": "Fail"}
+
+"from" is null for a result that is new (a new redundant key) and "to" is null
+for one that is gone. The first check with no earlier results for the golden
+file writes one "baseline" line with the status counts instead.
+
+Rescans are cheap when little changed: the scan reuses the keys whose last
+write time is unchanged (registry_scan_cache.py), the session only compares
+the keys that changed, and only the result files that changed are compared
+for status changes. The monitor thread runs at below normal priority.
+
+After every check drift_monitor.json in the data folder records the golden
+file and scan profile the results are for, when they were made and the size
+and modification time of each result file the check left; the GUI shows those
+results without comparing again while they are fresh and the result files are
+still the ones the monitor left (see results_fresh).
+
+The scan source is pluggable: profile_source reads through the winreg module or
+a stand-in with the same functions, and --fake-registry reads a
+fake_registry.py JSON file again for every scan.
+
+Usage:
+    python drift_monitor.py GOLDEN_FILE [--interval 300] [--data-folder data] [--machine-type MicroAOI]
+                            [--profiles scan_profiles.json] [--feed drift_feed.jsonl]
+                            [--fake-registry registry.json] [--once]
+'''
+
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+
+from registry_compare import CompareSession, file_stamp
+from registry_scan_cache import cache_file_name, load_scan_cache
+from registry_walker import print_error
+from scan_profiles import DEFAULT_PROFILE, ScanProfiles, load_scan_profiles
+
+STATE_FILE = "drift_monitor.json"
+FEED_FILE = "drift_feed.jsonl"
+# Session attribute of every result file
+RESULT_FILES = {
+    "result_reg_data.json": 'result_reg_data',
+    "compared_result_reg_data.json": 'compared_result_reg_data',
+    "redundant_data.json": 'redundant_data',
+}
+# Results made no longer ago than this many intervals are shown by the GUI as they are
+FRESH_INTERVALS = 2
+
+THREAD_PRIORITY_BELOW_NORMAL = -1
+
+
+# Lower the priority of the calling thread, where the platform allows it
+def lower_thread_priority():
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_BELOW_NORMAL)
+    except (ImportError, AttributeError, OSError):
+        # Linux sets the nice value per thread
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+
+
+# Entries of a scan profile's roots, read like iter_installed_registry of main.py from the backend
+# open_backend() returns for each scan. With a cache_folder the keys are cached by last write time
+# between scans.
+def profile_source(open_backend, profile, cache_folder=None, on_error=print_error):
+    caches = {}
+
+    def read_registry():
+        backend = open_backend()
+        for root in profile.roots:
+            cache = None
+            if cache_folder is not None:
+                if root.name not in caches:
+                    caches[root.name] = load_scan_cache(os.path.join(cache_folder, cache_file_name(root.name)),
+                                                        root.name)
+                cache = caches[root.name]
+                cache.begin()
+            try:
+                yield from root.scan(backend, cache=cache, on_error=on_error)
+                # Only a scan that read every key replaces the cache
+                if cache is not None:
+                    cache.finish()
+            except Exception as e:
+                on_error(f"Error: {e}")
+
+    return read_registry
+
+
+# Result key -> status of every result file
+def result_statuses(session, file_names=RESULT_FILES):
+    return {file_name: {result_key: result.get('Status')
+                        for result_key, result in getattr(session, RESULT_FILES[file_name]).items()}
+            for file_name in file_names}
+
+
+# Feed lines of the results whose status changed between two result_statuses
+def status_transitions(previous, current, checked):
+    transitions = []
+    for file_name, statuses in current.items():
+        previous_statuses = previous.get(file_name, {})
+        for result_key, status in statuses.items():
+            previous_status = previous_statuses.get(result_key)
+            if previous_status != status:
+                transitions.append({'time': checked, 'file': file_name, 'key': result_key,
+                                    'from': previous_status, 'to': status})
+        for result_key, previous_status in previous_statuses.items():
+            if result_key not in statuses:
+                transitions.append({'time': checked, 'file': file_name, 'key': result_key,
+                                    'from': previous_status, 'to': None})
+    return transitions
+
+
+def status_counts(statuses):
+    counts = {}
+    for file_name, file_statuses in statuses.items():
+        file_counts = counts.setdefault(file_name, {})
+        for status in file_statuses.values():
+            file_counts[status] = file_counts.get(status, 0) + 1
+    return counts
+
+
+# file name -> [size, modification time] of the result files in data_folder, None for a missing file
+def result_stamps(data_folder):
+    stamps = {}
+    for file_name in RESULT_FILES:
+        stamp = file_stamp(os.path.join(data_folder, file_name))
+        stamps[file_name] = None if stamp is None else list(stamp)
+    return stamps
+
+
+def golden_stamp(golden_file):
+    stat = os.stat(golden_file)
+    return {'golden_file': os.path.abspath(golden_file), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def load_state(data_folder):
+    try:
+        with open(os.path.join(data_folder, STATE_FILE), 'r') as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+# The monitor state when the result files in data_folder are the ones its last check made for this
+# golden file and scan profile, else None
+def matching_state(data_folder, golden_file, profile_name):
+    state = load_state(data_folder)
+    if state is None or state.get('profile') != profile_name:
+        return None
+    try:
+        stamp = golden_stamp(golden_file)
+    except OSError:
+        return None
+    if any(state.get(name) != value for name, value in stamp.items()):
+        return None
+    # The GUI writes the same files when it compares, maybe with another golden file
+    stamps = result_stamps(data_folder)
+    if None in stamps.values() or state.get('results') != stamps:
+        return None
+    return state
+
+
+# True when the monitor made the result files in data_folder for this golden file and scan profile
+# no longer ago than FRESH_INTERVALS intervals
+def results_fresh(data_folder, golden_file, profile_name, now=None):
+    state = matching_state(data_folder, golden_file, profile_name)
+    if state is None:
+        return False
+    now = time.time() if now is None else now
+    return now - state.get('checked', 0) <= FRESH_INTERVALS * state.get('interval', 0)
+
+
+class DriftMonitor:
+    def __init__(self, session, interval=300.0, feed_file=None, profile_name=DEFAULT_PROFILE.name,
+                 on_error=print_error):
+        self.session = session
+        self.interval = interval
+        self.feed_file = feed_file if feed_file is not None else os.path.join(session.data_folder, FEED_FILE)
+        self.profile_name = profile_name
+        self.on_error = on_error
+        # Result key -> status of every result file after the last check, None before the first
+        self.statuses = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # Statuses of the result files the last check of an earlier run left for the same golden file and profile
+    def load_previous(self):
+        if matching_state(self.session.data_folder, self.session.golden_file, self.profile_name) is None:
+            return None
+        statuses = {}
+        for file_name in RESULT_FILES:
+            try:
+                with open(os.path.join(self.session.data_folder, file_name), 'r') as file:
+                    results = json.load(file)
+            except (OSError, ValueError):
+                return None
+            statuses[file_name] = {result_key: result.get('Status') for result_key, result in results.items()}
+        return statuses
+
+    # Rescan and compare once, returns the feed lines written
+    def check(self):
+        if self.statuses is None:
+            self.statuses = self.load_previous()
+
+        self.session.run()
+        checked = datetime.datetime.now().isoformat(timespec='seconds')
+        if self.statuses is None:
+            self.statuses = result_statuses(self.session)
+            lines = [{'time': checked, 'baseline': status_counts(self.statuses)}]
+        else:
+            # A result file that did not change has no status changes
+            changed = result_statuses(self.session, [file_name for file_name in RESULT_FILES
+                                                     if file_name in self.session.changed_files])
+            lines = status_transitions({name: self.statuses[name] for name in changed}, changed, checked)
+            self.statuses.update(changed)
+
+        self.append_feed(lines)
+        self.save_state()
+        return lines
+
+    def append_feed(self, lines):
+        if not lines:
+            return
+        with open(self.feed_file, 'a') as file:
+            for line in lines:
+                file.write(json.dumps(line) + "\n")
+
+    def save_state(self):
+        state = golden_stamp(self.session.golden_file)
+        state.update({'profile': self.profile_name, 'checked': time.time(), 'interval': self.interval,
+                      'results': result_stamps(self.session.data_folder)})
+        state_file = os.path.join(self.session.data_folder, STATE_FILE)
+        temp_file = state_file + ".temp"
+        with open(temp_file, 'w') as file:
+            json.dump(state, file, indent=4)
+        os.replace(temp_file, state_file)
+
+    # Check every interval until stop() is called
+    def run(self):
+        lower_thread_priority()
+        while not self.stop_event.is_set():
+            try:
+                lines = self.check()
+                print(f"{self.session.timing_summary()}, {len(lines)} feed lines")
+            except Exception as e:
+                self.on_error(f"Drift check failed: {e}")
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="drift-monitor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rescan the registry on an interval and record status changes")
+    parser.add_argument("golden_file")
+    parser.add_argument("--interval", type=float, default=300.0, help="seconds between checks")
+    parser.add_argument("--data-folder", default="data")
+    parser.add_argument("--machine-type", help="machine type of the scan profile, the default profile when left out")
+    parser.add_argument("--profiles", default="scan_profiles.json")
+    parser.add_argument("--feed", help=f"change feed file, {FEED_FILE} in the data folder when left out")
+    parser.add_argument("--fake-registry", help="read a fake_registry.py JSON file instead of the registry")
+    parser.add_argument("--once", action="store_true", help="check once and exit")
+    args = parser.parse_args()
+
+    profile = (load_scan_profiles(args.profiles) if args.profiles else ScanProfiles()).get(args.machine_type)
+    os.makedirs(args.data_folder, exist_ok=True)
+    if args.fake_registry:
+        from fake_registry import load_fake_registry
+        # Loaded again for every scan, so the file can be changed while the monitor runs
+        read_registry = profile_source(lambda: load_fake_registry(args.fake_registry), profile, args.data_folder)
+    else:
+        import winreg
+        read_registry = profile_source(lambda: winreg, profile, args.data_folder)
+
+    # The monitor runs beside the GUI, keep the compare in this process
+    session = CompareSession(args.golden_file, read_registry, args.data_folder, workers=1)
+    monitor = DriftMonitor(session, args.interval, args.feed, profile.name)
+    if args.once:
+        lines = monitor.check()
+        print(f"{session.timing_summary()}, {len(lines)} feed lines")
+        return
+    monitor.start()
+    try:
+        while monitor.thread.is_alive():
+            monitor.thread.join(1)
+    except KeyboardInterrupt:
+        monitor.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+'''Page 4 golden editor journal.
+
+The pending changes of the golden file editor are the list of Add/Delete/Edit
+dicts in data/<machine>_edit.temp that the Save window reads. EditJournal keeps
+that list in memory and appends one JSON line per change to
+data/<machine>_edit_journal.temp instead of rewriting the whole list on every
+edit. Each line sets one position of the list ({"index": i, "change": {...}}),
+so replaying a line twice changes nothing: a crash between compacting the list
+and clearing the journal only replays changes that are already in the list, and
+a torn last line from a crash while appending is dropped on replay.
+
+EditorOverlay applies the changes to the golden file rows with dict lookups, the
+same way update_editor_gui used to replay them, and tells which keys the newest
+changes touched so only those table rows have to be drawn again.
+'''
+
+import bisect
+import json
+import os
+
+ADD, DELETE, EDIT = 'Add', 'Delete', 'Edit'
+PATH, NAME = 'Registry Key/Subkey Path', 'Registry Name'
+
+# Rewrite the change list and clear the journal after this many journal lines
+COMPACT_EVERY = 50
+
+
+def journal_file_path(edit_temp_file):
+    # Ends with .temp so delete_temp_files removes it together with the edit temp file
+    return os.path.splitext(edit_temp_file)[0] + "_journal.temp"
+
+
+class EditJournal:
+    def __init__(self, edit_temp_file, compact_every=COMPACT_EVERY):
+        self.edit_temp_file = edit_temp_file
+        self.journal_file = journal_file_path(edit_temp_file)
+        self.compact_every = compact_every
+        # Bumped by discard(), an overlay built on an older generation is built again
+        self.generation = 0
+        self.changes = []
+        # Index of every change written, in the order written, so an overlay knows what it has not applied yet
+        self.written = []
+        self.journal_lines = 0
+        # (lowercased path, name) -> sorted indexes of the changes with Action 'Add'
+        self.added = {}
+        self.load()
+
+    def load(self):
+        self.changes = []
+        self.added = {}
+        try:
+            with open(self.edit_temp_file, 'r') as file:
+                text = file.read()
+            changes = json.loads(text) if text.strip() else []
+        except FileNotFoundError:
+            changes = []
+        except json.JSONDecodeError as e:
+            print(f"Error loading edit changes from {self.edit_temp_file}: {e}")
+            changes = []
+
+        for change in changes:
+            self._set(len(self.changes), change)
+        self.written = list(range(len(self.changes)))
+
+        complete = self._replay()
+        if not complete:
+            # Lines appended after a torn line would never be replayed, start a clean journal
+            self.compact()
+
+    def _replay(self):
+        self.journal_lines = 0
+        try:
+            with open(self.journal_file, 'r') as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return True
+
+        for line_number, line in enumerate(lines, 1):
+            try:
+                record = json.loads(line)
+                index, change = record['index'], record['change']
+                if not 0 <= index <= len(self.changes):
+                    raise ValueError(f"index {index} is out of range")
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Ignoring {self.journal_file} from line {line_number}: {e}")
+                return False
+            self._set(index, change)
+            self.written.append(index)
+            self.journal_lines += 1
+        return True
+
+    def _set(self, index, change):
+        if index < len(self.changes):
+            previous = self.changes[index]
+            if previous.get('Action') == ADD:
+                self.added[(previous[PATH].lower(), previous[NAME])].remove(index)
+            self.changes[index] = change
+        else:
+            self.changes.append(change)
+
+        if change.get('Action') == ADD:
+            bisect.insort(self.added.setdefault((change[PATH].lower(), change[NAME]), []), index)
+
+    # Index of the first 'Add' change of this key, the path is compared case-insensitively unless match_path_case
+    def find_added(self, path, name, match_path_case=False):
+        for index in self.added.get((path.lower(), name), ()):
+            if not match_path_case or self.changes[index][PATH] == path:
+                return index
+        return None
+
+    def append(self, change):
+        index = len(self.changes)
+        self._write(index, change)
+        return index
+
+    def update(self, index, fields):
+        change = dict(self.changes[index])
+        change.update(fields)
+        self._write(index, change)
+
+    def _write(self, index, change):
+        self._set(index, change)
+        self.written.append(index)
+        with open(self.journal_file, 'a') as file:
+            file.write(json.dumps({'index': index, 'change': change}) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self.journal_lines += 1
+
+        if self.journal_lines >= self.compact_every:
+            self.compact()
+
+    # Write the whole change list to the edit temp file and start an empty journal
+    def compact(self):
+        temp_file = self.edit_temp_file + ".new"
+        with open(temp_file, 'w') as file:
+            json.dump(self.changes, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, self.edit_temp_file)
+
+        # Every journal line is in the list now
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self.journal_lines = 0
+
+    # Drop every pending change, after the changes were saved to the golden file or discarded
+    def discard(self):
+        for file_path in (self.edit_temp_file, self.journal_file):
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        self.changes = []
+        self.added = {}
+        self.written = []
+        self.journal_lines = 0
+        self.generation += 1
+
+
+class EditorOverlay:
+    def __init__(self, base_data, journal, fingerprint=None):
+        self.base_data = base_data
+        self.journal = journal
+        # Identifies the golden file the base data was read from (path, size, modification time)
+        self.fingerprint = fingerprint
+        self.rebuild()
+
+    def rebuild(self):
+        # Golden rows and rows added by changes; a deleted row is set to None so row numbers stay valid
+        self.rows = []
+        self.rows_by_key = {}
+        for entry in self.base_data:
+            self._add_row(list(entry))
+        self.count = len(self.rows)
+
+        # Per applied change: the change dict and the row its 'Add' appended (None when the key existed)
+        self.applied = []
+        self.change_rows = []
+        # (path, name) -> index of the last change of the key
+        self.last_change = {}
+        for index, change in enumerate(self.journal.changes):
+            self._apply(index, change)
+
+        self.seen = len(self.journal.written)
+        self.generation = self.journal.generation
+
+    def _add_row(self, entry):
+        row = len(self.rows)
+        self.rows.append(entry)
+        self.rows_by_key.setdefault((entry[0], entry[1]), []).append(row)
+        return row
+
+    def _delete_rows(self, key):
+        rows = self.rows_by_key.pop(key, ())
+        for row in rows:
+            self.rows[row] = None
+        self.count -= len(rows)
+
+    def _apply(self, index, change):
+        action = change.get('Action')
+        key = (change.get(PATH), change.get(NAME))
+        added_row = None
+
+        if action == ADD:
+            if key not in self.rows_by_key:
+                added_row = self._add_row([key[0], key[1], change['Data'], change['Type']])
+                self.count += 1
+        elif action == EDIT:
+            for row in self.rows_by_key.get(key, ()):
+                self.rows[row][2] = change['Current Data']
+                self.rows[row][3] = change['Current Type']
+        elif action == DELETE:
+            self._delete_rows(key)
+
+        self.applied.append(change)
+        self.change_rows.append(added_row)
+        self.last_change[key] = index
+        return key
+
+    # An 'Add' change that was edited or deleted again. Replaying from the start gives the same
+    # rows when no later change has the key, otherwise the overlay has to be built again.
+    def _update(self, index, change):
+        previous = self.applied[index]
+        key = (change.get(PATH), change.get(NAME))
+        if previous.get('Action') != ADD or (previous.get(PATH), previous.get(NAME)) != key or \
+                self.last_change[key] != index:
+            return None
+
+        action = change.get('Action')
+        added_row = self.change_rows[index]
+        if action == ADD:
+            if added_row is not None:
+                self.rows[added_row][2] = change['Data']
+                self.rows[added_row][3] = change['Type']
+        elif action == DELETE:
+            self._delete_rows(key)
+            self.change_rows[index] = None
+        else:
+            return None
+
+        self.applied[index] = change
+        return key
+
+    # Apply the changes written since the last sync; returns the keys they touched,
+    # or None when the overlay had to be built again
+    def sync(self):
+        journal = self.journal
+        if journal.generation != self.generation:
+            self.rebuild()
+            return None
+
+        touched_keys = set()
+        for index in journal.written[self.seen:]:
+            change = journal.changes[index]
+            if index == len(self.applied):
+                touched_keys.add(self._apply(index, change))
+            elif self.applied[index] != change:
+                key = self._update(index, change)
+                if key is None:
+                    self.rebuild()
+                    return None
+                touched_keys.add(key)
+        self.seen = len(journal.written)
+        return touched_keys
+
+    def key_rows(self, key):
+        return [self.rows[row] for row in self.rows_by_key.get(key, ())]
+
+    def live_rows(self):
+        return [row for row in self.rows if row is not None]
@@ -0,0 +1,368 @@
+'''In-memory stand-in for the winreg functions the registry readers use.
+
+FakeRegistry has OpenKey, CloseKey, EnumKey, EnumValue, QueryInfoKey and
+ConnectRegistry with the winreg signatures, and the REG_* / HKEY_* constants,
+so the registry readers can run and be timed on a PC without a Windows
+registry. `latency` adds a sleep to every call, like the time a real call
+spends in the kernel (outside the GIL). Values are returned the way winreg returns them (int for DWORD and
+QWORD, bytes or None for binary data, a list for multi strings).
+
+Every key has a last_write time that QueryInfoKey returns. FakeRegistry.set_value,
+delete_value, add_key and delete_key set it like Windows does (on the key itself,
+or the parent of an added or deleted key) to the given FILETIME or the current
+time; tests can also set FakeKey.last_write directly.
+
+save_fake_registry and load_fake_registry keep a FakeRegistry in a JSON file,
+for tools that read "the registry" from another process (drift_monitor.py
+--fake-registry).
+
+Usage (benchmark the walker against the recursive reader it replaced):
+    python fake_registry.py [--keys 20000] [--values 10] [--fan-out 8] [--latency 0.00005] [--threads 8]
+                            [--changed 100]
+'''
+
+import argparse
+import json
+import ntpath
+import os
+import random
+import tempfile
+import threading
+import time
+
+from registry_scan_cache import filetime_now
+
+KEY_READ = 0x20019
+KEY_WOW64_64KEY, KEY_WOW64_32KEY = 0x0100, 0x0200
+HKEY_CLASSES_ROOT, HKEY_CURRENT_USER, HKEY_LOCAL_MACHINE, HKEY_USERS, HKEY_CURRENT_CONFIG = \
+    0x80000000, 0x80000001, 0x80000002, 0x80000003, 0x80000005
+
+REG_SZ, REG_EXPAND_SZ, REG_BINARY, REG_DWORD, REG_MULTI_SZ, REG_QWORD = 1, 2, 3, 4, 7, 11
+
+
+class FakeKey:
+    def __init__(self):
+        self.subkeys = {}
+        # (name, data, type) in the order EnumValue returns them
+        self.values = []
+        self._sorted_names = None
+        # FILETIME of the last change of the key's values or direct subkeys
+        self.last_write = 0
+
+    def add_key(self, name):
+        self._sorted_names = None
+        return self.subkeys.setdefault(name, FakeKey())
+
+    def set_value(self, name, data, value_type):
+        self.values = [value for value in self.values if value[0].lower() != name.lower()]
+        self.values.append((name, data, value_type))
+
+    def subkey_names(self):
+        # The registry enumerates subkeys in case-insensitive order
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self.subkeys, key=str.lower)
+        return self._sorted_names
+
+    def find(self, name):
+        key = self.subkeys.get(name)
+        if key is None:
+            lower_name = name.lower()
+            key = next((subkey for subkey_name, subkey in self.subkeys.items()
+                        if subkey_name.lower() == lower_name), None)
+        return key
+
+
+class FakeHandle:
+    def __init__(self, key, registry=None):
+        self.key = key
+        self.registry = registry
+        self.closed = False
+
+    def Close(self):
+        if not self.closed and self.registry is not None:
+            with self.registry._lock:
+                self.registry.open_handles -= 1
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Close()
+
+
+class FakeRegistry:
+    KEY_READ = KEY_READ
+    KEY_WOW64_64KEY = KEY_WOW64_64KEY
+    KEY_WOW64_32KEY = KEY_WOW64_32KEY
+    HKEY_CLASSES_ROOT = HKEY_CLASSES_ROOT
+    HKEY_CURRENT_USER = HKEY_CURRENT_USER
+    HKEY_LOCAL_MACHINE = HKEY_LOCAL_MACHINE
+    HKEY_USERS = HKEY_USERS
+    HKEY_CURRENT_CONFIG = HKEY_CURRENT_CONFIG
+    REG_SZ = REG_SZ
+    REG_EXPAND_SZ = REG_EXPAND_SZ
+    REG_BINARY = REG_BINARY
+    REG_DWORD = REG_DWORD
+    REG_DWORD_LITTLE_ENDIAN = REG_DWORD
+    REG_MULTI_SZ = REG_MULTI_SZ
+    REG_QWORD = REG_QWORD
+    REG_QWORD_LITTLE_ENDIAN = REG_QWORD
+
+    def __init__(self, root=None, latency=0.0):
+        # Root of HKEY_LOCAL_MACHINE
+        self.root = root if root is not None else FakeKey()
+        # Root key of every hive; there is one tree per hive, the view flags of OpenKey are ignored
+        self.hives = {HKEY_LOCAL_MACHINE: self.root}
+        self.latency = latency
+        self.open_handles = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    # Changes that set the last write times like the registry does
+
+    def set_value(self, path, name, data, value_type, timestamp=None):
+        key = self.key(path, create=True)
+        key.set_value(name, data, value_type)
+        key.last_write = filetime_now() if timestamp is None else timestamp
+
+    def delete_value(self, path, name, timestamp=None):
+        key = self.key(path)
+        key.values = [value for value in key.values if value[0].lower() != name.lower()]
+        key.last_write = filetime_now() if timestamp is None else timestamp
+
+    def add_key(self, path, timestamp=None):
+        parent_path, name = ntpath.split(path)
+        parent = self.key(parent_path, create=True)
+        key = parent.add_key(name)
+        parent.last_write = key.last_write = filetime_now() if timestamp is None else timestamp
+        return key
+
+    def delete_key(self, path, timestamp=None):
+        parent_path, name = ntpath.split(path)
+        parent = self.key(parent_path)
+        del parent.subkeys[next(subkey_name for subkey_name in parent.subkeys if subkey_name.lower() == name.lower())]
+        parent._sorted_names = None
+        parent.last_write = filetime_now() if timestamp is None else timestamp
+
+    def key(self, path, create=False):
+        key = self.root
+        for name in filter(None, path.split('\\')):
+            subkey = key.find(name)
+            if subkey is None:
+                if not create:
+                    return None
+                subkey = key.add_key(name)
+            key = subkey
+        return key
+
+    def ConnectRegistry(self, computer_name, hive):
+        self._call()
+        return FakeHandle(self.hives.setdefault(hive, FakeKey()))
+
+    def OpenKey(self, key, sub_key, reserved=0, access=KEY_READ):
+        self._call()
+        parent = key.key if isinstance(key, FakeHandle) else self.root
+        found = parent
+        for name in filter(None, sub_key.split('\\')):
+            found = found.find(name)
+            if found is None:
+                raise FileNotFoundError(2, 'The system cannot find the file specified', sub_key)
+        with self._lock:
+            self.open_handles += 1
+        return FakeHandle(found, self)
+
+    def CloseKey(self, handle):
+        handle.Close()
+
+    def EnumKey(self, handle, index):
+        self._call()
+        names = handle.key.subkey_names()
+        if index >= len(names):
+            raise OSError(259, 'No more data is available')
+        return names[index]
+
+    def EnumValue(self, handle, index):
+        self._call()
+        values = handle.key.values
+        if index >= len(values):
+            raise OSError(259, 'No more data is available')
+        return values[index]
+
+    def QueryInfoKey(self, handle):
+        self._call()
+        return len(handle.key.subkeys), len(handle.key.values), handle.key.last_write
+
+
+HIVE_NAMES = {
+    'HKEY_CLASSES_ROOT': HKEY_CLASSES_ROOT,
+    'HKEY_CURRENT_USER': HKEY_CURRENT_USER,
+    'HKEY_LOCAL_MACHINE': HKEY_LOCAL_MACHINE,
+    'HKEY_USERS': HKEY_USERS,
+    'HKEY_CURRENT_CONFIG': HKEY_CURRENT_CONFIG,
+}
+
+
+# JSON of a key and its subkeys; binary data is kept as {"hex": "..."}
+def key_to_json(key):
+    return {
+        'last_write': key.last_write,
+        'values': [[name, {'hex': data.hex()} if isinstance(data, bytes) else data, value_type]
+                   for name, data, value_type in key.values],
+        'keys': {name: key_to_json(subkey) for name, subkey in key.subkeys.items()},
+    }
+
+
+def key_from_json(content):
+    key = FakeKey()
+    key.last_write = content.get('last_write', 0)
+    for name, data, value_type in content.get('values', ()):
+        if isinstance(data, dict):
+            data = bytes.fromhex(data['hex'])
+        key.values.append((name, data, value_type))
+    for name, subkey in content.get('keys', {}).items():
+        key.subkeys[name] = key_from_json(subkey)
+    return key
+
+
+def save_fake_registry(registry, file_path):
+    content = {name: key_to_json(registry.hives[hive]) for name, hive in HIVE_NAMES.items() if hive in registry.hives}
+    # Write to a temp file first so a reader never sees a half written registry
+    temp_file = file_path + ".temp"
+    with open(temp_file, 'w') as file:
+        json.dump(content, file)
+    os.replace(temp_file, file_path)
+
+
+def load_fake_registry(file_path, latency=0.0):
+    with open(file_path, 'r') as file:
+        content = json.load(file)
+    registry = FakeRegistry(key_from_json(content.get('HKEY_LOCAL_MACHINE', {})), latency)
+    for name, hive in HIVE_NAMES.items():
+        if name in content and hive != HKEY_LOCAL_MACHINE:
+            registry.hives[hive] = key_from_json(content[name])
+    return registry
+
+
+# A tree of about key_count keys under `path`, each with values_per_key values of mixed types
+def build_fake_registry(path, key_count, values_per_key=10, fan_out=8, seed=0):
+    generator = random.Random(seed)
+    registry = FakeRegistry()
+    root = registry.key(path, create=True)
+
+    keys = [root]
+    next_parent = 0
+    while len(keys) < key_count:
+        parent = keys[next_parent // fan_out]
+        keys.append(parent.add_key(f"Key{len(keys):05d}"))
+        next_parent += 1
+
+    for key in keys:
+        for index in range(values_per_key):
+            value_type = (REG_SZ, REG_DWORD, REG_BINARY, REG_QWORD, REG_MULTI_SZ)[index % 5]
+            if value_type == REG_SZ:
+                data = f"value {generator.randrange(1000)}"
+            elif value_type == REG_DWORD:
+                data = generator.randrange(2 ** 32)
+            elif value_type == REG_QWORD:
+                data = generator.randrange(2 ** 64)
+            elif value_type == REG_BINARY:
+                data = bytes(generator.randrange(256) for _ in range(16))
+            else:
+                data = ["one", "two"]
+            key.set_value(f"Value{index}", data, value_type)
+    return registry
+
+
+# The recursive reader main.py used before registry_walker, kept to compare against
+def read_recursive(backend, root_key, path, default_name='Default'):
+    from registry_walker import format_value
+    from reg_export import REG_TYPE_NAMES
+
+    result = []
+    try:
+        with backend.OpenKey(root_key, path, 0, backend.KEY_READ) as key:
+            index = 0
+            while True:
+                try:
+                    subkey_name = backend.EnumKey(key, index)
+                    subkey_path = ntpath.join(path, subkey_name)
+                    result.extend(read_recursive(backend, root_key, subkey_path))
+                    result.append((subkey_path, default_name, '', 'REG_SZ'))
+                    index += 1
+                except OSError:
+                    break
+            try:
+                value_index = 0
+                while True:
+                    try:
+                        value_name, value_data, value_type = backend.EnumValue(key, value_index)
+                        value_data = format_value(value_data, value_type)
+                        result.append((path, value_name, value_data, REG_TYPE_NAMES.get(value_type, str(value_type))))
+                        value_index += 1
+                    except OSError:
+                        break
+            except Exception:
+                pass
+    except Exception as e:
+        print(f"Error reading key: {e}")
+    return result
+
+
+def main():
+    from registry_scan_cache import ScanCache
+    from registry_walker import ParallelScan, walk_registry
+
+    parser = argparse.ArgumentParser(description="Time the registry readers on a fake registry")
+    parser.add_argument("--keys", type=int, default=20000)
+    parser.add_argument("--values", type=int, default=10)
+    parser.add_argument("--fan-out", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every registry call")
+    parser.add_argument("--threads", type=int, default=8, help="threads of the parallel scan")
+    parser.add_argument("--depth", type=int, default=1, help="levels fanned out by the parallel scan")
+    parser.add_argument("--changed", type=int, default=100, help="keys changed before the cached rescan")
+    args = parser.parse_args()
+
+    path = r'Software\WOW6432Node\MV Technology'
+    registry = build_fake_registry(path, args.keys, args.values, args.fan_out)
+    registry.latency = args.latency
+    hkey = registry.ConnectRegistry(None, registry.HKEY_LOCAL_MACHINE)
+    scan = ParallelScan(registry, hkey, path, args.threads, args.depth)
+
+    for label, read in (("recursive", lambda: read_recursive(registry, hkey, path)),
+                        ("walker", lambda: list(walk_registry(registry, hkey, path))),
+                        ("parallel", scan.read)):
+        registry.calls = 0
+        start = time.perf_counter()
+        entries = read()
+        print(f"{label}: {len(entries)} entries in {time.perf_counter() - start:.3f}s, {registry.calls} registry calls")
+    print(scan.timing_summary())
+
+    # Scan once to fill the cache, change some keys, then scan again
+    cache_folder = tempfile.TemporaryDirectory()
+    cache = ScanCache(os.path.join(cache_folder.name, "registry_scan.cache"), path)
+    cached_scan = ParallelScan(registry, hkey, path, args.threads, args.depth, cache=cache)
+    cached_scan.read()
+    cache.finish()
+    changed_paths = random.Random(1).sample(sorted(cache.previous), min(args.changed, len(cache.previous)))
+    for changed_path in changed_paths:
+        registry.set_value(changed_path, "Changed", "yes", REG_SZ, timestamp=1)
+
+    cache.begin()
+    registry.calls = 0
+    start = time.perf_counter()
+    entries = cached_scan.read()
+    print(f"cached rescan after changing {len(changed_paths)} keys: {len(entries)} entries in "
+          f"{time.perf_counter() - start:.3f}s, {registry.calls} registry calls")
+    print(cache.summary())
+    cache_folder.cleanup()
+
+
+if __name__ == '__main__':
+    main()
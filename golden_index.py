@@ -0,0 +1,176 @@
+'''Compiled golden file index.
+
+Golden files change rarely, but every compare used to parse the JSON and build
+its lookups again. compile_golden_file builds everything a compare needs from a
+golden file once (lowercased keys and row lookups) and saves it next to the
+golden file as "<golden file>.index". load_golden_index reuses that index
+while the golden file's size and modification time (or, when only the time
+changed, its sha256) are the same as when it was compiled.
+
+It also holds the Merkle digests of the golden file and the results of comparing
+the golden file with itself, so a compare only has to look at the paths where a
+snapshot differs from the golden file (see registry_merkle.py).
+
+The index is written with marshal: it only holds plain lists, dicts, strings and
+bytes, so it loads much faster than the JSON without running any code.
+'''
+
+import hashlib
+import json
+import marshal
+import os
+import sys
+
+from registry_compare import PASSWORD_NAMES, gc_paused, registry_key
+from registry_merkle import MerkleTree, self_compare
+from registry_trie import PathTrie
+
+# Bump when the content of the index changes
+INDEX_FORMAT = 3
+INDEX_SUFFIX = ".index"
+
+
+class CompiledGolden:
+    def __init__(self, golden_file, entries, size, mtime_ns, sha256, lookups=None, tree=None, self_results=None):
+        self.golden_file = golden_file
+        self.entries = entries
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sha256 = sha256
+
+        if lookups is None:
+            lookups = build_lookups(entries)
+        # (path, name) lowercased -> golden rows, lowercased path -> golden rows, password named rows
+        # and (path, name) lowercased -> golden entries, as built by registry_compare.index_golden
+        self.rows_by_key, self.rows_by_path, self.password_rows, self.index = lookups
+
+        if tree is None:
+            tree = MerkleTree.build(entries)
+        # Merkle digests of the golden file over its PathTrie (positions_by_node are left out of a loaded
+        # index, rows_by_path has the rows of every path)
+        self.tree = tree
+        if self_results is None:
+            self_results = self_compare(entries)
+        # result_reg_data, compared_result_reg_data and redundant_data of the golden file against itself
+        self.self_results = self_results
+
+    @property
+    def fingerprint(self):
+        return self.size, self.mtime_ns
+
+
+def build_lookups(entries):
+    rows_by_key = {}
+    rows_by_path = {}
+    password_rows = []
+    for row, (path, name, data, reg_type) in enumerate(entries):
+        rows_by_key.setdefault(registry_key(path, name), []).append(row)
+        rows_by_path.setdefault(path.lower(), []).append(row)
+        if name in PASSWORD_NAMES:
+            password_rows.append(row)
+    index = {key: [entries[row] for row in rows] for key, rows in rows_by_key.items()}
+    return rows_by_key, rows_by_path, password_rows, index
+
+
+def index_file_path(golden_file):
+    return golden_file + INDEX_SUFFIX
+
+
+def compile_golden_file(golden_file):
+    # stat first: if the file is written while it is read, the next load sees a newer time
+    stat = os.stat(golden_file)
+    with open(golden_file, 'rb') as file:
+        raw = file.read()
+
+    entries = json.loads(raw)
+    for entry in entries:
+        try:
+            path, name, data, reg_type = entry
+        except ValueError:
+            raise ValueError(f"Registry item has unexpected structure: {entry}")
+
+    return CompiledGolden(golden_file, entries, stat.st_size, stat.st_mtime_ns, hashlib.sha256(raw).hexdigest())
+
+
+def save_golden_index(compiled, index_file=None):
+    if index_file is None:
+        index_file = index_file_path(compiled.golden_file)
+    content = {
+        'format': INDEX_FORMAT,
+        'python': sys.version_info[:2],
+        'size': compiled.size,
+        'mtime_ns': compiled.mtime_ns,
+        'sha256': compiled.sha256,
+        'entries': compiled.entries,
+        # marshal keeps shared objects shared, the entries in 'index' are the ones in 'entries'
+        'lookups': (compiled.rows_by_key, compiled.rows_by_path, compiled.password_rows, compiled.index),
+        'tree': (compiled.tree.paths.segments, compiled.tree.paths.parents, compiled.tree.paths.children,
+                 compiled.tree.paths.lower_paths, compiled.tree.own, compiled.tree.subtree),
+        'self_results': compiled.self_results,
+    }
+    # Write to a temp file first so a crash never leaves a half written index behind
+    temp_file = index_file + ".temp"
+    with open(temp_file, 'wb') as file:
+        file.write(marshal.dumps(content))
+    os.replace(temp_file, index_file)
+
+
+def read_golden_index(golden_file, index_file=None):
+    if index_file is None:
+        index_file = index_file_path(golden_file)
+    with open(index_file, 'rb') as file:
+        raw = file.read()
+    with gc_paused():
+        content = marshal.loads(raw)
+
+    # marshal data is only readable by the Python version that wrote it
+    if content.get('format') != INDEX_FORMAT or tuple(content.get('python', ())) != sys.version_info[:2]:
+        raise ValueError(f"Golden index {index_file} was written by another version")
+
+    lookups = tuple(content['lookups'])
+    segments, parents, children, lower_paths, own, subtree = content['tree']
+    tree = MerkleTree(PathTrie(segments, parents, children, lower_paths), own, subtree)
+    return CompiledGolden(golden_file, content['entries'], content['size'], content['mtime_ns'], content['sha256'],
+                          lookups, tree, tuple(content['self_results']))
+
+
+def file_sha256(file_path):
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+# Compiled index of a golden file, from its .index file when that is still valid
+def load_golden_index(golden_file):
+    stat = os.stat(golden_file)
+    index_file = index_file_path(golden_file)
+
+    try:
+        compiled = read_golden_index(golden_file, index_file)
+    except (OSError, ValueError, EOFError, TypeError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Golden index {index_file} is not usable, compiling it again: {e}")
+        compiled = None
+
+    if compiled is not None and compiled.size == stat.st_size:
+        if compiled.mtime_ns == stat.st_mtime_ns:
+            return compiled
+        # Touched but maybe not changed (copied back from a backup, for example)
+        if file_sha256(golden_file) == compiled.sha256:
+            compiled.mtime_ns = stat.st_mtime_ns
+            try_save_golden_index(compiled, index_file)
+            return compiled
+
+    compiled = compile_golden_file(golden_file)
+    try_save_golden_index(compiled, index_file)
+    return compiled
+
+
+def try_save_golden_index(compiled, index_file):
+    # The index is only a cache, a read-only golden folder must not stop the compare
+    try:
+        save_golden_index(compiled, index_file)
+    except OSError as e:
+        print(f"Error writing golden index {index_file}: {e}")
@@ -0,0 +1,238 @@
+'''Installed programs inventory of Page 1.
+
+collect_installed_programs reads the programs listed under the Uninstall key
+of HKEY_LOCAL_MACHINE and HKEY_CURRENT_USER in the 32-bit and 64-bit registry
+views, in the same order and format get_installed_programs of main.py used to
+return them ({'Name', 'Version', 'Publisher', 'InstallLocation'}; a subkey
+without a DisplayName, DisplayVersion or Publisher is left out).
+
+    - the four sources are read by one thread each
+    - a subkey's values are read with one EnumValue pass (QueryInfoKey gives
+      the value count) that stops once the four values are found, instead of
+      one QueryValueEx per value
+    - the 32-bit and 64-bit views show the same keys on a 32-bit Windows and
+      for keys that are shared between the views: an entry with the same
+      (subkey name, DisplayName, DisplayVersion) as an earlier one is dropped
+    - the program read from a subkey is cached with the subkey's last write
+      time (see registry_scan_cache.py), and read again only when that changed
+
+InstalledInventory keeps the cache and the programs of the last collect in
+memory between checks: a check on an unchanged machine only opens the
+Uninstall subkeys for their last write times, does not write the cache file
+again, and tells the caller nothing changed (`generation` stays the same), so
+the programs can be handed to the software check as they are.
+
+`backend` is the winreg module or a stand-in like fake_registry.FakeRegistry.
+'''
+
+import marshal
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from registry_scan_cache import RECENT_WRITE, filetime_now
+from registry_walker import print_error
+
+UNINSTALL_PATH = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
+# (hive, view flag) in the order the programs are listed
+SOURCES = (
+    ('HKEY_LOCAL_MACHINE', 'KEY_WOW64_32KEY'),
+    ('HKEY_LOCAL_MACHINE', 'KEY_WOW64_64KEY'),
+    ('HKEY_CURRENT_USER', 'KEY_WOW64_32KEY'),
+    ('HKEY_CURRENT_USER', 'KEY_WOW64_64KEY'),
+)
+# Lowercased value name -> program field; the program is left out without the first three
+PROGRAM_FIELDS = {
+    'displayname': 'Name',
+    'displayversion': 'Version',
+    'publisher': 'Publisher',
+    'installlocation': 'InstallLocation',
+}
+REQUIRED_FIELDS = ('Name', 'Version', 'Publisher')
+
+# Bump when the content of the cache changes
+CACHE_FORMAT = 1
+
+
+# Program of an open Uninstall subkey, None when it has no name, version or publisher
+def read_program(backend, handle, value_count):
+    found = {}
+    for value_index in range(value_count):
+        try:
+            value_name, value_data, value_type = backend.EnumValue(handle, value_index)
+        except OSError:
+            break
+        field = PROGRAM_FIELDS.get(value_name.lower())
+        if field is not None:
+            found[field] = value_data
+            if len(found) == len(PROGRAM_FIELDS):
+                break
+
+    if any(field not in found for field in REQUIRED_FIELDS):
+        return None
+    return {
+        'Name': found['Name'],
+        'Version': found['Version'],
+        'Publisher': found['Publisher'],
+        'InstallLocation': found.get('InstallLocation'),
+    }
+
+
+class InventoryCache:
+    def __init__(self, cache_file=None, sources=None):
+        self.cache_file = cache_file
+        # source name -> lowercased subkey name -> (last write time, program or None)
+        self.sources = sources if sources is not None else {}
+        self.hits = 0
+        self.misses = 0
+        # The threads of the four sources count their lookups
+        self._counter_lock = threading.Lock()
+        # True when the entries of a source changed since the cache was loaded or saved
+        self.changed = False
+
+    # Program of a subkey whose last write time is unchanged: (True, program), else (False, None)
+    def lookup(self, source, subkey_name, last_write):
+        cached = self.sources.get(source, {}).get(subkey_name.lower())
+        if cached is None or cached[0] != last_write:
+            with self._counter_lock:
+                self.misses += 1
+            return False, None
+        with self._counter_lock:
+            self.hits += 1
+        return True, cached[1]
+
+    def update(self, source, entries):
+        if self.sources.get(source) != entries:
+            self.sources[source] = entries
+            self.changed = True
+
+    def save(self):
+        content = {
+            'format': CACHE_FORMAT,
+            'python': sys.version_info[:2],
+            'sources': self.sources,
+        }
+        # Write to a temp file first so a crash never leaves a half written cache behind
+        temp_file = self.cache_file + ".temp"
+        with open(temp_file, 'wb') as file:
+            file.write(marshal.dumps(content))
+        os.replace(temp_file, self.cache_file)
+        self.changed = False
+
+
+def load_inventory_cache(cache_file):
+    try:
+        with open(cache_file, 'rb') as file:
+            content = marshal.loads(file.read())
+        # marshal data is only readable by the Python version that wrote it
+        if content.get('format') != CACHE_FORMAT or tuple(content.get('python', ())) != sys.version_info[:2]:
+            raise ValueError("written by another version")
+        sources = content['sources']
+        if not isinstance(sources, dict):
+            raise ValueError("no sources")
+    except (OSError, ValueError, EOFError, TypeError, KeyError, AttributeError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Installed programs cache {cache_file} is not usable, reading every program: {e}")
+        sources = {}
+    return InventoryCache(cache_file, sources)
+
+
+def source_name(hive, view_flag):
+    return f"{hive} {view_flag}"
+
+
+# (subkey name, program) of every program of one source, and the cache entries of its subkeys
+def read_source(backend, hive, view_flag, cache, on_error):
+    name = source_name(hive, view_flag)
+    access = backend.KEY_READ | getattr(backend, view_flag)
+    scan_started = filetime_now()
+    programs = []
+    entries = {}
+    try:
+        with backend.ConnectRegistry(None, getattr(backend, hive)) as registry:
+            with backend.OpenKey(registry, UNINSTALL_PATH, 0, access) as uninstall_key:
+                subkey_count = backend.QueryInfoKey(uninstall_key)[0]
+                for index in range(subkey_count):
+                    try:
+                        subkey_name = backend.EnumKey(uninstall_key, index)
+                        with backend.OpenKey(uninstall_key, subkey_name, 0, access) as subkey:
+                            _, value_count, last_write = backend.QueryInfoKey(subkey)
+                            hit, program = cache.lookup(name, subkey_name, last_write)
+                            if not hit:
+                                program = read_program(backend, subkey, value_count)
+                    except OSError:
+                        continue
+                    # A key written in the same clock tick as the scan could keep its time after a change
+                    if last_write <= scan_started - RECENT_WRITE:
+                        entries[subkey_name.lower()] = (last_write, program)
+                    if program is not None:
+                        programs.append((subkey_name, program))
+    except Exception as e:
+        on_error(f"Error accessing registry: {e}")
+        # Keep what the cache had, nothing of this source was read
+        return programs, None
+    return programs, entries
+
+
+# Installed programs of the four sources, without duplicates, read through an InventoryCache. The cache
+# file (when the cache has one) is written when a subkey changed.
+def read_installed_programs(backend, cache, on_error=print_error):
+    cache.hits = cache.misses = 0
+    with ThreadPoolExecutor(max_workers=len(SOURCES)) as executor:
+        futures = [executor.submit(read_source, backend, hive, view_flag, cache, on_error)
+                   for hive, view_flag in SOURCES]
+    results = [future.result() for future in futures]
+
+    program_list = []
+    seen = set()
+    for (hive, view_flag), (programs, entries) in zip(SOURCES, results):
+        for subkey_name, program in programs:
+            key = (subkey_name.lower(), str(program['Name']), str(program['Version']))
+            if key in seen:
+                continue
+            seen.add(key)
+            program_list.append(program)
+        if entries is not None:
+            cache.update(source_name(hive, view_flag), entries)
+
+    if cache.cache_file and cache.changed:
+        try:
+            cache.save()
+        except OSError as e:
+            print(f"Error writing installed programs cache {cache.cache_file}: {e}")
+    print(f"Installed programs: {len(program_list)} programs, {cache.hits} read from the cache, "
+          f"{cache.misses} read from the registry")
+    return program_list
+
+
+# Installed programs of the four sources, without duplicates. With a cache_file, programs are
+# cached by the last write time of their subkey between runs.
+def collect_installed_programs(backend, cache_file=None, on_error=print_error):
+    return read_installed_programs(backend, load_inventory_cache(cache_file) if cache_file else InventoryCache(),
+                                   on_error)
+
+
+# The installed programs of a machine, kept between checks
+class InstalledInventory:
+    def __init__(self, backend, cache_file=None, on_error=print_error):
+        self.backend = backend
+        self.cache_file = cache_file
+        self.on_error = on_error
+        # Loaded on the first collect
+        self.cache = None
+        # Programs of the last collect, None before the first
+        self.programs = None
+        # Counts the collects that gave other programs than the one before
+        self.generation = 0
+
+    # (programs, changed): the installed programs, and False when they are the ones of the last collect
+    def collect(self):
+        if self.cache is None:
+            self.cache = load_inventory_cache(self.cache_file) if self.cache_file else InventoryCache()
+        programs = read_installed_programs(self.backend, self.cache, self.on_error)
+        if programs == self.programs:
+            return self.programs, False
+        self.programs = programs
+        self.generation += 1
+        return programs, True
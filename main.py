@@ -3,31 +3,38 @@ import subprocess
 import os
 import winreg
 import win32con
-from fuzzywuzzy import fuzz
-from packaging import version
 import re
 import operator
 import shutil
 import datetime
-from dataclasses import dataclass
 import json
 from pathlib import Path
 import ctypes, sys
 import glob
 import threading
 import time
-
-@dataclass
-class RegistryData:
-    key: str
-    value: bytes  # Expecting binary data
-    type: str
-
-    def __post_init__(self):
-        # Convert bytes to a hexadecimal string
-        if isinstance(self.value, bytes):
-            self.value = self.value.hex()
-
+import multiprocessing
+import importlib.machinery
+from registry_compare import CompareSession, generate_reg_data_indexed, generate_redundant_data_indexed, \
+    generate_compared_results_indexed
+from registry_trie import PathRows
+from revision_diff import diff_revisions
+from edit_journal import EditJournal, EditorOverlay
+from registry_walker import walk_registry
+from registry_scan_cache import cache_file_name, load_scan_cache
+from scan_profiles import ScanProfiles, load_scan_profiles
+from installed_programs import InstalledInventory
+from drift_monitor import results_fresh
+from software_match import generate_results
+from software_rules import load_matching_rules
+from software_profiles import PROFILES_FOLDER, RESULTS_FOLDER, RequirementProfile, evaluate_profiles, file_stamps, \
+    load_requirement_profiles, profile_files, summary_lines, write_profile_results
+
+# A frozen build starts the registry compare workers through this executable
+multiprocessing.freeze_support()
+# Run from source, the spawned compare workers would run this script again and open the GUI. Like the
+# __main__ of a package, a __main__ module spec is not run again in them (see registry_parallel.py).
+__spec__ = importlib.machinery.ModuleSpec('__main__', None)
 
 REG_TYPE_MAP = {
     winreg.REG_SZ: "REG_SZ",  #
@@ -109,52 +116,8 @@ def compare_golden_and_rev_json(golden_file_path, restore_file_path, action_temp
     if not golden_data or not restore_data:
         raise FileNotFoundError("Failed to load one of the files for comparison.")
 
-    added_deleted_entries = []
-    edited_entries = []
-
-    # Comparison logic
-    for entry in restore_data:
-        path, name, data, reg_type = entry
-        matching_entry = next((e for e in golden_data if e[0] == path and e[1] == name), None)
-
-        if matching_entry:
-            previous_data = matching_entry[2]
-            previous_type = matching_entry[3]
-
-            # If the data or type differs, it's an edit
-            if data != previous_data or reg_type != previous_type:
-                edited_entries.append({
-                    'Registry Key/Subkey Path': path,
-                    'Registry Name': name,
-                    'Previous Data': previous_data,
-                    'Current Data': data,
-                    'Previous Type': previous_type,
-                    'Current Type': reg_type,
-                    'Action': 'Edit'
-                })
-        else:
-            # If no matching entry in the golden file, it's a new addition
-            added_deleted_entries.append({
-                'Registry Key/Subkey Path': path,
-                'Registry Name': name,
-                'Data': data,
-                'Type': reg_type,
-                'Action': 'Add'
-            })
-
-    for entry in golden_data:
-        path, name, data, reg_type = entry
-        matching_entry = next((e for e in restore_data if e[0] == path and e[1] == name), None)
-
-        # If an entry exists in the golden file but not in the restore file, it was deleted
-        if not matching_entry:
-            added_deleted_entries.append({
-                'Registry Key/Subkey Path': path,
-                'Registry Name': name,
-                'Data': data,
-                'Type': reg_type,
-                'Action': 'Delete'
-            })
+    # Add/Delete/Edit actions between the two files, keyed by (path, name)
+    added_deleted_entries, edited_entries = diff_revisions(golden_data, restore_data)
 
     # Write to action temp file
     action_temp_data = added_deleted_entries + edited_entries
@@ -201,6 +164,9 @@ def makeWinSave(title):
 
     edit_data=None
 
+    # Write the journaled changes into edit.temp before it is read
+    get_edit_journal(file_name).compact()
+
     # Load the temp files (edit.temp and golden_file.temp)
     golden_temp_path = os.path.join("data", f"{file_name}_golden_file.temp")
     edit_temp_path = os.path.join("data", f"{file_name}_edit.temp")
@@ -385,8 +351,7 @@ def makeWinSave(title):
                 # Step 5: Remove temp files after applying changes
                 if os.path.exists(golden_file_path):
                     os.remove(golden_file_path)
-                if os.path.exists(edit_temp_path):
-                    os.remove(edit_temp_path)
+                get_edit_journal(file_name).discard()
 
                 # Step 6: Update the main window GUI (if necessary)
                 update_editor_gui(original_golden_file_path)
@@ -403,12 +368,10 @@ def makeWinSave(title):
             if confirmation == "Yes":
                 # Step 1: Remove temp files without applying changes
                 golden_file_path = os.path.join("data", f"{file_name}_golden_file.temp")
-                edit_temp_path = os.path.join("data", f"{file_name}_edit.temp")
 
                 if os.path.exists(golden_file_path):
                     os.remove(golden_file_path)
-                if os.path.exists(edit_temp_path):
-                    os.remove(edit_temp_path)
+                get_edit_journal(file_name).discard()
 
                 sg.popup_ok("Changes discarded successfully.", title="Information")
 
@@ -580,23 +543,12 @@ def makeWin4Restore(added_deleted_entries, edited_entries):
                 sg.popup_ok("Discard action cancelled.")
 
 
-# Function to write changes to the {machine_type}_edit.temp file
+# Function to write changes to the {machine_type}_edit.temp file (through its edit journal)
 def write_edit_temp_file(machine_type, changes, action):
-    # Get the original golden file name to create the edit temp file
-    golden_file_name = f"{machine_type}"
-    edit_temp_file_name = f"{golden_file_name}_edit.temp"
-    edit_temp_file_path = os.path.join("data", edit_temp_file_name)
-
-    # Load the current edit temp file contents if they exist
-    edit_temp_data = load_registry_from_json2(edit_temp_file_path)
-
-    # If the file doesn't exist or is empty, initialize an empty list
-    if edit_temp_data is None:
-        edit_temp_data = []
+    journal = get_edit_journal(machine_type)
 
     # Process each change
     for change in changes:
-        conflict_found = False
         print(f"Processing change: {change}")  # Debugging
 
         # Convert list to dict if needed
@@ -613,38 +565,28 @@ def write_edit_temp_file(machine_type, changes, action):
         if change['Data'] == "":
             change['Data'] = "-"
 
-        # Check for existing path and name in edit.temp
-        for temp_entry in edit_temp_data:
-            if temp_entry['Registry Key/Subkey Path'].lower() == change['Registry Key/Subkey Path'].lower() and \
-                    temp_entry['Registry Name'] == change['Registry Name']:
-
-                # If the entry was added and now being deleted, change the action to "Delete"
-                if temp_entry['Action'] == 'Add' and action == 'Delete':
-                    print(f"Found existing 'Add' entry, changing action to 'Delete': {temp_entry}")
-                    temp_entry['Action'] = 'Delete'
-                    conflict_found = True
-                    break  # Exit once the match is found and updated
-
-                # If the entry was added (action "Add"), update type/data and leave action as "Add"
-                elif temp_entry['Action'] == 'Add' and action == 'Edit':
-                    print(f"Found existing 'Add' entry, updating data and type: {temp_entry}")
-                    temp_entry['Data'] = change['Data']
-                    temp_entry['Type'] = change['Type']
-                    temp_entry['Action'] = 'Add'  # Keep it as "Add"
-                    conflict_found = True
-                    break
+        # Check for an existing "Add" of the same path and name in edit.temp
+        added_index = None
+        if action in ('Delete', 'Edit'):
+            added_index = journal.find_added(change['Registry Key/Subkey Path'], change['Registry Name'])
+
+        # If the entry was added and now being deleted, change the action to "Delete"
+        if added_index is not None and action == 'Delete':
+            print(f"Found existing 'Add' entry, changing action to 'Delete': {journal.changes[added_index]}")
+            journal.update(added_index, {'Action': 'Delete'})
+
+        # If the entry was added (action "Add"), update type/data and leave action as "Add"
+        elif added_index is not None and action == 'Edit':
+            print(f"Found existing 'Add' entry, updating data and type: {journal.changes[added_index]}")
+            journal.update(added_index, {'Data': change['Data'], 'Type': change['Type']})
 
         # If no conflict found, handle as a new "Edit" or "Add"
-        if not conflict_found:
+        else:
             print(f"No match in edit.temp, processing as new {action}: {change}")
             change['Action'] = action
-            edit_temp_data.append(change)
-
-    # Write the updated data back to the edit temp file
-    print(f"Final edit.temp contents before writing: {edit_temp_data}")
-    write_to_json(edit_temp_data, edit_temp_file_path)
+            journal.append(change)
 
-    print(f"{edit_temp_file_name} updated with new changes: {edit_temp_data}")
+    print(f"{machine_type}_edit.temp updated, {len(journal.changes)} changes pending.")
 
 
 def preserve_table_state(table_values):
@@ -672,10 +614,19 @@ def log_deleted_registry_key(path, name, reg_type, data):
     write_into_event_log(log_message)
 
 
+# Rows of the redundant keys table (update_redundant_gui): (fingerprint of redundant_data.json, number of
+# redundant keys, PathRows of the rows), so a search matches the paths on node ids instead of every row
+redundant_table = None
+
+
 def perform_redundant_search(search_text, window, event, values):
     table_data = window["-TABLE_REDUNDANT-"].get()
-    # Filter the table_data to include only rows where the registry key or name contains the search_text
-    filtered_data = [row for row in table_data if search_text in row[1].lower() or search_text in row[2].lower()]
+    # Filter the table_data to include only rows where the registry key or name contains the search_text,
+    # the paths of the redundant keys table are in its trie already
+    table_rows = PathRows(table_data, paths=redundant_table[2].paths if redundant_table is not None else None)
+    matching = table_rows.paths.containing(search_text)
+    filtered_data = [row for row, node in zip(table_rows.rows, table_rows.row_nodes)
+                     if node in matching or search_text in row[2].lower()]
     window["-TABLE_REDUNDANT-"].update(values=filtered_data)
 
 
@@ -1163,72 +1114,38 @@ def get_sample_file():
     return file_path
 
 
-def run_registry_main(file_path):
-    # Generate the current PC registry data
-    join_path = os.path.join("data", "current_pc_registry_data.json")
-    os.makedirs(os.path.dirname(join_path), exist_ok=True)
-    # current_pc_reg_output_file = merged_current_registry_data("current_pc_registry_data.json")
-    current_pc_reg_output_file = merged_current_registry_data(join_path)
-
-    # Load the software PC data and current PC registry data
-    # software_pc_data = load_registry_from_json('C:/Users/xiau-yen.kelly-teo/Desktop/MyRegistryChecker/sample-registry.json')
-    software_pc_data = load_registry_from_json(file_path)
-    current_pc_reg_data = load_registry_from_json(current_pc_reg_output_file)
-
-    # Generate the registry data results
-    results_data = generate_reg_data(software_pc_data, current_pc_reg_data)
-
-    # Define the result file path
-    result_reg_data_file = "data/result_reg_data.json"
-
-    # result_reg_data_file_path= get_current_file_path('result_reg_data.json')
-    write_to_json(results_data, result_reg_data_file)
-
-    # Update the GUI with the latest data
-    update_reg_gui()
-
-
-# for list of fail/missing keys result in summary page(upper table)
-def run_registry_main2(file_path):
-    # Generate the current PC registry data
-    join_path = os.path.join("data", "current_pc_registry_data.json")
-    os.makedirs(os.path.dirname(join_path), exist_ok=True)
-    current_pc_reg_output_file = merged_current_registry_data(join_path)
-
-    # Load the software PC data and current PC registry data
-    # software_pc_data = load_registry_from_json('C:/Users/xiau-yen.kelly-teo/Desktop/MyRegistryChecker/sample-registry.json')
-    sample_reg_pc_data = load_registry_from_json(file_path)
-    current_pc_reg_data = load_registry_from_json(current_pc_reg_output_file)
+# Compare session of the golden file in use, kept between refreshes so that a refresh
+# only compares the registry keys that changed since the previous scan
+registry_session = None
+# Scan profile the session reads
+registry_session_profile = None
 
-    # Generate the registry data results
-    results_data = generate_compared_results(sample_reg_pc_data, current_pc_reg_data)
+# Worker processes of the registry compare (None: one per CPU, 1: no worker processes) and the
+# number of golden + current entries from which a compare is split across them
+REGISTRY_COMPARE_WORKERS = None
+REGISTRY_PARALLEL_THRESHOLD = 50000
 
-    # Define the result file path
-    result_reg_data_file = "data/compared_result_reg_data.json"
 
-    write_to_json(results_data, result_reg_data_file)
+def get_registry_session(file_path):
+    global registry_session, registry_session_profile
+    # A refresh only reads again what changed, a session that read another profile starts over
+    if registry_session is None or registry_session.golden_file != file_path or \
+            registry_session_profile is not get_registry_scan_profile():
+        registry_session = CompareSession(file_path, iter_installed_registry, get_current_file_path("data"),
+                                          REGISTRY_COMPARE_WORKERS, REGISTRY_PARALLEL_THRESHOLD)
+        registry_session_profile = get_registry_scan_profile()
+    return registry_session
 
 
-# for redundant registry key data in summary page (bottom table)
-def run_registry_main3(file_path):
-    # Generate the current PC registry data
-    join_path = os.path.join("data", "current_pc_registry_data.json")
-    os.makedirs(os.path.dirname(join_path), exist_ok=True)
-    current_pc_reg_output_file = merged_current_registry_data(join_path)
-
-    # Load the software PC data and current PC registry data
-    # software_pc_data = load_registry_from_json('C:/Users/xiau-yen.kelly-teo/Desktop/MyRegistryChecker/sample-registry.json')
-    sample_reg_pc_data = load_registry_from_json(file_path)
-    current_pc_reg_data = load_registry_from_json(current_pc_reg_output_file)
-
-    # Generate the registry data results
-    results_data = generate_redundant_data(sample_reg_pc_data, current_pc_reg_data)
-
-    # Define the result file path
-    result_reg_data_file = "data/redundant_data.json"
+# Scan the current pc registry once and generate result_reg_data.json (first page table),
+# compared_result_reg_data.json (summary page upper table) and redundant_data.json
+# (summary page bottom table) from the same scan and golden file load
+def run_registry_main(file_path):
+    session = get_registry_session(file_path)
+    session.run()
+    print(session.timing_summary())
 
-    write_to_json(results_data, result_reg_data_file)
-    # Save the results to the JSON file
+    return session
 
 
 def get_redundant_key_count():
@@ -1420,6 +1337,7 @@ def update_reg_compared_gui(window):
 
 # update the redundant key table in summary page (bottom table)
 def update_redundant_gui(window, search_text=None):
+    global redundant_table
     json_file_path = get_current_file_path('data/redundant_data.json')
     os.makedirs(os.path.dirname(json_file_path), exist_ok=True)
 
@@ -1432,39 +1350,47 @@ def update_redundant_gui(window, search_text=None):
             write_into_error_log(content="The file '" + json_file_path + "' is empty.")
             raise ValueError(f"The file {json_file_path} is empty.")
 
-        # Read and load the JSON file
-        with open(json_file_path, 'r') as json_file:
-            try:
-                results = json.load(json_file)
-            except json.JSONDecodeError:
-                write_into_error_log(content="The file '" + json_file_path + "' contains invalid JSON data.")
-                raise ValueError(f"The file {json_file_path} contains invalid JSON data.")
+        # The file is only read again when it changed, a search filters the rows read before
+        stat = os.stat(json_file_path)
+        fingerprint = (json_file_path, stat.st_size, stat.st_mtime_ns)
+        if redundant_table is None or redundant_table[0] != fingerprint:
+            # Read and load the JSON file
+            with open(json_file_path, 'r') as json_file:
+                try:
+                    results = json.load(json_file)
+                except json.JSONDecodeError:
+                    write_into_error_log(content="The file '" + json_file_path + "' contains invalid JSON data.")
+                    raise ValueError(f"The file {json_file_path} contains invalid JSON data.")
 
-        # Count the redundant keys (independent of search filter)
-        num_reg_redundant = sum(1 for result_data in results.values() if result_data.get("Status") == "Missing")
-        window["-REDUNDANT_REG-"].update(num_reg_redundant)
+            # Count the redundant keys (independent of search filter)
+            num_reg_redundant = sum(1 for result_data in results.values() if result_data.get("Status") == "Missing")
 
-        # Filter data by "Missing" status and exclude "Default" keys
-        redundant_data = [
-            [
-                BLANK_BOX,
-                redundant_data["Registry Key/Subkey Path"],
-                redundant_data["Registry Name"],
-                redundant_data["Registry Type"],
-                redundant_data["Data"],
-                redundant_data["Status"]
+            # Filter data by "Missing" status and exclude "Default" keys
+            redundant_data = [
+                [
+                    BLANK_BOX,
+                    redundant_data["Registry Key/Subkey Path"],
+                    redundant_data["Registry Name"],
+                    redundant_data["Registry Type"],
+                    redundant_data["Data"],
+                    redundant_data["Status"]
+                ]
+                for redundant_data in results.values()
+                if redundant_data.get("Status") == "Missing" and redundant_data.get("Registry Name") != "Default"
             ]
-            for redundant_data in results.values()
-            if redundant_data.get("Status") == "Missing" and redundant_data.get("Registry Name") != "Default"
-        ]
+            redundant_table = (fingerprint, num_reg_redundant, PathRows(redundant_data))
+
+        fingerprint, num_reg_redundant, redundant_rows = redundant_table
+        window["-REDUNDANT_REG-"].update(num_reg_redundant)
 
         # Apply search filter only for display, if search_text is provided
         if search_text:
-            search_text = search_text.lower()
-            redundant_data = [row for row in redundant_data if search_text in row[1].lower()]
+            redundant_data = redundant_rows.containing(search_text.lower())
+        else:
+            redundant_data = redundant_rows.rows
 
-        # Update the table with the filtered data
-        window["-TABLE_REDUNDANT-"].update(values=redundant_data)
+        # Update the table with the filtered data, copies of the rows as the table changes their checkboxes
+        window["-TABLE_REDUNDANT-"].update(values=[list(row) for row in redundant_data])
 
     except Exception as e:
         write_into_error_log(content="An error occurred while updating the table: " + str(e))
@@ -1662,158 +1588,14 @@ def redundant_reg_keys(registry_path, registry_name, registry_type, registry_dat
 # generate the registry keys data and save to the result_reg_data.json
 # show the data in the first page table
 def generate_reg_data(software_pc_data, current_pc_reg_data):
-    results = {}
-
-    # Step 1: Create a lookup set for quick presence checks in current data
-    current_keys = {(registry[0].lower(), registry[1].lower()) for registry in current_pc_reg_data}
-
-    # Step 2: Process each entry in software data
-    for registry_path, registry_name, registry_type, registry_data in software_pc_data:
-        registry_key = (registry_path.lower(), registry_name.lower())
-
-        # Initialize matched_registry to store potential matches for Pass
-        matched_registry = []
-
-        # Step 3: Check for special cases of Exist and Not Exist
-        if any(match_reg_item(registry_path, registry_name, registry_type, registry_data, registry) == 'Exist'
-               for registry in current_pc_reg_data):
-            status = 'Exist'
-            matched_registry_dict = {
-                'Registry Key/Subkey Path': registry_path,
-                'Registry Name': registry_name,
-                'Registry Type': registry_data,
-                'Data': registry_type
-            }
-
-        elif any(match_reg_item(registry_path, registry_name, registry_type, registry_data, registry) == 'Not Exist'
-                 for registry in current_pc_reg_data):
-            status = 'Not Exist'
-            matched_registry_dict = {
-                'Registry Key/Subkey Path': registry_path,
-                'Registry Name': registry_name,
-                'Registry Type': registry_data,
-                'Data': registry_type
-            }
-
-        # Step 4: Handle Missing status if the key does not exist in current data
-        elif registry_key not in current_keys:
-            status = 'Missing'
-            matched_registry_dict = {
-                'Registry Key/Subkey Path': registry_path,
-                'Registry Name': registry_name,
-                'Registry Type': registry_data,
-                'Data': registry_type
-            }
-
-        else:
-            # Step 5: Process Pass and Fail statuses by checking current data entries
-            for registry in current_pc_reg_data:
-                try:
-                    # Use the match function to identify Pass or Fail
-                    match_status = match_reg_item(registry_path, registry_name, registry_type, registry_data, registry)
-                    if match_status == 'Pass':
-                        matched_registry.append(registry)  # Found a matching entry with Pass
-                    elif match_status == 'Fail':
-                        continue  # Skip to the next item if Fail
-                except ValueError as ve:
-                    print(ve)
-                    write_into_error_log(content="Value error: " + str(ve))
-                    continue
-
-            # Finalize status based on matches found
-            if matched_registry:
-                status = 'Pass'
-                matched_registry_item = matched_registry[0]  # Use first Pass match found
-                matched_registry_dict = {
-                    'Registry Key/Subkey Path': matched_registry_item[0],
-                    'Registry Name': matched_registry_item[1],
-                    'Registry Type': matched_registry_item[3],
-                    'Data': matched_registry_item[2]
-                }
-            else:
-                status = 'Fail'
-                matched_registry_dict = {
-                    'Registry Key/Subkey Path': registry_path,
-                    'Registry Name': registry_name,
-                    'Registry Type': registry_data,
-                    'Data': registry_type
-                }
-
-        # Step 6: Add the result to the results dictionary
-        results[f"{registry_path}\\{registry_name}"] = {
-            'Registry Key/Subkey Path': matched_registry_dict['Registry Key/Subkey Path'],
-            'Registry Name': matched_registry_dict['Registry Name'],
-            'Registry Type': matched_registry_dict['Registry Type'],
-            'Data': matched_registry_dict['Data'],
-            'Status': status
-        }
-
-    return results
+    # The current pc data is indexed once by (path, name), see registry_compare.py
+    return generate_reg_data_indexed(software_pc_data, current_pc_reg_data)
 
 
 # Generate the redundant keys data show in the bottom table of the summary page
 def generate_redundant_data(software_pc_data, current_pc_reg_data):
-    results = {}
-    # sample registry
-    for registry_path, registry_name, registry_type, registry_data in current_pc_reg_data:
-        matched_registry = []
-        for registry in software_pc_data:
-            try:
-                match_status = redundant_reg_keys(registry_path, registry_name, registry_type, registry_data, registry)
-                if match_status == 'Pass':
-                    matched_registry.append(registry)
-                elif match_status == 'Fail':
-                    continue  # Do nothing, continue checking other items
-                elif match_status == 'Missing':
-                    continue  # Do nothing, continue checking other items
-            except ValueError as ve:
-                print(ve)
-                write_into_error_log(content="Value error: " + ve)
-                continue
-
-        # Determine the status based on whether a match was found
-        if matched_registry:
-            status = 'Pass'
-            matched_registry_item = matched_registry[0]
-            matched_registry_dict = {
-                'Registry Key/Subkey Path': matched_registry_item[0],
-                'Registry Name': matched_registry_item[1],
-                'Registry Type': matched_registry_item[3],
-                'Data': matched_registry_item[2]
-            }
-        else:
-            if any(redundant_reg_keys(registry_path, registry_name, registry_type, registry_data, registry) == 'Fail'
-                   for registry in software_pc_data):
-                status = 'Fail'
-
-            elif any(redundant_reg_keys(registry_path, registry_name, registry_type, registry_data, registry) == 'Exist'
-                     for registry in software_pc_data):
-                status = 'Exist'
-
-            elif any(match_reg_item(registry_path, registry_name, registry_type, registry_data, registry) == 'Not Exist'
-                     for registry in current_pc_reg_data):
-                status = 'Not Exist'
-
-            else:
-                status = 'Missing'
-
-            matched_registry_dict = {
-                'Registry Key/Subkey Path': registry_path,
-                'Registry Name': registry_name,
-                'Registry Type': registry_data,
-                'Data': registry_type
-            }
-
-        # Add the result to the results dictionary
-        results[f"{registry_path}\\{registry_name}"] = {
-            'Registry Key/Subkey Path': matched_registry_dict['Registry Key/Subkey Path'],
-            'Registry Name': matched_registry_dict['Registry Name'],
-            'Registry Type': matched_registry_dict['Registry Type'],
-            'Data': matched_registry_dict['Data'],
-            'Status': status
-        }
-
-    return results
+    # The golden file is indexed once by (path, name) and the current pc data streamed against it
+    return generate_redundant_data_indexed(software_pc_data, current_pc_reg_data)
 
 
 # Compare the registry keys and get the fail and missing keys data only
@@ -1863,133 +1645,16 @@ def match_reg_compared_item(registry_path, registry_name, registry_type, registr
 
 # Generate the compared registry data for upper table in summary page
 def generate_compared_results(sample_reg_pc_data, current_pc_reg_data):
-    results = {}
-
-    # Step 1: Create a set of identifiers for fast lookup
-    current_keys = {
-        (registry[0].lower(), registry[1].lower()): registry for registry in current_pc_reg_data
-    }
+    return generate_compared_results_indexed(sample_reg_pc_data, current_pc_reg_data)
 
-    # Step 2: Process each sample registry entry
-    for registry_path, registry_name, registry_type, registry_data in sample_reg_pc_data:
-        registry_key = (registry_path.lower(), registry_name.lower())
+def report_registry_error(message):
+    print(message)
+    write_into_error_log(message)
 
-        # Step 3: Check if this key exists in the current data set
-        if registry_key in current_keys:
-            # Retrieve the matching registry entry from current data
-            current_registry = current_keys[registry_key]
 
-            # Determine specific match status with helper function
-            status = match_reg_compared_item(
-                registry_path, registry_name, registry_type, registry_data, current_registry
-            )
-
-            # Build registry dictionary based on identified status
-            matched_registry_dict = {
-                'Registry Key/Subkey Path': current_registry[0],
-                'Registry Name': current_registry[1] or registry_name,
-                'Current Type': current_registry[3],
-                'Expected Type': registry_data,
-                'Current Data': current_registry[2],
-                'Expected Data': registry_type
-            }
-
-            # Differentiation for `Pass` and `Fail`
-            if status == 'Pass':
-                status = 'Pass'
-            elif status == 'Fail':
-                status = 'Fail'
-
-        else:
-            # Item is not found in current data; determine if it’s `Missing`, `Exist`, or `Not Exist`
-            if registry_name.lower() in ['password', 'calib3dpassword']:
-                status = 'Exist'
-                matched_registry_dict = {
-                    'Registry Key/Subkey Path': registry_path,
-                    'Registry Name': registry_name,
-                    'Current Type': '-',
-                    'Expected Type': registry_data,
-                    'Current Data': '-',
-                    'Expected Data': registry_type
-                }
-            else:
-                # Default to `Missing` when no match is found in current data
-                status = 'Missing'
-                matched_registry_dict = {
-                    'Registry Key/Subkey Path': registry_path,
-                    'Registry Name': registry_name,
-                    'Current Type': '-',
-                    'Expected Type': registry_data,
-                    'Current Data': '-',
-                    'Expected Data': registry_type
-                }
-
-        # Step 4: Add each processed entry to the results dictionary
-        results[f"{registry_path}\\{registry_name}"] = {
-            **matched_registry_dict,
-            'Status': status
-        }
-
-    return results
-
-# Update the read_registry_recursive function to include the registry type
+# Read the registry values of path and all its subkeys, including the registry type (see registry_walker.py)
 def read_registry_recursive(root_key, path, default_name='Default'):
-    result = []
-    try:
-        with winreg.OpenKey(root_key, path, 0, winreg.KEY_READ) as key:
-            index = 0
-            while True:
-                try:
-                    subkey_name = winreg.EnumKey(key, index)
-                    subkey_path = os.path.join(path, subkey_name)
-                    result.extend(read_registry_recursive(root_key, subkey_path))  # Recursively read subkeys
-                    # result.append(subkey_path)
-                    result.append(
-                        (subkey_path, default_name, '', 'REG_SZ'))  # Add default entry, default type as REG_SZ(string)
-                    # result.append((subkey_path, default_name, '', 'Default'))  # Add default entry
-                    index += 1
-                except OSError:
-                    break
-            # Read values of the current key
-            try:
-                value_index = 0
-                while True:
-                    try:
-                        value_name, value_data, value_type = winreg.EnumValue(key, value_index)
-                        # debugging part
-                        # value_name=value_name.casefold()
-                        # print(f"{path},{value_name},{value_data} ({value_type})")
-                        if value_type == winreg.REG_DWORD:
-                            # Convert DWORD values to hexadecimal strings
-                            value_data = f'0x{value_data:08x}'
-                        elif value_type == winreg.REG_QWORD:
-                            # Convert QWORD values to hexadecimal strings
-                            value_data = f'0x{value_data:016x}'
-                        elif value_type == winreg.REG_BINARY:
-                            value_data = print_reg_binary(value_data)
-                            # value_data = f'{value_data}'
-                        '''elif reg_type == winreg.REG_SZ or reg_type == winreg.REG_EXPAND_SZ:
-                            value_data=value_data
-                        elif reg_type == winreg.REG_MULTI_SZ:
-                            # Multi-string data should be a list of strings
-                            if isinstance(value_data, str):
-                                value_data = value_data.split('\0')  # Split the data into a list of strings'''
-
-                        # Map registry type integer value to its string representation
-                        registry_type_str = REG_TYPE_MAP.get(value_type, str(value_type))
-                        # Include registry type string in the result
-                        result.append((path, value_name, value_data, registry_type_str))
-                        value_index += 1
-                    except OSError:
-                        break
-            except Exception as e:
-                '''print(f"Error reading values: {e}")
-                write_into_error_log(f"Error reading values: {e}")'''
-                pass
-    except Exception as e:
-        print(f"Error reading key: {e}")
-        write_into_error_log(f"Error reading key: {e}")
-    return result
+    return list(walk_registry(winreg, root_key, path, default_name, report_registry_error))
 
 
 # print reg_binary data
@@ -2000,15 +1665,62 @@ def print_reg_binary(binary_data):
 
 # read the installed registry key in current pc
 def read_installed_registry():
-    result = []
-    try:
-        with winreg.ConnectRegistry(None, winreg.HKEY_LOCAL_MACHINE) as hkey:
-            result = read_registry_recursive(hkey, r'Software\WOW6432Node\MV Technology')
-            # result = read_registry_recursive(hkey, r'SOFTWARE\WOW6432Node\MV Technology')
-    except Exception as e:
-        write_into_error_log(f"Error: {e}")
-        print(f"Error: {e}")
-    return result
+    return list(iter_installed_registry())
+
+
+# Threads of the registry scan (1: read on this thread, yielding entries as they are read)
+# and how many levels of subkeys below each root are split between them
+REGISTRY_SCAN_THREADS = 8
+REGISTRY_SCAN_DEPTH = 1
+# Reuse the values of the keys whose last write time did not change since the last scan (see registry_scan_cache.py)
+REGISTRY_SCAN_CACHE = True
+# Registry roots each machine type reads (see scan_profiles.py)
+REGISTRY_SCAN_PROFILES_FILE = "scan_profiles.json"
+
+# root name -> scan cache of the root
+registry_scan_caches = {}
+registry_scan_profiles = None
+# Machine type chosen on Page 3, picks the scan profile
+registry_scan_machine_type = None
+
+
+def get_registry_scan_cache(root):
+    if not REGISTRY_SCAN_CACHE:
+        return None
+    if root.name not in registry_scan_caches:
+        cache_file = get_current_file_path(os.path.join("data", cache_file_name(root.name)))
+        registry_scan_caches[root.name] = load_scan_cache(cache_file, root.name)
+    return registry_scan_caches[root.name]
+
+
+def get_registry_scan_profile():
+    global registry_scan_profiles
+    if registry_scan_profiles is None:
+        try:
+            registry_scan_profiles = load_scan_profiles(get_current_file_path(REGISTRY_SCAN_PROFILES_FILE))
+        except ValueError as e:
+            # JSON errors are ValueErrors too
+            write_into_error_log(f"Error loading {REGISTRY_SCAN_PROFILES_FILE}, reading the default registry root: {e}")
+            print(f"Error loading {REGISTRY_SCAN_PROFILES_FILE}: {e}")
+            registry_scan_profiles = ScanProfiles()
+    return registry_scan_profiles.get(registry_scan_machine_type)
+
+
+# Same entries as read_installed_registry, yielded while the registry is read
+def iter_installed_registry():
+    for root in get_registry_scan_profile().roots:
+        cache = get_registry_scan_cache(root)
+        try:
+            if cache is not None:
+                cache.begin()
+            yield from root.scan(winreg, REGISTRY_SCAN_THREADS, REGISTRY_SCAN_DEPTH, cache, report_registry_error)
+            # Only a scan that read every key replaces the cache
+            if cache is not None:
+                cache.finish()
+                print(cache.summary())
+        except Exception as e:
+            write_into_error_log(f"Error: {e}")
+            print(f"Error: {e}")
 
 
 # load the registry data in the json file
@@ -2615,8 +2327,8 @@ def refresh_table():
     current_path = get_file_path()
     # file_name= os.path.basename(current_path)
     print(f"Using file path: {current_path}")
-    installed_registry = read_installed_registry()
-    if installed_registry:
+    session = get_registry_session(current_path)
+    if session.scan():
 
         run_registry_main(current_path)
         update_reg_gui()
@@ -2631,13 +2343,11 @@ def refresh_table2(window, event, values):
     current_path = get_file_path()
     print(f"Using file path: {current_path}")
 
-    installed_registry = read_installed_registry()
-    if installed_registry:
+    session = get_registry_session(current_path)
+    if session.scan():
         run_registry_main(current_path)
         update_reg_gui()
-        run_registry_main2(current_path)
         update_reg_compared_gui(window)
-        run_registry_main3(current_path)
         update_redundant_gui(window)
     else:
         sg.popup_error("Fail to retrieve registry keys", title="Error")
@@ -3039,7 +2749,58 @@ def compare_missing_registries(current_pc_reg_data, software_pc_data):
 #########################################################################################################################
 # functions for page 4
 
+# Edit journal of each golden file name, and the overlay of the golden file shown in the editor table
+edit_journals = {}
+editor_overlay = None
+
+
+def get_edit_journal(machine_type):
+    journal = edit_journals.get(machine_type)
+    if journal is None:
+        edit_temp_file_path = os.path.join("data", f"{machine_type}_edit.temp")
+        journal = edit_journals[machine_type] = EditJournal(edit_temp_file_path)
+    return journal
+
+
+def editor_table_row(entry):
+    return [BLANK_BOX, entry[0], entry[1], entry[3], entry[2]]
+
+
+# Redraw only the editor table rows of the touched keys. Rows keep their tree item ids
+# (row number + 1, as the table click events expect), so a key that lost rows needs a full update.
+def update_editor_rows(overlay, touched_keys):
+    table = window["-TABLE_EDITOR-"]
+    table_values = table.get()
+    tree = table.Widget
+
+    positions = {}
+    for position, row in enumerate(table_values):
+        key = (row[1], row[2])
+        if key in touched_keys:
+            positions.setdefault(key, []).append(position)
+        elif row[0] == CHECKED_BOX:
+            # A full update cleared the checkboxes too
+            row[0] = BLANK_BOX
+            tree.item(table.tree_ids[position], values=row)
+
+    new_rows = {key: [editor_table_row(entry) for entry in overlay.key_rows(key)] for key in touched_keys}
+    if any(len(new_rows[key]) < len(positions.get(key, ())) for key in touched_keys):
+        return False
+
+    for key in touched_keys:
+        key_positions = positions.get(key, [])
+        for position, row in zip(key_positions, new_rows[key]):
+            table_values[position] = row
+            tree.item(table.tree_ids[position], values=row)
+        for row in new_rows[key][len(key_positions):]:
+            position = len(table_values)
+            table_values.append(row)
+            table.tree_ids.append(tree.insert('', 'end', text=row, iid=position + 1, values=row, tag=position))
+    return True
+
+
 def update_editor_gui(file_path):
+    global editor_overlay
     editor_data = []
     try:
         json_file_path = get_current_file_path(file_path)
@@ -3053,53 +2814,37 @@ def update_editor_gui(file_path):
             write_into_error_log(content="The file '" + json_file_path + "' is empty.")
             raise ValueError(f"The file {json_file_path} is empty.")
 
-        with open(json_file_path, 'r') as json_file:
-            try:
-                base_data = json.load(json_file)
-            except json.JSONDecodeError:
-                write_into_error_log(content="The file '" + json_file_path + "' contains invalid JSON data.")
-                raise ValueError(f"The file {json_file_path} contains invalid JSON data.")
-
         golden_file_name = os.path.basename(file_path).replace(".json", "")
-        edit_temp_file_path = os.path.join("data", f"{golden_file_name}_edit.temp")
-
-        if os.path.exists(edit_temp_file_path) and os.path.getsize(edit_temp_file_path) > 0:
-            with open(edit_temp_file_path, 'r') as edit_temp_file:
-                changes = json.load(edit_temp_file)
+        journal = get_edit_journal(golden_file_name)
+
+        stat = os.stat(json_file_path)
+        fingerprint = (json_file_path, stat.st_size, stat.st_mtime_ns)
+
+        # The golden file is only read again when it changed, pending changes are applied to the overlay
+        touched_keys = None
+        if editor_overlay is not None and editor_overlay.fingerprint == fingerprint and \
+                editor_overlay.journal is journal:
+            table_shows_overlay = len(window["-TABLE_EDITOR-"].get()) == editor_overlay.count
+            touched_keys = editor_overlay.sync()
+            if not table_shows_overlay:
+                touched_keys = None
         else:
-            changes = []
-
-        for change in changes:
-            action = change.get("Action")
-            key_path = change.get("Registry Key/Subkey Path")
-            name = change.get("Registry Name")
-
-            if action == "Add":
-                if not any(entry[0] == key_path and entry[1] == name for entry in base_data):
-                    base_data.append([key_path, name, change['Data'], change['Type']])
-            elif action == "Edit":
-                for entry in base_data:
-                    if entry[0] == key_path and entry[1] == name:
-                        entry[2] = change['Current Data']
-                        entry[3] = change['Current Type']
-
-            elif action == "Delete":
-                base_data = [entry for entry in base_data if not (entry[0] == key_path and entry[1] == name)]
-
-        editor_data = [
-            [row[0], row[1], row[2], row[3]]
-            for row in base_data
-        ]
+            with open(json_file_path, 'r') as json_file:
+                try:
+                    base_data = json.load(json_file)
+                except json.JSONDecodeError:
+                    write_into_error_log(content="The file '" + json_file_path + "' contains invalid JSON data.")
+                    raise ValueError(f"The file {json_file_path} contains invalid JSON data.")
+            editor_overlay = EditorOverlay(base_data, journal, fingerprint)
 
-        displayed_editor_data = [
-            [BLANK_BOX, row[0], row[1], row[3], row[2]]
-            for row in base_data
-        ]
+        editor_data = editor_overlay.live_rows()
 
-        window["-TABLE_EDITOR-"].update(values=displayed_editor_data)
+        if touched_keys is None or not update_editor_rows(editor_overlay, touched_keys):
+            displayed_editor_data = [editor_table_row(row) for row in editor_data]
+            window["-TABLE_EDITOR-"].update(values=displayed_editor_data)
 
         # Disable the delete button if the table is empty
-        if len(displayed_editor_data) == 0:
+        if len(editor_data) == 0:
             window['-DELETE_FROM_GOLDEN_FILE-'].update(disabled=True)
 
     except Exception as e:
@@ -3299,7 +3044,14 @@ def create_page1_layout():
                 [sg.Frame('List of Missing/Failed Status', font=("Helvetica", 12, "bold"), layout=[
                     [sg.Multiline("", key="-MISSING_FAILED-", size=(80, 10), disabled=True, background_color="#045D5D",
                                   text_color="white", expand_x=True, expand_y=True)],
-                ], element_justification="left", size=(1505, 250), expand_x=True, expand_y=True)],
+                ], element_justification="left", size=(1005, 250), expand_x=True, expand_y=True)],
+            ], expand_x=True, expand_y=True),
+
+            sg.Column(layout=[
+                [sg.Frame('Requirement Profiles', font=("Helvetica", 12, "bold"), layout=[
+                    [sg.Multiline("", key="-PROFILE_SUMMARY-", size=(60, 10), disabled=True,
+                                  background_color="#045D5D", text_color="white", expand_x=True, expand_y=True)],
+                ], element_justification="left", size=(500, 250), expand_x=True, expand_y=True)],
             ], expand_x=True, expand_y=True),
         ],
     ]
@@ -3564,22 +3316,38 @@ def run_size_check(folder_path):
 # software checker
 # Function to run "Main_21.py" when the "Check" button is clicked
 def run_main_21():
+    global software_check_results
     try:
         # Merge the existing data with the new data for current PC software
-        current_pc_output_file = merge_current_pc_data("currentpc_software.json")
+        current_pc_data = merge_current_pc_data("currentpc_software.json")
 
         # Load software data
         # software_data = load_software_data('C:/Users/hai-kent.kok/Desktop/My/software.json')
         # get_file_path_sw ='C:/Users/xiau-yen.kelly-teo/Desktop/SW & Size checker - Copy/software.json'
         get_file_path_sw = get_current_file_path('software.json')
         os.makedirs(os.path.dirname(get_file_path_sw), exist_ok=True)
-        software_data = load_software_data(get_file_path_sw)
-
-        # Load current PC data
-        current_pc_data = load_current_pc_data(current_pc_output_file)  # load the appended data in this file
-
-        # Generate results
-        results = generate_results(software_data, current_pc_data)
+        requirement_profile_files = profile_files(get_current_file_path(PROFILES_FOLDER))
+        # The same programs and the same software.json and requirement profiles give the same results
+        check_key = (installed_inventory.generation, file_stamps([get_file_path_sw] + requirement_profile_files))
+        if software_check_results is not None and software_check_results[0] == check_key:
+            results, profile_summary = software_check_results[1]
+        else:
+            software_data = load_software_data(get_file_path_sw)
+            matching_rules = load_matching_rules(get_file_path_sw)
+
+            # Generate results
+            if requirement_profile_files:
+                # software.json and every requirement profile in one pass (see software_profiles.py)
+                profiles = [RequirementProfile(SOFTWARE_PROFILE_NAME, software_data, matching_rules)] + \
+                    load_requirement_profiles(requirement_profile_files)
+                results_by_profile = evaluate_profiles(profiles, current_pc_data)
+                results = results_by_profile[SOFTWARE_PROFILE_NAME]
+                profile_summary = write_profile_results(get_current_file_path(RESULTS_FOLDER), results_by_profile)
+            else:
+                results = generate_results(software_data, current_pc_data, rules=matching_rules)
+                profile_summary = None
+            software_check_results = (check_key, (results, profile_summary))
+        update_profile_summary(profile_summary)
 
         # Define the output file path for the results
         results_output_file = "results.json"
@@ -3600,18 +3368,24 @@ def run_main_21():
         sg.popup_error(f"An unexpected error occurred: {e}", title="Error")
 
 
+# Name of software.json among the requirement profiles
+SOFTWARE_PROFILE_NAME = "software.json"
+
+
+# Function to show the requirement profiles summary of the last check on Page 1
+def update_profile_summary(profile_summary):
+    if profile_summary is None:
+        window["-PROFILE_SUMMARY-"].update(f"No requirement profiles in the {PROFILES_FOLDER} folder")
+    else:
+        window["-PROFILE_SUMMARY-"].update("\n".join(summary_lines(profile_summary)))
+
+
 # Function to load software data
 def load_software_data(file_path):
     with open(file_path, 'r') as software_file:
         return json.load(software_file)['software_list']
 
 
-# Function to load current PC data
-def load_current_pc_data(file_path):
-    with open(file_path, 'r') as current_pc_file:
-        return json.load(current_pc_file)
-
-
 # Function to update the table with the latest data and row colors
 def update_gui():
     try:
@@ -3663,9 +3437,10 @@ def update_gui():
         sg.popup_error(f"An error occurred while updating the table: {e}", title="Error")
 
 
-# Function to merge existing data with new data for current PC software
+# Function to get the installed programs for the software check. They are handed over as they are,
+# currentpc_software.json keeps a copy and is only written again when they changed.
 def merge_current_pc_data(output_file):
-    installed_programs = get_installed_programs()
+    installed_programs, changed = get_installed_programs()
 
     '''# Get the absolute path of the script's directory
     script_directory = os.path.dirname(os.path.abspath(__file__))
@@ -3674,200 +3449,37 @@ def merge_current_pc_data(output_file):
     output_file = os.path.join(script_directory, output_file)'''
 
     output_file = get_current_file_path(output_file)
-    write_to_json([], output_file)
-    '''# Clear the contents of the existing file before saving
-    with open(output_file, 'w') as json_file:
-        json.dump([], json_file)'''
+    if changed or not os.path.exists(output_file):
+        # Save the updated data to the JSON file for current PC software
+        save_to_json(installed_programs, output_file)
 
-    # Merge the existing data with the new data
-    updated_data = installed_programs
-    write_to_json(updated_data, output_file)
-    # Save the updated data to the JSON file for current PC software
-    save_to_json(updated_data, output_file)
-
-    return output_file
+    return installed_programs
 
 
-# Function to get a list of installed programs on the current PC
-def get_installed_programs():
-    program_list = []
+# Installed programs of this PC, kept between checks
+installed_inventory = None
+# (programs generation, stamps of software.json and the requirement profiles) and the results and
+# profile summary of the last software check
+software_check_results = None
 
-    # Define the flags for 32-bit and 64-bit views
-    flags = [win32con.KEY_WOW64_32KEY, win32con.KEY_WOW64_64KEY]
 
-    # Connect to the Uninstall registry keys for each flag and HKEY_CURRENT_USER
-    reg_hives = [win32con.HKEY_LOCAL_MACHINE, win32con.HKEY_CURRENT_USER]
-
-    for reg_hive in reg_hives:
-        for flag in flags:
-            try:
-                aReg = winreg.ConnectRegistry(None, reg_hive)
-                aKey = winreg.OpenKey(aReg, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall", 0,
-                                      win32con.KEY_READ | flag)
-                count_subkey = winreg.QueryInfoKey(aKey)[0]
-
-                for i in range(count_subkey):
-                    try:
-                        asubkey_name = winreg.EnumKey(aKey, i)
-                        asubkey = winreg.OpenKey(aKey, asubkey_name)
-                        program = {}
-
-                        program['Name'] = winreg.QueryValueEx(asubkey, "DisplayName")[0]
-                        program['Version'] = winreg.QueryValueEx(asubkey, "DisplayVersion")[0]
-                        program['Publisher'] = winreg.QueryValueEx(asubkey, "Publisher")[0]
-
-                        # Try to retrieve the installation directory
-                        try:
-                            program['InstallLocation'] = winreg.QueryValueEx(asubkey, "InstallLocation")[0]
-                        except EnvironmentError:
-                            program['InstallLocation'] = None
-
-                        program_list.append(program)
-                    except EnvironmentError:
-                        continue
-
-            except Exception as e:
-                print(f"Error accessing registry: {e}")
-
-    return program_list
+# Function to get a list of installed programs on the current PC and whether they changed since the last check
+# (HKEY_LOCAL_MACHINE and HKEY_CURRENT_USER, 32-bit and 64-bit views, read at the same time and
+# without duplicates, see installed_programs.py)
+def get_installed_programs():
+    global installed_inventory
+    if installed_inventory is None:
+        installed_inventory = InstalledInventory(winreg, get_current_file_path("data/installed_programs.cache"))
+    return installed_inventory.collect()
 
 
 # Function to save data to a JSON file
 def save_to_json(data, output_file):
-    with open(output_file, 'w') as json_file:
+    # Write to a temp file first so a crash never leaves a half written file behind
+    temp_file = output_file + ".temp"
+    with open(temp_file, 'w') as json_file:
         json.dump(data, json_file, indent=4)
-
-
-# Function to match installed items with required items
-def match_item(required_name, required_version, installed_item):
-    name_similarity = fuzz.token_set_ratio(required_name.lower(), installed_item['Name'].lower())
-
-    # Check if either version is 'N/A'
-    if required_version == 'N/A' or installed_item['Version'] == 'N/A':
-        return name_similarity >= 70
-
-    # Special case: Handle Google Chrome
-    if 'Google Chrome' in required_name.lower() or 'chrome' in required_name.lower():
-        return name_similarity >= 80 and fuzz.ratio('Google Chrome', installed_item['Name']) >= 80
-
-    # Special case for "Microsoft Visual C++"
-    if 'microsoft visual c++' in required_name.lower():
-        # Extract the version from the name using regular expressions
-        version_match_required = re.search(r'(\d+(\.\d+)+)', required_name, re.IGNORECASE)
-        version_match_installed = re.search(r'(\d+(\.\d+)+)', installed_item['Name'], re.IGNORECASE)
-
-        if version_match_required and version_match_installed:
-            required_version = version_match_required.group(0)
-            installed_version = version_match_installed.group(0)
-
-            # Compare version similarity
-            version_similarity = fuzz.ratio(required_version, installed_version)
-
-            # Check if both name and version meet the similarity threshold
-            return name_similarity >= 70 and version_similarity >= 70
-
-    # Special case: Handle WinMerge
-    if 'winmerge' in required_name.lower():
-        # Extract the version from the name using regular expressions
-        version_match = re.search(r'WinMerge (\d+(\.\d+)+)', installed_item['Name'], re.IGNORECASE)
-        if version_match:
-            installed_version = version_match.group(1)
-            # Compare the extracted version with the required version
-            if version.parse(installed_version) >= version.parse(required_version):
-                return True
-
-    # Special case for "NVIDIA Graphics Driver"
-    if 'NVIDIA Graphics Driver' in required_name.lower():
-        # Extract the version number from the name
-        version_match_required = re.search(r'(\d+(\.\d+)+)', required_name, re.IGNORECASE)
-
-        if version_match_required:
-            required_version = version_match_required.group(0)
-
-            # Assume the number behind the name is the installed version
-            installed_version_match = re.search(r'(\d+(\.\d+)+)', installed_item['Name'])
-
-            if installed_version_match:
-                installed_version = installed_version_match.group(0)
-
-                # Compare version similarity
-                version_similarity = fuzz.ratio(required_version, installed_version)
-
-                # Check if both name and version meet the similarity threshold
-                return name_similarity >= 70 and version_similarity >= 70
-
-    # For other cases, split the name into words and check if all words appear in the installed software name
-    required_name_words = required_name.lower().split()
-    installed_name_words = installed_item['Name'].lower().split()
-    name_similarity_words = fuzz.token_set_ratio(required_name_words, installed_name_words)
-
-    # Parse the version strings and compare
-    version_similarity = fuzz.ratio(required_version, installed_item['Version'])
-    if 'microsoft visual c++' in required_name.lower():
-        return name_similarity >= 70 and version_similarity >= 70
-    else:
-        return name_similarity >= 70 and name_similarity_words >= 70
-
-
-def generate_results(software_data, current_pc_data):
-    results = {}
-
-    # Create a dictionary to store the highest version number for each software name
-    highest_versions = {}
-
-    for software_item in software_data:
-        software_name = software_item['Name']
-        required_version = software_item['Required Version']
-
-        matched_items = []
-        for current_pc_item in current_pc_data:
-            if match_item(software_name, required_version, current_pc_item):
-                matched_items.append(current_pc_item)
-
-        if matched_items:
-            # Sort matched items by version number (in descending order)
-            matched_items.sort(key=lambda x: get_version_number(x['Version']), reverse=True)
-
-            # Select the item with the highest version number
-            matched_item = matched_items[0]
-
-            installed_version = matched_item['Version']
-            if installed_version >= required_version:
-                status = 'Pass'
-            else:
-                status = 'Failed'
-
-            # Update the highest version for this software
-            if software_name not in highest_versions:
-                highest_versions[software_name] = installed_version
-            else:
-                # Check if the current version is higher than the stored highest version
-                if get_version_number(installed_version) > get_version_number(highest_versions[software_name]):
-                    highest_versions[software_name] = installed_version
-        else:
-            status = 'Missing'
-            installed_version = 'N/A'
-
-        # Special case: If the software name contains "WinMerge," display it as "WinMerge"
-        if 'WinMerge' in software_name:
-            software_name = 'WinMerge'
-
-        results[software_name] = {
-            'Required Version': required_version,
-            'Installed Version': installed_version,
-            'Status': status
-        }
-
-    return results
-
-
-def get_version_number(version_str):
-    # Extract the version number from a string using regular expressions
-    version_match = re.search(r'(\d+(\.\d+)*)', version_str)
-    if version_match:
-        return version_match.group(1)
-    else:
-        return '0'  # Return '0' if no version number is found
+    os.replace(temp_file, output_file)
 
 
 # Function to retrieve .NET Framework versions and save them to a JSON file
@@ -5433,6 +5045,8 @@ while True:
 
     if event == '_compare_':
         selected_machine_type = values["Dropdown"]
+        # The machine type's scan profile decides which registry roots are read
+        registry_scan_machine_type = selected_machine_type
 
         # Check if the file exists before proceeding
         if not os.path.isfile(file_path):
@@ -5445,10 +5059,13 @@ while True:
                                    finalize=True)
         loading_window.read(timeout=0)
 
-        # Run functions to refresh JSON files needed for counters
-        run_registry_main(file_path)  # Updates result_reg_data.json
-        run_registry_main2(file_path)  # Updates compared_result_reg_data.json
-        run_registry_main3(file_path)  # Updates redundant_data.json
+        # Refresh the JSON files needed for counters
+        # (result_reg_data.json, compared_result_reg_data.json and redundant_data.json),
+        # unless the drift monitor made them for this golden file a moment ago
+        if results_fresh(get_current_file_path("data"), file_path, get_registry_scan_profile().name):
+            print("Using the latest registry results of the drift monitor")
+        else:
+            run_registry_main(file_path)
 
         # Close the loading window after tasks are complete
         loading_window.close()
@@ -5531,7 +5148,7 @@ while True:
         window_view_more_active = True
         window_view_more = makeWin2('Summary Page')
 
-        refresh_table()
+        # refresh_table2 also updates the first page table
         refresh_table2(window_view_more, event, values)
         update_page3_data = True
         update_page4_upper_data = True
@@ -6448,13 +6065,6 @@ while True:
 
                     # Use the original golden file name format for the edit.temp file
                     golden_file_name = os.path.basename(selected_json_file).replace(".json", "")
-                    edit_temp_file_name = f"{golden_file_name}_edit.temp"
-                    edit_temp_file_path = os.path.join("data", edit_temp_file_name)
-
-                    # Check if the edit.temp file exists, if not, create it
-                    if not os.path.exists(edit_temp_file_path):
-                        with open(edit_temp_file_path, "w") as edit_temp_file:
-                            edit_temp_file.write("[]")  # Initialize as an empty JSON array
 
                     # Write the new data to the edit.temp file (instead of directly modifying golden_file.json)
                     write_edit_temp_file(golden_file_name, new_data, "Add")  # Use golden_file_name as machine type
@@ -6614,66 +6224,53 @@ while True:
                     # Extract the golden file name without extension
                     golden_file_name = os.path.basename(file_path).replace(".json", "")
 
-                    # Create the edit.temp file with the golden file name
-                    edit_temp_file_name = f"{golden_file_name}_edit.temp"
-                    edit_temp_file_path = os.path.join("data", edit_temp_file_name)
+                    # The edit.temp changes of the golden file
+                    journal = get_edit_journal(golden_file_name)
 
-                    # Load existing edit.temp file data
-                    current_edit_temp_data = load_registry_from_json2(edit_temp_file_path)
+                    # The editor table rows: the golden file rows with the pending changes applied
+                    if editor_overlay is None or editor_overlay.journal is not journal:
+                        update_editor_gui(file_path)
 
                     for path, name, reg_type, reg_data in edited_data:
-                        # Load the original data from the golden file
-                        original_data = load_registry_from_json2(file_path)
-
-                        # Load the edit.temp file if it exists, otherwise initialize as an empty list
-                        current_edit_temp_data = load_registry_from_json2(edit_temp_file_path)
-                        if current_edit_temp_data is None:
-                            current_edit_temp_data = []  # Initialize as empty if the file doesn't exist or is empty
-
-                        for path, name, reg_type, reg_data in edited_data:
-                            previous_type = None  # Initialize as None for newly added keys
-                            previous_data = None  # Initialize as None for newly added keys
-
-                            # Ensure we are comparing with the actual current values
-                            for ori_entry in original_data:
-                                if ori_entry[0] == path and ori_entry[1] == name:
-                                    previous_type = ori_entry[3]
-                                    previous_data = ori_entry[2]
-                                    break
-
-                            current_type = reg_type
-                            current_data = reg_data
-
-                            # If there are changes, check if it was added before
-                            for temp_entry in current_edit_temp_data:
-                                if temp_entry['Registry Key/Subkey Path'] == path and temp_entry[
-                                    'Registry Name'] == name and temp_entry['Action'] == 'Add':
-                                    temp_entry['Data'] = current_data
-                                    temp_entry['Type'] = current_type
-                                    break
-                            else:
-                                # If not previously added, treat it as a new "Edit"
-                                edited_entries.append({
-                                    'Registry Key/Subkey Path': path,
-                                    'Registry Name': name,
-                                    'Previous Data': previous_data if previous_data is not None else "N/A",
-                                    'Previous Type': previous_type if previous_type is not None else "N/A",
-                                    'Current Data': current_data,
-                                    'Current Type': current_type,
-                                    'Action': 'Edit'
-                                })
-
-                            write_into_event_log(
-                                f"Registry key '{name}' at path '{path}' edited. "
-                                f"Previous Type: '{previous_type if previous_type is not None else 'N/A'}', "
-                                f"New Type: '{current_type}'. "
-                                f"Previous Data: '{previous_data if previous_data is not None else 'N/A'}', "
-                                f"New Data: '{current_data}'"
-                            )
-
-                    # Write the updated data to the edit.temp file
-                    combined_entries = current_edit_temp_data + edited_entries if edited_entries else current_edit_temp_data
-                    write_to_json(combined_entries, edit_temp_file_path)
+                        previous_type = None  # Initialize as None for newly added keys
+                        previous_data = None  # Initialize as None for newly added keys
+
+                        # Ensure we are comparing with the actual current values
+                        previous_rows = editor_overlay.key_rows((path, name)) if editor_overlay is not None else []
+                        if previous_rows:
+                            previous_type = previous_rows[0][3]
+                            previous_data = previous_rows[0][2]
+
+                        current_type = reg_type
+                        current_data = reg_data
+
+                        # If there are changes, check if it was added before
+                        added_index = journal.find_added(path, name, match_path_case=True)
+                        if added_index is not None:
+                            journal.update(added_index, {'Data': current_data, 'Type': current_type})
+                        else:
+                            # If not previously added, treat it as a new "Edit"
+                            edited_entries.append({
+                                'Registry Key/Subkey Path': path,
+                                'Registry Name': name,
+                                'Previous Data': previous_data if previous_data is not None else "N/A",
+                                'Previous Type': previous_type if previous_type is not None else "N/A",
+                                'Current Data': current_data,
+                                'Current Type': current_type,
+                                'Action': 'Edit'
+                            })
+
+                        write_into_event_log(
+                            f"Registry key '{name}' at path '{path}' edited. "
+                            f"Previous Type: '{previous_type if previous_type is not None else 'N/A'}', "
+                            f"New Type: '{current_type}'. "
+                            f"Previous Data: '{previous_data if previous_data is not None else 'N/A'}', "
+                            f"New Data: '{current_data}'"
+                        )
+
+                    # Append the new edits to the edit.temp changes
+                    for entry in edited_entries:
+                        journal.append(entry)
 
                     sg.popup_ok("Changes recorded, please proceed to the Save button to save the changes.", title="Successfully")
 
@@ -0,0 +1,287 @@
+'''Offline reader for "reg export" files.
+
+read_reg_export turns a .reg file exported from a machine into the same
+(path, name, data, type) tuples read_registry_recursive reads from the live
+registry, so a snapshot can be compared on a PC without that registry:
+
+    - paths are relative to HKEY_LOCAL_MACHINE and start with `root` as given
+    - every subkey is followed by its ("Default", '', 'REG_SZ') entry and a
+      key's own values come after its subkeys
+    - DWORD and QWORD data become 0x hex strings, binary data "xx xx" hex,
+      multi strings lists and expandable strings text, like winreg returns them
+
+The file is read line by line; only the values of the keys that are still open
+(the current key and its parents) are held until the key's subkeys are done.
+
+Usage:
+    python reg_export.py <export.reg> [-o current_pc_registry_data.json]
+    python reg_export.py <export.reg> --golden <golden file.json> [--data-folder data]
+'''
+
+import argparse
+import codecs
+import json
+import re
+
+MV_TECHNOLOGY_ROOT = r'Software\WOW6432Node\MV Technology'
+HIVE = 'HKEY_LOCAL_MACHINE'
+
+# Same strings as REG_TYPE_MAP in main.py (REG_DWORD and REG_QWORD are the little endian values)
+REG_TYPE_NAMES = {
+    1: "REG_SZ",
+    2: "REG_EXPAND_SZ",
+    3: "REG_BINARY",
+    4: "REG_DWORD_LITTLE_ENDIAN",
+    5: "REG_DWORD_BIG_ENDIAN",
+    6: "REG_LINK",
+    7: "REG_MULTI_SZ",
+    8: "REG_RESOURCE_LIST",
+    9: "REG_FULL_RESOURCE_DESCRIPTOR",
+    10: "REG_RESOURCE_REQUIREMENTS_LIST",
+    11: "REG_QWORD_LITTLE_ENDIAN",
+}
+REG_SZ, REG_EXPAND_SZ, REG_BINARY, REG_DWORD, REG_MULTI_SZ, REG_QWORD = 1, 2, 3, 4, 7, 11
+
+ESCAPE = re.compile(r'\\.')
+
+
+def file_encoding(file_path):
+    with open(file_path, 'rb') as file:
+        start = file.read(3)
+    if start.startswith(codecs.BOM_UTF16_LE):
+        return 'utf-16'
+    if start.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    # REGEDIT4 files are written in the ANSI code page
+    return 'cp1252'
+
+
+# Logical lines: hex data continued with a trailing backslash is joined, and a string value
+# with a line break inside it keeps the line break
+def logical_lines(file):
+    pending = ''
+    continued = False
+    for line in file:
+        text = line.rstrip('\r\n')
+        line_break = line[len(text):]
+        if continued:
+            # Continued hex data is indented
+            text = text.lstrip()
+        text = pending + text
+
+        if open_string(text):
+            pending, continued = text + line_break, False
+        elif text.endswith('\\'):
+            pending, continued = text[:-1], True
+        else:
+            pending, continued = '', False
+            yield text
+    if pending:
+        yield pending
+
+
+# True when a value line ends inside a quoted string
+def open_string(text):
+    if not text.startswith(('"', '@')):
+        return False
+    # Backslash escapes only appear inside strings, so dropping them leaves the real quotes
+    if '\\' in text:
+        text = ESCAPE.sub('', text)
+    return text.count('"') % 2 == 1
+
+
+# (text, rest of the line after the closing quote) of a quoted .reg string
+def read_quoted(text):
+    chars = []
+    index = 1
+    while index < len(text):
+        char = text[index]
+        if char == '\\' and index + 1 < len(text):
+            chars.append(text[index + 1])
+            index += 2
+            continue
+        if char == '"':
+            return ''.join(chars), text[index + 1:]
+        chars.append(char)
+        index += 1
+    raise ValueError(f"Unterminated string: {text}")
+
+
+def decode_string(raw, encoding):
+    # winreg stops a string at its first NUL
+    return raw.decode(encoding, errors='replace').split('\x00', 1)[0]
+
+
+def decode_multi_string(raw, encoding):
+    # winreg returns the strings up to the first empty one
+    strings = []
+    for string in raw.decode(encoding, errors='replace').split('\x00'):
+        if string == '':
+            break
+        strings.append(string)
+    return strings
+
+
+# (data, type) of a value the way read_registry_recursive stores it
+def convert_value(value_type, raw, string_encoding):
+    if value_type in (REG_SZ, REG_EXPAND_SZ):
+        data = decode_string(raw, string_encoding)
+    elif value_type == REG_MULTI_SZ:
+        data = decode_multi_string(raw, string_encoding)
+    elif value_type == REG_DWORD:
+        data = f'0x{int.from_bytes(raw[:4].ljust(4, bytes(1)), "little"):08x}'
+    elif value_type == REG_QWORD:
+        data = f'0x{int.from_bytes(raw[:8].ljust(8, bytes(1)), "little"):016x}'
+    elif value_type == REG_BINARY:
+        # winreg gives None for an empty binary value
+        data = raw.hex(' ') if raw else None
+    else:
+        data = raw or None
+    return data, REG_TYPE_NAMES.get(value_type, str(value_type))
+
+
+# (name, data, type) of a value line, None for a deleted value
+def parse_value_line(line, string_encoding):
+    if line.startswith('@'):
+        name, rest = '', line[1:]
+    else:
+        name, rest = read_quoted(line)
+    if not rest.startswith('='):
+        raise ValueError(f"Value line without '=': {line}")
+    value = rest[1:].strip()
+
+    if value == '-':
+        return None
+    if value.startswith('"'):
+        data, _ = read_quoted(value)
+        return name, data, REG_TYPE_NAMES[REG_SZ]
+    if value.lower().startswith('dword:'):
+        return name, f'0x{int(value[6:], 16):08x}', REG_TYPE_NAMES[REG_DWORD]
+
+    if value.lower().startswith('hex:'):
+        value_type, hex_text = REG_BINARY, value[4:]
+    elif value.lower().startswith('hex('):
+        type_text, _, hex_text = value[4:].partition('):')
+        value_type = int(type_text, 16)
+    else:
+        raise ValueError(f"Unknown value format: {line}")
+    raw = bytes.fromhex(hex_text.replace(',', ' '))
+    data, type_name = convert_value(value_type, raw, string_encoding)
+    return name, data, type_name
+
+
+# Path relative to HKEY_LOCAL_MACHINE starting with `root` as spelled by the caller,
+# None when the key is outside root
+def relative_path(key_path, root):
+    hive, _, path = key_path.partition('\\')
+    if hive.upper() not in (HIVE, 'HKLM'):
+        return None
+    lower_path, lower_root = path.lower(), root.lower()
+    if lower_path == lower_root:
+        return root
+    if lower_path.startswith(lower_root + '\\'):
+        # read_registry_recursive joins the subkey names with a backslash (os.path.join on Windows)
+        return root + path[len(root):]
+    return None
+
+
+class OpenKey:
+    def __init__(self, path, has_parent):
+        self.path = path
+        self.has_parent = has_parent
+        self.values = []
+        # An empty binary value stops read_registry_recursive reading the rest of the key's values
+        self.values_done = False
+
+
+# Stream the (path, name, data, type) tuples of the keys under root from a .reg file
+def read_reg_export(file_path, root=MV_TECHNOLOGY_ROOT):
+    encoding = file_encoding(file_path)
+    string_encoding = 'utf-16-le'
+    open_keys = []
+    current = None
+
+    def close_key():
+        key = open_keys.pop()
+        yield from key.values
+        if key.has_parent:
+            yield key.path, 'Default', '', 'REG_SZ'
+
+    with open(file_path, 'r', encoding=encoding, newline='') as file:
+        for line in logical_lines(file):
+            stripped = line.strip()
+            if not stripped or stripped.startswith(';'):
+                continue
+            if stripped == 'REGEDIT4':
+                # Version 4 exports store hex(2) and hex(7) strings in the ANSI code page
+                string_encoding = 'cp1252'
+                continue
+            if stripped.startswith('Windows Registry Editor'):
+                continue
+
+            if stripped.startswith('[') and stripped.endswith(']'):
+                key_path = stripped[1:-1]
+                path = None if key_path.startswith('-') else relative_path(key_path, root)
+                if path is None:
+                    current = None
+                    continue
+
+                # Close the keys that are not parents of this one
+                lower_path = path.lower()
+                while open_keys and not lower_path.startswith(open_keys[-1].path.lower() + '\\'):
+                    yield from close_key()
+                # Open the parents a hand written file may leave out
+                parent = open_keys[-1].path if open_keys else None
+                if parent is None and lower_path != root.lower():
+                    parent = root
+                    open_keys.append(OpenKey(root, False))
+                if parent is not None:
+                    for subkey_name in path[len(parent) + 1:].split('\\')[:-1]:
+                        parent = parent + '\\' + subkey_name
+                        open_keys.append(OpenKey(parent, True))
+                current = OpenKey(path, bool(open_keys))
+                open_keys.append(current)
+                continue
+
+            if current is None or current.values_done:
+                continue
+            value = parse_value_line(line.lstrip(), string_encoding)
+            if value is None:
+                continue
+            name, data, type_name = value
+            if type_name == REG_TYPE_NAMES[REG_BINARY] and data is None:
+                current.values_done = True
+                continue
+            current.values.append((current.path, name, data, type_name))
+
+    while open_keys:
+        yield from close_key()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the registry values of a reg export file")
+    parser.add_argument("reg_file")
+    parser.add_argument("-o", "--output", default="current_pc_registry_data.json",
+                        help="JSON file for the entries, like data/current_pc_registry_data.json")
+    parser.add_argument("--root", default=MV_TECHNOLOGY_ROOT, help="key under HKEY_LOCAL_MACHINE to read")
+    parser.add_argument("--golden", help="compare with this golden file instead, like Compare Registry does")
+    parser.add_argument("--data-folder", default="data",
+                        help="folder for the snapshot and result files of --golden")
+    args = parser.parse_args()
+
+    if args.golden:
+        from registry_compare import CompareSession
+
+        session = CompareSession(args.golden, lambda: read_reg_export(args.reg_file, args.root), args.data_folder)
+        session.run()
+        print(session.timing_summary())
+        return
+
+    entries = [list(entry) for entry in read_reg_export(args.reg_file, args.root)]
+    with open(args.output, 'w') as file:
+        json.dump(entries, file, indent=4)
+    print(f"{len(entries)} registry values written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
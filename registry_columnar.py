@@ -0,0 +1,262 @@
+'''Columnar registry snapshots for fleet audits.
+
+A snapshot loaded from JSON is a list of [path, name, data, type] lists, and
+every compare lowercases the strings again. Here a snapshot is kept as
+parallel array buffers instead:
+
+    path_ids / name_ids       ids of the original strings in a StringTable
+    key_ids                   id of the lowercased (path, name) key
+    type_codes                id of the type string ("REG_SZ", ...)
+    data_digests              64 bit digest of the data
+    flags                     DATA_NA and PASSWORD_NAME bits
+
+Snapshots that share one StringTable (one golden file against hundreds of
+machine snapshots) have comparable ids, so statuses come from a merge join
+over two sorted key arrays without touching any string. The result converts
+back to the dict returned by generate_compared_results.
+
+Usage (one golden file against the current pc registry files of a fleet,
+writing <output folder>\\<snapshot file name> with the compared results of
+each machine):
+    python registry_columnar.py GOLDEN_FILE SNAPSHOT_FILE [SNAPSHOT_FILE ...] [--output-folder fleet_results]
+'''
+
+import argparse
+import hashlib
+import json
+import os
+from array import array
+
+from registry_compare import PASSWORD_NAMES, write_json_file
+
+# flags bits
+DATA_NA = 1
+PASSWORD_NAME = 2
+
+# status codes of a ColumnarComparison
+STATUS_NAMES = ('Pass', 'Fail', 'Exist', 'Missing')
+PASS, FAIL, EXIST, MISSING = range(len(STATUS_NAMES))
+
+
+# Interned strings shared by every snapshot of an audit
+class StringTable:
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+        self.key_ids = {}
+        self.keys = []
+        # digest of each string data value seen, machines mostly share the same values
+        self.digests = {}
+
+    def intern(self, text):
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[text] = string_id
+            self.strings.append(text)
+        return string_id
+
+    def intern_key(self, path, name):
+        key = (path.lower(), name.lower())
+        key_id = self.key_ids.get(key)
+        if key_id is None:
+            key_id = len(self.keys)
+            self.key_ids[key] = key_id
+            self.keys.append(key)
+        return key_id
+
+    def digest(self, data):
+        if not isinstance(data, str):
+            return data_digest(data)
+        digest = self.digests.get(data)
+        if digest is None:
+            digest = self.digests[data] = data_digest(data)
+        return digest
+
+
+def data_digest(data):
+    # JSON text keeps '1' and 1 (or a string and a one item list) apart, like == does
+    encoded = json.dumps(data, sort_keys=True).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), 'little')
+
+
+class ColumnarSnapshot:
+    def __init__(self, table):
+        self.table = table
+        self.path_ids = array('L')
+        self.name_ids = array('L')
+        self.key_ids = array('L')
+        self.type_codes = array('L')
+        self.data_digests = array('Q')
+        self.flags = array('B')
+        # Original data values, only read when converting results back to dicts
+        self.data = []
+        # Row numbers sorted by key id; rows with the same key stay in scan order
+        self.sorted_rows = array('L')
+
+    @classmethod
+    def from_entries(cls, entries, table=None):
+        snapshot = cls(table if table is not None else StringTable())
+        for entry in entries:
+            snapshot.append(entry)
+        snapshot.sort()
+        return snapshot
+
+    def append(self, entry):
+        try:
+            path, name, data, reg_type = entry
+        except ValueError:
+            raise ValueError(f"Registry item has unexpected structure: {entry}")
+
+        table = self.table
+        self.path_ids.append(table.intern(path))
+        self.name_ids.append(table.intern(name))
+        self.key_ids.append(table.intern_key(path, name))
+        self.type_codes.append(table.intern(reg_type))
+        self.data_digests.append(table.digest(data))
+        self.flags.append((DATA_NA if data == 'N/A' else 0) | (PASSWORD_NAME if name in PASSWORD_NAMES else 0))
+        self.data.append(data)
+
+    def sort(self):
+        key_ids = self.key_ids
+        self.sorted_rows = array('L', sorted(range(len(key_ids)), key=key_ids.__getitem__))
+
+    def __len__(self):
+        return len(self.key_ids)
+
+    def entry(self, row):
+        strings = self.table.strings
+        return [strings[self.path_ids[row]], strings[self.name_ids[row]], self.data[row],
+                strings[self.type_codes[row]]]
+
+    def to_entries(self):
+        return [self.entry(row) for row in range(len(self))]
+
+
+class ColumnarComparison:
+    def __init__(self, golden, current, matches, statuses):
+        self.golden = golden
+        self.current = current
+        # golden row -> current row compared with it (-1 when the key is not on the current pc)
+        self.matches = matches
+        # golden row -> status code (index in STATUS_NAMES)
+        self.statuses = statuses
+
+    def status_counts(self):
+        counts = [0] * len(STATUS_NAMES)
+        for status in self.statuses:
+            counts[status] += 1
+        return dict(zip(STATUS_NAMES, counts))
+
+    # Same dict as generate_compared_results
+    def to_compared_results(self):
+        golden, current = self.golden, self.current
+        strings = golden.table.strings
+        results = {}
+        for row, current_row in enumerate(self.matches):
+            registry_path, registry_name, registry_data, registry_type = golden.entry(row)
+            if current_row >= 0:
+                current_path, current_name, current_data, current_type = current.entry(current_row)
+                result = {
+                    'Registry Key/Subkey Path': current_path,
+                    'Registry Name': current_name or registry_name,
+                    'Current Type': current_type,
+                    'Expected Type': registry_type,
+                    'Current Data': current_data,
+                    'Expected Data': registry_data
+                }
+            else:
+                result = {
+                    'Registry Key/Subkey Path': registry_path,
+                    'Registry Name': registry_name,
+                    'Current Type': '-',
+                    'Expected Type': registry_type,
+                    'Current Data': '-',
+                    'Expected Data': registry_data
+                }
+            result['Status'] = STATUS_NAMES[self.statuses[row]]
+            results[f"{strings[golden.path_ids[row]]}\\{strings[golden.name_ids[row]]}"] = result
+        return results
+
+
+# Merge join of a golden snapshot with a current snapshot built on the same StringTable.
+# Statuses follow generate_compared_results: the last current entry with the golden key is compared.
+def compare_columnar(golden, current):
+    if golden.table is not current.table:
+        raise ValueError("Snapshots must share the same StringTable to be compared")
+
+    strings = golden.table.strings
+    matches = array('l', [-1]) * len(golden)
+    statuses = array('B', [MISSING]) * len(golden)
+
+    golden_keys, current_keys = golden.key_ids, current.key_ids
+    golden_rows, current_rows = golden.sorted_rows, current.sorted_rows
+    current_count = len(current_rows)
+    i = 0
+    for golden_row in golden_rows:
+        key_id = golden_keys[golden_row]
+        while i < current_count and current_keys[current_rows[i]] < key_id:
+            i += 1
+        # skip to the last current row with this key
+        j = i
+        while j < current_count and current_keys[current_rows[j]] == key_id:
+            j += 1
+
+        if j > i:
+            current_row = current_rows[j - 1]
+            matches[golden_row] = current_row
+            golden_flags, current_flags = golden.flags[golden_row], current.flags[current_row]
+            if (golden_flags | current_flags) & DATA_NA:
+                status = PASS
+            elif (golden_flags | current_flags) & PASSWORD_NAME:
+                status = EXIST
+            elif (golden.type_codes[golden_row] == current.type_codes[current_row] and
+                  golden.data_digests[golden_row] == current.data_digests[current_row]):
+                status = PASS
+            else:
+                status = FAIL
+        elif strings[golden.name_ids[golden_row]].lower() in ['password', 'calib3dpassword']:
+            status = EXIST
+        else:
+            status = MISSING
+        statuses[golden_row] = status
+
+    return ColumnarComparison(golden, current, matches, statuses)
+
+
+# Compare one golden file with many machine snapshots, yielding (machine, ColumnarComparison)
+def compare_fleet(golden_entries, machine_snapshots):
+    table = StringTable()
+    golden = ColumnarSnapshot.from_entries(golden_entries, table)
+    for machine, entries in machine_snapshots:
+        yield machine, compare_columnar(golden, ColumnarSnapshot.from_entries(entries, table))
+
+
+def load_registry_file(file_path):
+    with open(file_path, 'r') as file:
+        return json.load(file)
+
+
+# (machine, entries) of snapshot files, the machine named by its file name; read one at a time
+def read_snapshot_files(snapshot_files):
+    for file_path in snapshot_files:
+        yield os.path.splitext(os.path.basename(file_path))[0], load_registry_file(file_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a golden file with the registry files of many machines")
+    parser.add_argument("golden_file")
+    parser.add_argument("snapshot_files", nargs="+", help="current_pc_registry_data.json files, one per machine")
+    parser.add_argument("--output-folder", default="fleet_results")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_folder, exist_ok=True)
+    golden_entries = load_registry_file(args.golden_file)
+    for machine, comparison in compare_fleet(golden_entries, read_snapshot_files(args.snapshot_files)):
+        write_json_file(comparison.to_compared_results(), os.path.join(args.output_folder, f"{machine}.json"))
+        counts = ", ".join(f"{status} {count}" for status, count in comparison.status_counts().items())
+        print(f"{machine}: {counts}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,617 @@
+'''Registry comparison engine.
+
+Indexed versions of the golden file vs current PC comparisons used by the
+Registry Checker (Page 3). Every entry is a [path, name, data, type] list, the
+same layout written to current_pc_registry_data.json and the golden files.
+The statuses returned here are the same as the pair-by-pair match functions in
+main.py, but each snapshot is indexed once by lowercased (path, name) so a
+compare costs O(N + M) instead of O(N * M). The key paths of the snapshot are
+kept in a PathTrie (registry_trie.py): every path is lowercased once per key.
+
+CompareSession runs a whole Compare Registry: one registry scan, one golden
+file load and the three result files of Page 3 and the summary page. A full
+compare only compares the paths whose Merkle digests differ from the golden
+file's (see registry_merkle.py).
+'''
+
+import contextlib
+import gc
+import json
+import os
+import time
+
+from registry_trie import PathTrie
+from registry_value import to_lists, to_registry_values
+
+# Registry names that are never compared by data (their value differs per PC)
+PASSWORD_NAMES = ('Password', 'calib3dpassword')
+
+
+def registry_key(path, name):
+    return path.lower(), name.lower()
+
+
+# Building or loading the indexes makes many small dicts and lists, and the garbage collector
+# keeps scanning them all while they are made. None of them refer back to each other, so the
+# collector is paused meanwhile.
+@contextlib.contextmanager
+def gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+# Counters used to answer the 'Not Exist' check of match_reg_item for the password names
+class NamedEntryCounts:
+    def __init__(self):
+        self.named_total = 0
+        self.named_by_path = {}
+        self.password_by_name = {}
+        self.password_by_path_name = {}
+
+    def add(self, path, name, lower_path=None):
+        if name == "":
+            return
+
+        if lower_path is None:
+            lower_path = path.lower()
+        self.named_total += 1
+        self.named_by_path[lower_path] = self.named_by_path.get(lower_path, 0) + 1
+        if name in PASSWORD_NAMES:
+            self.password_by_name[name] = self.password_by_name.get(name, 0) + 1
+            path_name = (lower_path, name)
+            self.password_by_path_name[path_name] = self.password_by_path_name.get(path_name, 0) + 1
+
+    def has_other_named_entry(self, path, name):
+        # True when there is a named entry whose name differs from `name` (case sensitive)
+        # and whose path differs from `path` (case insensitive), which is when
+        # match_reg_item returns 'Not Exist' for a password name
+        lower_path = path.lower()
+        others = self.named_total - self.password_by_name.get(name, 0)
+        same_path = self.named_by_path.get(lower_path, 0) - self.password_by_path_name.get((lower_path, name), 0)
+        return others - same_path > 0
+
+
+# Index of the current pc registry snapshot
+class CurrentRegistryIndex:
+    def __init__(self, current_pc_reg_data):
+        self.entries = []
+        # Key paths of the entries, and the node id of every entry's path
+        self.paths = PathTrie()
+        self.path_nodes = []
+        # (path, name) lowercased -> positions of the entries with that key, in scan order
+        self.by_key = {}
+        # path node id -> positions of the entries with a blank name ("" is the key's default value)
+        self.blank_by_path = {}
+        # path node id -> positions of its entries
+        self.by_path = {}
+        # positions of the entries named like a password
+        self.password_positions = []
+        self.named = NamedEntryCounts()
+
+        for entry in current_pc_reg_data:
+            self.add(entry)
+
+    def add(self, entry):
+        try:
+            path, name, data, reg_type = entry
+        except ValueError:
+            raise ValueError(f"Registry item has unexpected structure: {entry}")
+
+        position = len(self.entries)
+        self.entries.append(entry)
+
+        node = self.paths.node(path)
+        self.path_nodes.append(node)
+        lower_path = self.paths.lower_paths[node]
+        self.by_key.setdefault((lower_path, name.lower()), []).append(position)
+        self.by_path.setdefault(node, []).append(position)
+
+        if name == "":
+            self.blank_by_path.setdefault(node, []).append(position)
+        elif name in PASSWORD_NAMES:
+            self.password_positions.append(position)
+        self.named.add(path, name, lower_path)
+
+    def __contains__(self, key):
+        return key in self.by_key
+
+    def candidates(self, path, name):
+        # Entries that match_reg_item compares against (path, name): same key, plus
+        # the blank-name entries of the same path, which match any name
+        node = self.paths.find(path)
+        if node is None:
+            return []
+        same_key = self.by_key.get((self.paths.lower_paths[node], name.lower()), [])
+        blank = self.blank_by_path.get(node, [])
+        if not blank or name == "":
+            return same_key
+        if not same_key:
+            return blank
+        return sorted(set(same_key).union(blank))
+
+
+# Status of one golden entry against one current entry with the same key (Pass, Exist or Fail)
+def match_status(golden_name, golden_data, golden_type, current_name, current_data, current_type):
+    if current_name == "":
+        golden_name = current_name
+
+    if golden_data == 'N/A' or current_data == 'N/A':
+        return "Pass"
+
+    if golden_name in PASSWORD_NAMES or current_name in PASSWORD_NAMES:
+        return "Exist"
+
+    if current_type == golden_type and current_data == golden_data:
+        return "Pass"
+    return "Fail"
+
+
+def golden_result(path, name, data, reg_type, status):
+    return {
+        'Registry Key/Subkey Path': path,
+        'Registry Name': name,
+        'Registry Type': reg_type,
+        'Data': data,
+        'Status': status
+    }
+
+
+# Same result as generate_reg_data: status of every golden file entry on the current pc
+def generate_reg_data_indexed(software_pc_data, current_pc_reg_data):
+    if isinstance(current_pc_reg_data, CurrentRegistryIndex):
+        current_index = current_pc_reg_data
+    else:
+        current_index = CurrentRegistryIndex(current_pc_reg_data)
+    entries = current_index.entries
+
+    results = {}
+    for registry_path, registry_name, registry_data, registry_type in software_pc_data:
+        result = golden_result(registry_path, registry_name, registry_data, registry_type, None)
+        key = registry_key(registry_path, registry_name)
+        same_key = current_index.by_key.get(key, [])
+
+        # Exist: a named entry with the same key where a password name is involved
+        if any(entries[i][1] != "" and registry_data != 'N/A' and entries[i][2] != 'N/A' and
+               (registry_name in PASSWORD_NAMES or entries[i][1] in PASSWORD_NAMES)
+               for i in same_key):
+            result['Status'] = 'Exist'
+
+        elif registry_name in PASSWORD_NAMES and current_index.named.has_other_named_entry(registry_path, registry_name):
+            result['Status'] = 'Not Exist'
+
+        elif key not in current_index:
+            result['Status'] = 'Missing'
+
+        else:
+            result['Status'] = 'Fail'
+            for i in current_index.candidates(registry_path, registry_name):
+                current_path, current_name, current_data, current_type = entries[i]
+                if match_status(registry_name, registry_data, registry_type,
+                                current_name, current_data, current_type) == 'Pass':
+                    # Use first Pass match found
+                    result = golden_result(current_path, current_name, current_data, current_type, 'Pass')
+                    break
+
+        results[f"{registry_path}\\{registry_name}"] = result
+
+    return results
+
+
+# Index of the golden file entries: (path, name) lowercased -> entries with that key, in file order
+def index_golden(software_pc_data):
+    golden_index = {}
+    for entry in software_pc_data:
+        try:
+            path, name, data, reg_type = entry
+        except ValueError:
+            raise ValueError(f"Registry item has unexpected structure: {entry}")
+        golden_index.setdefault(registry_key(path, name), []).append(entry)
+    return golden_index
+
+
+# Same result as generate_redundant_data: status of every current pc entry against the golden file.
+# The current pc data is only iterated once, so it can be a generator straight from the registry scan.
+# `named` can hold the counts of the whole snapshot when only part of it is passed in.
+def generate_redundant_data_indexed(software_pc_data, current_pc_reg_data, golden_index=None, named=None):
+    if golden_index is None:
+        golden_index = index_golden(software_pc_data)
+
+    results = {}
+    count_named = named is None
+    if count_named:
+        named = NamedEntryCounts()
+    # Password entries that are 'Not Exist' if another named entry turns up anywhere in the snapshot
+    pending_not_exist = []
+
+    for entry in current_pc_reg_data:
+        try:
+            registry_path, registry_name, registry_data, registry_type = entry
+        except ValueError:
+            raise ValueError(f"Registry item has unexpected structure: {entry}")
+        if count_named:
+            named.add(registry_path, registry_name)
+
+        result = None
+        has_fail = has_exist = False
+        for golden_path, golden_name, golden_data, golden_type in golden_index.get(
+                registry_key(registry_path, registry_name), ()):
+            if registry_data == 'N/A' or golden_data == 'N/A':
+                status = 'Pass'
+            elif registry_name in PASSWORD_NAMES or golden_name in PASSWORD_NAMES:
+                status = 'Exist'
+            elif golden_data == registry_data and golden_type == registry_type:
+                status = 'Pass'
+            else:
+                status = 'Fail'
+
+            if status == 'Pass':
+                result = golden_result(golden_path, golden_name, golden_data, golden_type, 'Pass')
+                break
+            has_fail = has_fail or status == 'Fail'
+            has_exist = has_exist or status == 'Exist'
+
+        if result is None:
+            if has_fail:
+                status = 'Fail'
+            elif has_exist:
+                status = 'Exist'
+            else:
+                status = 'Missing'
+            result = golden_result(registry_path, registry_name, registry_data, registry_type, status)
+            if status == 'Missing' and registry_name in PASSWORD_NAMES:
+                pending_not_exist.append((registry_path, registry_name, result))
+
+        results[f"{registry_path}\\{registry_name}"] = result
+
+    for registry_path, registry_name, result in pending_not_exist:
+        if named.has_other_named_entry(registry_path, registry_name):
+            result['Status'] = 'Not Exist'
+
+    return results
+
+
+# Same result as generate_compared_results: expected vs current type and data of every golden file entry
+def generate_compared_results_indexed(sample_reg_pc_data, current_pc_reg_data):
+    if isinstance(current_pc_reg_data, CurrentRegistryIndex):
+        current_index = current_pc_reg_data
+    else:
+        current_index = CurrentRegistryIndex(current_pc_reg_data)
+    entries = current_index.entries
+
+    results = {}
+    for registry_path, registry_name, registry_data, registry_type in sample_reg_pc_data:
+        same_key = current_index.by_key.get(registry_key(registry_path, registry_name))
+
+        if same_key:
+            # The last current entry with this key is the one compared
+            current_path, current_name, current_data, current_type = entries[same_key[-1]]
+            status = match_status(registry_name, registry_data, registry_type,
+                                  current_name, current_data, current_type)
+            result = {
+                'Registry Key/Subkey Path': current_path,
+                'Registry Name': current_name or registry_name,
+                'Current Type': current_type,
+                'Expected Type': registry_type,
+                'Current Data': current_data,
+                'Expected Data': registry_data
+            }
+        else:
+            if registry_name.lower() in ['password', 'calib3dpassword']:
+                status = 'Exist'
+            else:
+                status = 'Missing'
+            result = {
+                'Registry Key/Subkey Path': registry_path,
+                'Registry Name': registry_name,
+                'Current Type': '-',
+                'Expected Type': registry_type,
+                'Current Data': '-',
+                'Expected Data': registry_data
+            }
+
+        result['Status'] = status
+        results[f"{registry_path}\\{registry_name}"] = result
+
+    return results
+
+
+def write_json_file(data, file_path):
+    # Write to a temp file first: the GUI can read the results while the drift monitor saves them
+    temp_file = file_path + ".temp"
+    with open(temp_file, 'w') as file:
+        json.dump(data, file, indent=4)
+    os.replace(temp_file, file_path)
+
+
+# (size, modification time) of a file, None when there is no such file
+def file_stamp(file_path):
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+# Update results in place, True when any of them changed
+def patch_results(results, changes):
+    changed = False
+    for result_key, result in changes.items():
+        if results.get(result_key) != result:
+            results[result_key] = result
+            changed = True
+    return changed
+
+
+# Results of the rows in order, from changes for the changed rows and from results for the others.
+# Where rows share a result key the key keeps the place of its first row and the result of its
+# last one, like a full compare gives.
+def merge_row_results(rows, changed_rows, changes, results):
+    merged = {}
+    for row, (path, name, data, reg_type) in enumerate(rows):
+        result_key = f"{path}\\{name}"
+        merged[result_key] = changes[result_key] if row in changed_rows else results[result_key]
+    return merged
+
+
+# Lowercased (path, name) keys whose current pc entries differ between two indexes, and
+# whether any entry moved to another position (values added, deleted or scanned in another order)
+def changed_registry_keys(previous_index, current_index):
+    previous_entries, current_entries = previous_index.entries, current_index.entries
+    changed = set()
+    moved = len(previous_entries) != len(current_entries)
+    for key, positions in current_index.by_key.items():
+        previous_positions = previous_index.by_key.get(key)
+        if previous_positions != positions:
+            moved = True
+        if previous_positions is None or len(previous_positions) != len(positions) or any(
+                previous_entries[i] != current_entries[j] for i, j in zip(previous_positions, positions)):
+            changed.add(key)
+    changed.update(key for key in previous_index.by_key if key not in current_index.by_key)
+    return changed, moved
+
+
+# One "Compare Registry" run: scans the registry once, loads the golden file once and
+# writes current_pc_registry_data.json, result_reg_data.json, compared_result_reg_data.json
+# and redundant_data.json from the same indexes.
+# Keep the session and call run() again to refresh: when the golden file is unchanged only
+# the (path, name) keys that changed since the previous scan are compared again.
+# A full compare of at least parallel_threshold golden + current entries is split across
+# `workers` processes (None: one per CPU), see registry_parallel.py.
+class CompareSession:
+    def __init__(self, golden_file, read_registry, data_folder="data", workers=1, parallel_threshold=None):
+        self.golden_file = golden_file
+        self.read_registry = read_registry
+        self.data_folder = data_folder
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+
+        self.current_pc_reg_data = None
+        self.current_index = None
+        self.scanned = False
+
+        self.golden_data = None
+        self.golden_fingerprint = None
+        self.golden_reloaded = False
+        # (path, name) lowercased -> golden entries, and lowercased path -> golden row numbers
+        self.golden_index = None
+        self.golden_rows_by_key = None
+        self.golden_rows_by_path = None
+        self.golden_password_rows = None
+        # Merkle digests of the golden file and its results against itself
+        self.golden_tree = None
+        self.golden_self_results = None
+
+        self.result_reg_data = None
+        self.compared_result_reg_data = None
+        self.redundant_data = None
+        # Keys compared again by the last run, None when everything was compared
+        self.changed_keys = None
+        # Lowercased paths that differ from the golden file in the last full compare
+        self.differing_paths = None
+        # Result files whose content changed in the last run
+        self.changed_files = set()
+        # file name -> file_stamp of the result files as this session last wrote them
+        self.saved_stamps = {}
+
+        # phase name -> seconds, in the order the phases ran
+        self.timings = {}
+
+    def _timed(self, phase, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.timings[phase] = self.timings.get(phase, 0) + time.perf_counter() - start
+        return result
+
+    def scan(self):
+        self.timings = {}
+        os.makedirs(self.data_folder, exist_ok=True)
+        # Entries are kept as RegistryValue records (registry_value.py), JSON gets them as lists
+        self.current_pc_reg_data = self._timed('scan', lambda: to_registry_values(self.read_registry()))
+        self._timed('save snapshot', write_json_file, to_lists(self.current_pc_reg_data),
+                    os.path.join(self.data_folder, "current_pc_registry_data.json"))
+        self.scanned = True
+        return self.current_pc_reg_data
+
+    def load_golden(self):
+        # golden_index builds on this module, import it here to avoid a circular import
+        from golden_index import load_golden_index
+
+        stat = os.stat(self.golden_file)
+        self.golden_reloaded = (stat.st_size, stat.st_mtime_ns) != self.golden_fingerprint
+        if not self.golden_reloaded:
+            return self.golden_data
+
+        # Compiled once per golden file version, see golden_index.py
+        compiled = self._timed('load golden', load_golden_index, self.golden_file)
+        self.golden_data = compiled.entries
+        self.golden_fingerprint = compiled.fingerprint
+        self.golden_index = compiled.index
+        self.golden_rows_by_key = compiled.rows_by_key
+        self.golden_rows_by_path = compiled.rows_by_path
+        self.golden_password_rows = compiled.password_rows
+        self.golden_tree = compiled.tree
+        self.golden_self_results = compiled.self_results
+        return self.golden_data
+
+    # Number of worker processes to compare entry_count golden + current entries (all of them by default),
+    # 1 when it should stay in this process
+    def parallel_workers(self, entry_count=None):
+        # registry_parallel builds on this module, import it here to avoid a circular import
+        from registry_parallel import PARALLEL_THRESHOLD, default_workers
+
+        if entry_count is None:
+            entry_count = len(self.golden_data) + len(self.current_pc_reg_data)
+        workers = default_workers() if self.workers is None else self.workers
+        threshold = PARALLEL_THRESHOLD if self.parallel_threshold is None else self.parallel_threshold
+        if entry_count < threshold:
+            return 1
+        return max(workers, 1)
+
+    def compare(self):
+        previous_index = self.current_index
+        with gc_paused():
+            self.current_index = self._timed('index', CurrentRegistryIndex, self.current_pc_reg_data)
+        self.scanned = False
+
+        if previous_index is None or self.golden_reloaded or self.result_reg_data is None:
+            self.changed_keys = None
+            self.differing_paths = None
+            self.changed_files = {"result_reg_data.json", "compared_result_reg_data.json", "redundant_data.json"}
+
+            if self.golden_tree is not None:
+                with gc_paused():
+                    if self._timed('digest compare', self._compare_by_digest):
+                        return
+
+            workers = self.parallel_workers()
+            if workers > 1:
+                from registry_parallel import compare_sharded
+                self.result_reg_data, self.compared_result_reg_data, self.redundant_data = self._timed(
+                    'parallel compare', compare_sharded, self.golden_data, self.current_pc_reg_data, workers, 0,
+                    self.current_index.named)
+                return
+
+            self.result_reg_data = self._timed(
+                'compare', generate_reg_data_indexed, self.golden_data, self.current_index)
+            self.compared_result_reg_data = self._timed(
+                'compare', generate_compared_results_indexed, self.golden_data, self.current_index)
+            self.redundant_data = self._timed(
+                'compare', generate_redundant_data_indexed, self.golden_data, self.current_index.entries,
+                self.golden_index, self.current_index.named)
+            return
+
+        self.changed_keys, moved = self._timed('diff', changed_registry_keys, previous_index, self.current_index)
+        self.changed_files = set()
+        if self.changed_keys:
+            self._timed('compare', self._compare_changed, previous_index, moved)
+
+    # Compare only the paths whose digests differ from the golden file's, False when they are
+    # enough entries to be compared by the worker processes instead
+    def _compare_by_digest(self):
+        # registry_merkle builds on this module, import it here to avoid a circular import
+        from registry_merkle import MerkleTree, compare_by_digest, differing_paths
+
+        current_tree = MerkleTree.from_index(self.current_index)
+        differing, compared = differing_paths(self.golden_tree, current_tree)
+        entry_count = sum(len(self.golden_rows_by_path.get(path, ())) + len(current_tree.positions(path))
+                          for path in differing)
+        if self.parallel_workers(entry_count) > 1:
+            return False
+
+        self.differing_paths = differing
+        self.result_reg_data, self.compared_result_reg_data, self.redundant_data = compare_by_digest(
+            self.golden_data, self.golden_index, self.golden_rows_by_path, self.golden_password_rows,
+            self.golden_self_results, self.current_index, current_tree, differing)
+        return True
+
+    def _compare_changed(self, previous_index, moved):
+        changed = self.changed_keys
+        golden = self.golden_data
+        current_index = self.current_index
+
+        # Golden rows with a changed key. Blank-name values match any name of their path,
+        # and the password rows depend on the named values of the whole snapshot.
+        compared_rows = set()
+        for key in changed:
+            compared_rows.update(self.golden_rows_by_key.get(key, ()))
+        reg_rows = set(compared_rows)
+        for path, name in changed:
+            if name == "":
+                reg_rows.update(self.golden_rows_by_path.get(path, ()))
+        reg_rows.update(self.golden_password_rows)
+
+        reg_changes = generate_reg_data_indexed([golden[row] for row in sorted(reg_rows)], current_index)
+        compared_changes = generate_compared_results_indexed([golden[row] for row in sorted(compared_rows)],
+                                                             current_index)
+        # Where golden rows share a result key, the last of them decides the result, changed or not
+        if len(self.result_reg_data) < len(golden):
+            reg_changes = merge_row_results(golden, reg_rows, reg_changes, self.result_reg_data)
+            compared_changes = merge_row_results(golden, compared_rows, compared_changes,
+                                                 self.compared_result_reg_data)
+        # The golden file is unchanged, so every result key is already in place and keeps its order
+        if patch_results(self.result_reg_data, reg_changes):
+            self.changed_files.add("result_reg_data.json")
+        if patch_results(self.compared_result_reg_data, compared_changes):
+            self.changed_files.add("compared_result_reg_data.json")
+
+        changed_positions = set(current_index.password_positions)
+        for key in changed:
+            changed_positions.update(current_index.by_key.get(key, ()))
+        redundant_changes = generate_redundant_data_indexed(
+            golden, [current_index.entries[position] for position in sorted(changed_positions)],
+            self.golden_index, current_index.named)
+
+        # redundant_data.json follows the scan order, when values were added, deleted, renamed
+        # or moved rebuild it in that order so it reads the same as a full compare
+        if len(self.redundant_data) < len(previous_index.entries):
+            # The previous scan has entries that share a result key, its results only hold the last of them
+            self.redundant_data = generate_redundant_data_indexed(
+                golden, current_index.entries, self.golden_index, current_index.named)
+            self.changed_files.add("redundant_data.json")
+        elif not moved and all(
+                previous_index.entries[position][:2] == current_index.entries[position][:2]
+                for key in changed for position in current_index.by_key.get(key, ())):
+            if patch_results(self.redundant_data, redundant_changes):
+                self.changed_files.add("redundant_data.json")
+        else:
+            self.redundant_data = merge_row_results(current_index.entries, changed_positions, redundant_changes,
+                                                    self.redundant_data)
+            self.changed_files.add("redundant_data.json")
+
+    def save(self):
+        os.makedirs(self.data_folder, exist_ok=True)
+        for file_name, results in (("result_reg_data.json", self.result_reg_data),
+                                   ("compared_result_reg_data.json", self.compared_result_reg_data),
+                                   ("redundant_data.json", self.redundant_data)):
+            file_path = os.path.join(self.data_folder, file_name)
+            # The GUI, the drift monitor and run_registry_main write the same files: a file another writer
+            # replaced since this session saved it is written again, even when its results did not change
+            saved_stamp = self.saved_stamps.get(file_name)
+            if file_name not in self.changed_files and saved_stamp is not None and file_stamp(file_path) == saved_stamp:
+                continue
+            self._timed('save results', write_json_file, results, file_path)
+            self.saved_stamps[file_name] = file_stamp(file_path)
+
+    def run(self):
+        if not self.scanned:
+            self.scan()
+        self.load_golden()
+        self.compare()
+        self.save()
+        return self
+
+    def timing_summary(self):
+        total = sum(self.timings.values())
+        phases = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in self.timings.items())
+        if self.changed_keys is None and self.differing_paths is not None:
+            compared = f"full compare, {len(self.differing_paths)} paths differ from the golden file"
+        elif self.changed_keys is None:
+            compared = "full compare"
+        else:
+            compared = f"{len(self.changed_keys)} changed keys"
+        return f"Registry compare took {total:.3f}s, {compared} ({phases})"
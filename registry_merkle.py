@@ -0,0 +1,167 @@
+'''Merkle digests of registry snapshots.
+
+MerkleTree gives every key path of a snapshot (a node of its PathTrie, see
+registry_trie.py: lowercased, like the compare matches paths) two digests:
+
+    own      digest of the key's entries, in snapshot order
+    subtree  digest of the key's own digest and the sorted (key name, subtree
+             digest) pairs of its subkeys
+
+and the trie's root above the first key names has the subtree digest of the
+whole snapshot.
+
+differing_paths walks the golden file's trie and a snapshot's trie together
+from the root, key name by key name, and only goes down into subtrees whose
+digests differ: on a machine that matches the golden file it stops after
+comparing the two roots.
+
+Every status the compare gives to an entry only depends on the entries of the
+same lowercased path, except the password 'Not Exist' check, which counts the
+named values of the whole snapshot. So where a path's own entries are equal in
+the golden file and the snapshot, the results of its entries are the results of
+comparing the golden file with itself, computed once per golden file (see
+golden_index.py). compare_by_digest only runs the compare for the paths that
+differ and the password values, and takes the other results from there.
+
+The own digest hashes the entries in order, not sorted: when a key has several
+values that can match a golden value (a blank name matches any name), the
+first one in the snapshot is the one reported.
+'''
+
+import hashlib
+
+from registry_compare import (CurrentRegistryIndex, generate_compared_results_indexed, generate_reg_data_indexed,
+                              generate_redundant_data_indexed, merge_row_results)
+from registry_trie import ROOT, PathTrie
+
+
+def entries_digest(entries):
+    # repr keeps '1' and 1 (or a string and a one item list) apart, like == does
+    return hashlib.blake2b(repr(entries).encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class MerkleTree:
+    def __init__(self, paths, own, subtree, positions_by_node=None):
+        # PathTrie of the snapshot's key paths
+        self.paths = paths
+        # node id -> digest of its entries, for the nodes that have entries
+        self.own = own
+        # node id -> digest of the node's entries and everything below it
+        self.subtree = subtree
+        # node id -> positions of its entries in the snapshot
+        self.positions_by_node = positions_by_node
+
+    @classmethod
+    def build(cls, entries):
+        paths = PathTrie()
+        positions_by_node = {}
+        for position, entry in enumerate(entries):
+            try:
+                path, name, data, reg_type = entry
+            except ValueError:
+                raise ValueError(f"Registry item has unexpected structure: {entry}")
+            positions_by_node.setdefault(paths.node(path), []).append(position)
+        return cls.from_positions(entries, paths, positions_by_node)
+
+    # Tree of the entries of a CurrentRegistryIndex, grouped by path node already
+    @classmethod
+    def from_index(cls, current_index):
+        return cls.from_positions(current_index.entries, current_index.paths, current_index.by_path)
+
+    @classmethod
+    def from_positions(cls, entries, paths, positions_by_node):
+        own = {node: entries_digest([entries[position] for position in positions])
+               for node, positions in positions_by_node.items()}
+
+        # Subkeys have higher node ids than their parents, so they are done first
+        subtree = [b''] * len(paths)
+        for node in range(len(paths) - 1, -1, -1):
+            digest = hashlib.blake2b(own.get(node, b''), digest_size=16)
+            for segment, child in sorted(paths.children[node].items()):
+                digest.update(segment.encode('utf-8', 'surrogatepass') + b'\0' + subtree[child])
+            subtree[node] = digest.digest()
+        return cls(paths, own, subtree, positions_by_node)
+
+    # Positions of the entries of a lowercased path
+    def positions(self, lower_path):
+        node = self.paths.find(lower_path)
+        if node is None:
+            return ()
+        return self.positions_by_node.get(node, ())
+
+
+# Lowercased paths whose own entries differ between two trees. Subtrees with the same
+# digest are not entered; `compared` counts the subtree digests that were compared.
+def differing_paths(golden_tree, current_tree):
+    golden_children, current_children = golden_tree.paths.children, current_tree.paths.children
+    differing = set()
+    compared = 0
+    # (golden node id, current node id) of the same path, None where a tree does not have it
+    pending = [(ROOT, ROOT)]
+    while pending:
+        golden_node, current_node = pending.pop()
+        compared += 1
+        if golden_node is not None and current_node is not None and \
+                golden_tree.subtree[golden_node] == current_tree.subtree[current_node]:
+            continue
+
+        golden_subkeys = {} if golden_node is None else golden_children[golden_node]
+        current_subkeys = {} if current_node is None else current_children[current_node]
+        golden_own = None if golden_node is None else golden_tree.own.get(golden_node)
+        current_own = None if current_node is None else current_tree.own.get(current_node)
+        if golden_own != current_own:
+            if golden_node is None:
+                differing.add(current_tree.paths.lower_paths[current_node])
+            else:
+                differing.add(golden_tree.paths.lower_paths[golden_node])
+        for segment in golden_subkeys.keys() | current_subkeys.keys():
+            pending.append((golden_subkeys.get(segment), current_subkeys.get(segment)))
+    return differing, compared
+
+
+# result_reg_data, compared_result_reg_data and redundant_data of the golden file compared with itself
+def self_compare(golden_data):
+    golden_as_current = CurrentRegistryIndex(golden_data)
+    return (generate_reg_data_indexed(golden_data, golden_as_current),
+            generate_compared_results_indexed(golden_data, golden_as_current),
+            generate_redundant_data_indexed(golden_data, golden_data, None, golden_as_current.named))
+
+
+# Same results as the three generate_*_indexed functions, comparing only the entries of the differing
+# paths and the password entries. golden_results are the self_compare results of the golden file.
+def compare_by_digest(golden_data, golden_index, golden_rows_by_path, golden_password_rows, golden_results,
+                      current_index, current_tree, differing):
+    reg_data, compared_data, redundant_data = golden_results
+    entries = current_index.entries
+
+    compared_rows = set()
+    for path in differing:
+        compared_rows.update(golden_rows_by_path.get(path, ()))
+    reg_rows = compared_rows.union(golden_password_rows)
+
+    reg_changes = generate_reg_data_indexed([golden_data[row] for row in sorted(reg_rows)], current_index)
+    compared_changes = generate_compared_results_indexed([golden_data[row] for row in sorted(compared_rows)],
+                                                         current_index)
+    # Golden rows that share a result key (like 'A\\B' 'C' and 'A' 'B\\C') leave the self compare with
+    # the results of the last of them only, so the redundant results of the snapshot are compared in full
+    if len(reg_data) < len(golden_data):
+        return (merge_row_results(golden_data, reg_rows, reg_changes, reg_data),
+                merge_row_results(golden_data, compared_rows, compared_changes, compared_data),
+                generate_redundant_data_indexed(golden_data, entries, golden_index, current_index.named))
+
+    # Every golden row has its result key in the self compare results already, in golden file order
+    result_reg_data = dict(reg_data)
+    result_reg_data.update(reg_changes)
+    compared_result_reg_data = dict(compared_data)
+    compared_result_reg_data.update(compared_changes)
+
+    changed_positions = set(current_index.password_positions)
+    for path in differing:
+        changed_positions.update(current_tree.positions(path))
+    redundant_changes = generate_redundant_data_indexed(
+        golden_data, [entries[position] for position in sorted(changed_positions)], golden_index,
+        current_index.named)
+
+    # redundant_data follows the snapshot order
+    return result_reg_data, compared_result_reg_data, merge_row_results(entries, changed_positions,
+                                                                        redundant_changes, redundant_data)
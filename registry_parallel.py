@@ -0,0 +1,162 @@
+'''Sharded registry comparison over a process pool.
+
+The golden file and current pc entries are split into shards by a hash of the
+lowercased (path, name), so every entry that can be compared with a golden
+entry lands in the golden entry's shard. Two things cross shard boundaries:
+
+    blank-name current values   they match any name of their path, so every
+                                shard gets them (only their own shard reports
+                                them in redundant_data)
+    password 'Not Exist'        depends on the named values of the whole
+                                snapshot, each shard gets the counts it needs
+
+Each shard is compared by the functions of registry_compare in a worker
+process, and the partial result dicts are merged back in golden file order
+(scan order for redundant_data), so the result is the same as one process.
+
+The workers are spawned (worker_pool), on every platform, and run module-level
+functions of importable modules. A spawned worker also runs the parent's
+__main__ script again, unless its __spec__ names a __main__ module: main.py
+declares one, as it opens the GUI when it is run.
+'''
+
+import multiprocessing
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from registry_compare import (CurrentRegistryIndex, NamedEntryCounts, PASSWORD_NAMES, index_golden, registry_key,
+                              generate_compared_results_indexed, generate_reg_data_indexed,
+                              generate_redundant_data_indexed)
+
+# Below this many golden + current entries the compare stays in one process,
+# starting the workers and sending them the shards costs more than it saves
+PARALLEL_THRESHOLD = 50000
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+# Shard of a (path, name), the same in every process (hash() of a str is not)
+def shard_of(path, name, shard_count):
+    lower_path, lower_name = registry_key(path, name)
+    return zlib.crc32(f"{lower_path}\\{lower_name}".encode('utf-8', 'surrogatepass')) % shard_count
+
+
+# Only the counts has_other_named_entry reads for these paths
+def trim_named_counts(named, lower_paths):
+    trimmed = NamedEntryCounts()
+    trimmed.named_total = named.named_total
+    trimmed.password_by_name = named.password_by_name
+    trimmed.password_by_path_name = named.password_by_path_name
+    trimmed.named_by_path = {path: named.named_by_path[path] for path in lower_paths if path in named.named_by_path}
+    return trimmed
+
+
+class Shard:
+    def __init__(self):
+        self.golden_entries = []
+        # Current entries of the shard plus the blank-name entries of other shards, in scan order
+        self.current_entries = []
+        # True for the entries that belong to this shard
+        self.own = []
+        # Lowercased paths that the password checks look up
+        self.password_paths = set()
+
+
+# The shards, and the shard number of every golden and current entry
+def split_shards(golden_data, current_pc_reg_data, shard_count):
+    shards = [Shard() for _ in range(shard_count)]
+    golden_shards = []
+    current_shards = []
+
+    for entry in golden_data:
+        try:
+            path, name, data, reg_type = entry
+        except ValueError:
+            raise ValueError(f"Registry item has unexpected structure: {entry}")
+        number = shard_of(path, name, shard_count)
+        golden_shards.append(number)
+        shard = shards[number]
+        shard.golden_entries.append(entry)
+        if name in PASSWORD_NAMES:
+            shard.password_paths.add(path.lower())
+
+    for entry in current_pc_reg_data:
+        try:
+            path, name, data, reg_type = entry
+        except ValueError:
+            raise ValueError(f"Registry item has unexpected structure: {entry}")
+        own_shard = shard_of(path, name, shard_count)
+        current_shards.append(own_shard)
+        if name == "":
+            for number, shard in enumerate(shards):
+                shard.current_entries.append(entry)
+                shard.own.append(number == own_shard)
+        else:
+            shard = shards[own_shard]
+            shard.current_entries.append(entry)
+            shard.own.append(True)
+            if name in PASSWORD_NAMES:
+                shard.password_paths.add(path.lower())
+
+    return shards, golden_shards, current_shards
+
+
+# Worker: the three result dicts of one shard
+def compare_shard(golden_entries, current_entries, own, named):
+    current_index = CurrentRegistryIndex(current_entries)
+    # The password checks count the named values of the whole snapshot, not only this shard's
+    current_index.named = named
+
+    result_reg_data = generate_reg_data_indexed(golden_entries, current_index)
+    compared_result_reg_data = generate_compared_results_indexed(golden_entries, current_index)
+    redundant_data = generate_redundant_data_indexed(
+        golden_entries, [entry for entry, is_own in zip(current_entries, own) if is_own],
+        index_golden(golden_entries), named)
+    return result_reg_data, compared_result_reg_data, redundant_data
+
+
+# The dict of the entries' results in the order of the entries. Result keys that repeat keep
+# their first position and the last value, like writing them into one dict does.
+def merge_results(entries, shard_numbers, shard_results):
+    merged = {}
+    for (path, name, data, reg_type), number in zip(entries, shard_numbers):
+        result_key = f"{path}\\{name}"
+        merged[result_key] = shard_results[number][result_key]
+    return merged
+
+
+# Process pool of `workers` spawned workers, for module-level functions of importable modules
+def worker_pool(workers):
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+# result_reg_data, compared_result_reg_data and redundant_data of a golden file and a current pc snapshot.
+# `named` can be the counts of an existing CurrentRegistryIndex of the snapshot.
+def compare_sharded(golden_data, current_pc_reg_data, workers=None, threshold=PARALLEL_THRESHOLD, named=None):
+    if workers is None:
+        workers = default_workers()
+
+    if workers <= 1 or len(golden_data) + len(current_pc_reg_data) < threshold:
+        current_index = CurrentRegistryIndex(current_pc_reg_data)
+        return (generate_reg_data_indexed(golden_data, current_index),
+                generate_compared_results_indexed(golden_data, current_index),
+                generate_redundant_data_indexed(golden_data, current_index.entries, None, current_index.named))
+
+    if named is None:
+        named = NamedEntryCounts()
+        for path, name, data, reg_type in current_pc_reg_data:
+            named.add(path, name)
+
+    shards, golden_shards, current_shards = split_shards(golden_data, current_pc_reg_data, workers)
+    with worker_pool(workers) as executor:
+        futures = [executor.submit(compare_shard, shard.golden_entries, shard.current_entries, shard.own,
+                                   trim_named_counts(named, shard.password_paths))
+                   for shard in shards]
+    shard_results = [future.result() for future in futures]
+
+    return (merge_results(golden_data, golden_shards, [results[0] for results in shard_results]),
+            merge_results(golden_data, golden_shards, [results[1] for results in shard_results]),
+            merge_results(current_pc_reg_data, current_shards, [results[2] for results in shard_results]))
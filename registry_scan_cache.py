@@ -0,0 +1,130 @@
+'''Last-write-time cache of the registry scan.
+
+QueryInfoKey returns the time a key was last written along with its subkey and
+value counts. ScanCache keeps, per key path, that time with the key's subkey
+names and values as the last scan read them, and walk_registry / ParallelScan
+(registry_walker.py) reuse them while the time is unchanged instead of calling
+EnumKey and EnumValue again.
+
+Windows updates a key's last write time when its values change or a subkey is
+created or deleted directly under it, not when something deeper changes. So a
+rescan still opens every key for its QueryInfoKey, but only enumerates the keys
+that changed; the time of a rescan grows with the changed keys and values
+instead of every value under MV Technology.
+
+A key is only stored when it was read without errors and its last write time is
+a little older than the scan (a key written again in the same clock tick would
+keep its time). A key that failed to open or enumerate is left out and read
+again next time, and a cache file that does not load is dropped.
+
+The cache is written with marshal like the golden index (golden_index.py).
+'''
+
+import marshal
+import os
+import sys
+import threading
+import time
+import zlib
+
+# Bump when the content of the cache changes
+CACHE_FORMAT = 1
+
+# FILETIME (100 ns since 1601) of the unix epoch
+FILETIME_EPOCH = 116444736000000000
+# Keys written less than this long (in 100 ns) before the scan started are read again next time
+RECENT_WRITE = 2 * 10 ** 7
+
+
+def filetime_now():
+    return time.time_ns() // 100 + FILETIME_EPOCH
+
+
+class ScanCache:
+    def __init__(self, cache_file, root_path, keys=None):
+        self.cache_file = cache_file
+        self.root_path = root_path
+        # key path -> (last write time, subkey names, value entries) of the last complete scan
+        self.previous = keys if keys is not None else {}
+        # The same for the keys read by the scan in progress
+        self.keys = {}
+        self.scan_started = filetime_now()
+        self.hits = 0
+        self.misses = 0
+        # Threads of a ParallelScan count their lookups
+        self._counter_lock = threading.Lock()
+
+    def begin(self):
+        self.keys = {}
+        self.scan_started = filetime_now()
+        self.hits = 0
+        self.misses = 0
+
+    # (subkey names, value entries) of a key whose last write time is unchanged, else None
+    def lookup(self, path, last_write):
+        cached = self.previous.get(path)
+        if cached is None or cached[0] != last_write:
+            with self._counter_lock:
+                self.misses += 1
+            return None
+        # Still valid, keep it for the next scan
+        self.keys[path] = cached
+        with self._counter_lock:
+            self.hits += 1
+        return cached[1], cached[2]
+
+    def store(self, path, last_write, subkey_names, values):
+        if last_write > self.scan_started - RECENT_WRITE:
+            return
+        # Threads of a ParallelScan store different paths, a dict item assignment needs no lock
+        self.keys[path] = (last_write, subkey_names, values)
+
+    # The scan read every key: its keys replace the cached ones and are saved
+    def finish(self):
+        self.previous = self.keys
+        self.keys = {}
+        try:
+            self.save()
+        except OSError as e:
+            print(f"Error writing registry scan cache {self.cache_file}: {e}")
+
+    def save(self):
+        content = {
+            'format': CACHE_FORMAT,
+            'python': sys.version_info[:2],
+            'root': self.root_path,
+            'keys': self.previous,
+        }
+        # Write to a temp file first so a crash never leaves a half written cache behind
+        temp_file = self.cache_file + ".temp"
+        with open(temp_file, 'wb') as file:
+            file.write(marshal.dumps(content))
+        os.replace(temp_file, self.cache_file)
+
+    def summary(self):
+        return f"Registry scan cache: {self.hits} keys unchanged, {self.misses} keys read"
+
+
+# File name of the cache of a registry root, in the data folder
+def cache_file_name(root_path):
+    return f"registry_scan_{zlib.crc32(root_path.lower().encode('utf-8')):08x}.cache"
+
+
+# The cache of the scans of root_path saved in cache_file, empty when there is none or it is not usable
+def load_scan_cache(cache_file, root_path):
+    try:
+        with open(cache_file, 'rb') as file:
+            content = marshal.loads(file.read())
+        # marshal data is only readable by the Python version that wrote it
+        if content.get('format') != CACHE_FORMAT or tuple(content.get('python', ())) != sys.version_info[:2]:
+            raise ValueError("written by another version")
+        if content.get('root') != root_path:
+            raise ValueError(f"written for {content.get('root')}")
+        keys = content['keys']
+        if not isinstance(keys, dict):
+            raise ValueError("no keys")
+    except (OSError, ValueError, EOFError, TypeError, KeyError, AttributeError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Registry scan cache {cache_file} is not usable, reading every key: {e}")
+        keys = {}
+    return ScanCache(cache_file, root_path, keys)
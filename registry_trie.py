@@ -0,0 +1,139 @@
+'''Key path trie of registry snapshots.
+
+Every value of a snapshot repeats the full path of its key, and the compare
+lowercased that path again for every lookup. PathTrie keeps each key path once,
+as a node:
+
+    node id      0 for the root above the first key names, then one per
+                 lowercased key path, parents before their subkeys
+    segment      the lowercased key name, interned
+    lower path   the lowercased path, interned: the one string of the key
+                 that every lookup shares
+
+A path is lowercased the way the compare matches paths (str.lower of the whole
+path), so all the spellings of a key are one node, and node() looks a spelling
+it has seen up in a dict without lowercasing it again. An empty path is the
+root's '' subkey, like an empty key name anywhere else.
+
+Value rows reference their key by node id: CurrentRegistryIndex (see
+registry_compare.py) keeps the node of every row and groups the rows by node,
+the Merkle digests (registry_merkle.py) are computed over the trie, and the
+redundant keys table of the summary page keeps the node id of every row
+(PathRows), so a path search matches each key once (containing) instead of
+lowercasing the path of every row. The rows keep their path string too, the
+result files and tables show it.
+
+"Everything under this key" is a subtree of the trie (under), not a scan of
+the rows.
+'''
+
+import sys
+
+ROOT = 0
+
+
+class PathTrie:
+    def __init__(self, segments=None, parents=None, children=None, lower_paths=None):
+        # node id -> lowercased key name, parent node id (None for the root), {segment: node id} of its
+        # subkeys and lowercased path
+        self.segments = [''] if segments is None else segments
+        self.parents = [None] if parents is None else parents
+        self.children = [{}] if children is None else children
+        self.lower_paths = [''] if lower_paths is None else lower_paths
+        # path as read -> node id, and lowercased path -> node id
+        self.nodes = {}
+        self.lower_nodes = {lower_path: node for node, lower_path in enumerate(self.lower_paths) if node != ROOT}
+
+    def __len__(self):
+        return len(self.segments)
+
+    # Node id of a path in any case, added with its parents when it is new
+    def node(self, path):
+        node = self.nodes.get(path)
+        if node is None:
+            node = self._add(path.lower())
+            self.nodes[path] = node
+        return node
+
+    def _add(self, lower_path):
+        node = self.lower_nodes.get(lower_path)
+        if node is not None:
+            return node
+
+        # The nearest parent path the trie has, then its missing subkeys
+        missing = []
+        parent_path = lower_path
+        while True:
+            parent_path, separator, segment = parent_path.rpartition('\\')
+            missing.append(segment)
+            if not separator:
+                node = ROOT
+                break
+            node = self.lower_nodes.get(parent_path)
+            if node is not None:
+                break
+
+        path = parent_path if separator else None
+        for segment in reversed(missing):
+            child = self.children[node].get(segment)
+            path = segment if path is None else f"{path}\\{segment}"
+            if child is None:
+                child = len(self.segments)
+                segment = sys.intern(segment)
+                path = sys.intern(path)
+                self.segments.append(segment)
+                self.parents.append(node)
+                self.children.append({})
+                self.lower_paths.append(path)
+                self.children[node][segment] = child
+                self.lower_nodes[path] = child
+            node = child
+        return node
+
+    # Node id of a path in any case, None when the trie has no such key
+    def find(self, path):
+        node = self.nodes.get(path)
+        if node is not None:
+            return node
+        return self.lower_nodes.get(path.lower())
+
+    # Node ids of a key and every key below it, parents first
+    def under(self, node):
+        found = []
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            found.append(node)
+            pending.extend(self.children[node].values())
+        return found
+
+    # Node ids of the keys whose lowercased path contains text (lowercased). Below a key that
+    # contains it every key does, so its subtree is taken whole; without a backslash the text
+    # can only be inside one key name, so only the names of the other keys are searched.
+    def containing(self, text):
+        in_segment = '\\' not in text
+        matching = set()
+        pending = list(self.children[ROOT].values())
+        while pending:
+            node = pending.pop()
+            if text in (self.segments[node] if in_segment else self.lower_paths[node]):
+                matching.update(self.under(node))
+            else:
+                pending.extend(self.children[node].values())
+        return matching
+
+
+# Rows of a table with the node id of the path in each, to filter the rows by path
+# (paths can be a trie that has most of the paths already)
+class PathRows:
+    def __init__(self, rows, path_column=1, paths=None):
+        self.rows = rows
+        self.paths = PathTrie() if paths is None else paths
+        nodes = self.paths.nodes
+        # node() is only called for a path the trie has not seen (no path is the root, node 0)
+        self.row_nodes = [nodes.get(row[path_column]) or self.paths.node(row[path_column]) for row in rows]
+
+    # Rows whose lowercased path contains text (lowercased)
+    def containing(self, text):
+        matching = self.paths.containing(text)
+        return [row for row, node in zip(self.rows, self.row_nodes) if node in matching]
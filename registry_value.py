@@ -0,0 +1,131 @@
+'''Compact registry value records.
+
+A snapshot read from the registry or from JSON is a list of [path, name, data,
+type] lists: every entry carries its own copy of the path, name and type
+strings. RegistryValue keeps one value in __slots__ instead:
+
+    path, name   interned, so the values of one key share one path string
+    type_code    index of the type string in TYPE_NAMES
+    data         the data normalized the way the snapshots store it (DWORD and
+                 QWORD as 0x hex strings, binary data as "xx xx" hex, multi
+                 strings as a list)
+    digest       hash of the data, equal for data that compares equal
+
+all set once when the value is read. Two values hold the same data and type
+when their type codes and digests are equal (same_value).
+
+A RegistryValue unpacks, indexes and prints like the [path, name, data, type]
+list it replaces, so the compare functions of registry_compare take either.
+as_list gives the list back for JSON.
+'''
+
+import sys
+
+from reg_export import REG_DWORD, REG_QWORD, REG_TYPE_NAMES
+
+# Type strings in code order: the winreg types first, others ('N/A' in golden files) as they turn up
+TYPE_NAMES = [REG_TYPE_NAMES[code] for code in sorted(REG_TYPE_NAMES)]
+TYPE_CODES = {type_name: code for code, type_name in enumerate(TYPE_NAMES)}
+# Attribute of each item of the [path, name, data, type] list (type goes through TYPE_NAMES)
+ITEM_FIELDS = ('path', 'name', 'data', 'type')
+
+
+def type_code(type_name):
+    code = TYPE_CODES.get(type_name)
+    if code is None:
+        # setdefault keeps one code per name when two threads add the same name
+        code = TYPE_CODES.setdefault(type_name, len(TYPE_NAMES))
+        if code == len(TYPE_NAMES):
+            TYPE_NAMES.append(type_name)
+    return code
+
+
+# Data as the snapshots store it: winreg output (bytes, int) is formatted like registry_walker.format_value
+def normalize_data(data, type_name):
+    if isinstance(data, (bytes, bytearray)):
+        return data.hex(' ')
+    if isinstance(data, int) and not isinstance(data, bool):
+        if type_name == REG_TYPE_NAMES[REG_DWORD]:
+            return f'0x{data:08x}'
+        if type_name == REG_TYPE_NAMES[REG_QWORD]:
+            return f'0x{data:016x}'
+    if isinstance(data, tuple):
+        return list(data)
+    return data
+
+
+# Same for data that compares equal, like hash() (multi strings are lists)
+def data_hash(data):
+    if isinstance(data, list):
+        return hash(tuple(data))
+    try:
+        return hash(data)
+    except TypeError:
+        return hash(repr(data))
+
+
+class RegistryValue:
+    __slots__ = ('path', 'name', 'type_code', 'data', 'digest')
+
+    def __init__(self, path, name, data, type_name):
+        self.path = sys.intern(path)
+        self.name = sys.intern(name)
+        self.type_code = type_code(type_name)
+        self.data = normalize_data(data, type_name)
+        self.digest = data_hash(self.data)
+
+    @classmethod
+    def from_entry(cls, entry):
+        try:
+            path, name, data, reg_type = entry
+        except ValueError:
+            raise ValueError(f"Registry item has unexpected structure: {entry}")
+        return cls(path, name, data, reg_type)
+
+    @property
+    def type(self):
+        return TYPE_NAMES[self.type_code]
+
+    def same_value(self, other):
+        return self.type_code == other.type_code and self.digest == other.digest
+
+    def as_list(self):
+        return [self.path, self.name, self.data, TYPE_NAMES[self.type_code]]
+
+    # The [path, name, data, type] list protocol
+
+    def __iter__(self):
+        return iter((self.path, self.name, self.data, TYPE_NAMES[self.type_code]))
+
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.as_list()[index]
+        return getattr(self, ITEM_FIELDS[index])
+
+    def __eq__(self, other):
+        if isinstance(other, RegistryValue):
+            return (self.path == other.path and self.name == other.name and self.same_value(other)
+                    and self.data == other.data)
+        if isinstance(other, list):
+            return self.as_list() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.as_list())
+
+    # Type codes are numbered per process, a worker process gets the type string
+    def __reduce__(self):
+        return RegistryValue.from_entry, (self.as_list(),)
+
+
+def to_registry_values(entries):
+    return [RegistryValue.from_entry(entry) for entry in entries]
+
+
+def to_lists(values):
+    return [value.as_list() if isinstance(value, RegistryValue) else list(value) for value in values]
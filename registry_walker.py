@@ -0,0 +1,267 @@
+'''Iterative registry walker.
+
+walk_registry yields the (path, name, data, type) tuples of a key and all its
+subkeys as it reads them, in the same order and format as the recursive reader
+of main.py used to return them:
+
+    - the entries of each subkey's subtree, then (subkey path, "Default", '', 'REG_SZ')
+    - then the key's own values
+
+A stack holds one open handle per level instead of one call (and one result
+list copied into its parent's) per level, and QueryInfoKey gives the number of
+subkeys and values up front instead of calling EnumKey/EnumValue until they
+raise OSError.
+
+`backend` is the winreg module, or anything with the same OpenKey, CloseKey,
+EnumKey, EnumValue and QueryInfoKey functions (see fake_registry.py).
+
+ParallelScan reads the subtrees below the first levels of a key on a thread
+pool (winreg calls spend their time in the kernel, outside the GIL) and puts
+the entries back together in the order walk_registry yields them.
+
+Both take an optional ScanCache (registry_scan_cache.py): the subkey names and
+values of a key whose last write time is unchanged since the last scan come
+from the cache instead of EnumKey / EnumValue. `prune(subkey path)` returns True
+for the subkeys that are skipped, with everything below them, without opening
+them (see scan_profiles.py), and `access` replaces KEY_READ, to open the keys of
+another registry view for example.
+'''
+
+import ntpath
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from reg_export import REG_TYPE_NAMES
+
+REG_BINARY, REG_DWORD, REG_QWORD = 3, 4, 11
+
+
+def print_error(message):
+    print(message)
+
+
+# Data of a value as stored in the snapshots: DWORD/QWORD as 0x hex strings, binary data as "xx xx"
+def format_value(value_data, value_type):
+    if value_type == REG_DWORD:
+        return f'0x{value_data:08x}'
+    if value_type == REG_QWORD:
+        return f'0x{value_data:016x}'
+    if value_type == REG_BINARY:
+        # winreg gives None for an empty binary value, which raises here like it always did
+        return value_data.hex(' ')
+    return value_data
+
+
+class KeyFrame:
+    def __init__(self, path, handle, subkey_count, value_count, default_name, last_write=None):
+        self.path = path
+        self.handle = handle
+        self.subkey_count = subkey_count
+        self.value_count = value_count
+        # Last write time from QueryInfoKey, None when it could not be queried
+        self.last_write = last_write
+        self.subkey_names = []
+        self.next_subkey = 0
+        # Value entries from the scan cache, None when they are read from the key
+        self.values = None
+        # Name of the entry added after each subkey (only the walk's root key can use another name)
+        self.default_name = default_name
+        # Reading the key failed part way, its values are not read
+        self.failed = False
+
+
+def open_frame(backend, root_key, path, default_name, on_error, access=None):
+    try:
+        handle = backend.OpenKey(root_key, path, 0, backend.KEY_READ if access is None else access)
+    except Exception as e:
+        on_error(f"Error reading key: {e}")
+        return None
+
+    try:
+        subkey_count, value_count, last_write = backend.QueryInfoKey(handle)
+    except OSError:
+        # Enumerate until EnumKey / EnumValue run out
+        subkey_count = value_count = sys.maxsize
+        last_write = None
+    except BaseException:
+        # No frame holds the handle yet
+        backend.CloseKey(handle)
+        raise
+    return KeyFrame(path, handle, subkey_count, value_count, default_name, last_write)
+
+
+def read_values(backend, frame):
+    path, handle = frame.path, frame.handle
+    for value_index in range(frame.value_count):
+        try:
+            value_name, value_data, value_type = backend.EnumValue(handle, value_index)
+            value_data = format_value(value_data, value_type)
+        except Exception:
+            # The key changed while it was read, or a value could not be converted: stop at this value
+            return
+        yield path, value_name, value_data, REG_TYPE_NAMES.get(value_type, str(value_type))
+
+
+# Subkey names of an open key, in enumeration order
+def list_subkeys(backend, frame, on_error):
+    names = []
+    for index in range(frame.subkey_count):
+        try:
+            names.append(backend.EnumKey(frame.handle, index))
+        except OSError:
+            break
+        except Exception as e:
+            on_error(f"Error reading key: {e}")
+            frame.failed = True
+            break
+    return names
+
+
+# Subkey names (and values) of a newly opened key, from the cache while its last write time is unchanged
+def load_subkeys(backend, frame, cache, on_error):
+    cached = None
+    if cache is not None and frame.last_write is not None:
+        cached = cache.lookup(frame.path, frame.last_write)
+    if cached is not None:
+        frame.subkey_names, frame.values = cached
+    else:
+        frame.subkey_names = list_subkeys(backend, frame, on_error)
+
+
+# Value entries of a key whose subkeys are done; what was read is stored in the cache
+def frame_values(backend, frame, cache):
+    if frame.values is not None:
+        return frame.values
+    if frame.failed:
+        return ()
+    if cache is None or frame.last_write is None:
+        return read_values(backend, frame)
+    values = list(read_values(backend, frame))
+    cache.store(frame.path, frame.last_write, frame.subkey_names, values)
+    return values
+
+
+# Stream the entries of `path` under root_key and all its subkeys
+def walk_registry(backend, root_key, path, default_name='Default', on_error=print_error, cache=None, prune=None,
+                  access=None):
+    root = open_frame(backend, root_key, path, default_name, on_error, access)
+    if root is None:
+        return
+    stack = [root]
+
+    try:
+        load_subkeys(backend, root, cache, on_error)
+        while stack:
+            frame = stack[-1]
+
+            if frame.next_subkey < len(frame.subkey_names):
+                subkey_path = ntpath.join(frame.path, frame.subkey_names[frame.next_subkey])
+                frame.next_subkey += 1
+                if prune is not None and prune(subkey_path):
+                    continue
+                child = open_frame(backend, root_key, subkey_path, 'Default', on_error, access)
+                if child is not None:
+                    stack.append(child)
+                    load_subkeys(backend, child, cache, on_error)
+                else:
+                    yield subkey_path, frame.default_name, '', 'REG_SZ'
+                continue
+
+            # Every subkey is done: the key's values, then its entry in the parent
+            stack.pop()
+            try:
+                yield from frame_values(backend, frame, cache)
+            finally:
+                backend.CloseKey(frame.handle)
+            if stack:
+                yield frame.path, stack[-1].default_name, '', 'REG_SZ'
+    finally:
+        # The caller stopped early
+        for frame in stack:
+            backend.CloseKey(frame.handle)
+
+
+# Same entries as walk_registry, with the subtrees `depth` levels below path read by `workers` threads.
+# Each thread opens its own handles; timings holds the seconds each subtree took to read.
+class ParallelScan:
+    def __init__(self, backend, root_key, path, workers=8, depth=1, default_name='Default', on_error=print_error,
+                 cache=None, prune=None, access=None):
+        self.backend = backend
+        self.root_key = root_key
+        self.path = path
+        self.workers = workers
+        self.depth = depth
+        self.default_name = default_name
+        self.cache = cache
+        self.prune = prune
+        self.access = access
+        self._on_error = on_error
+        self._error_lock = threading.Lock()
+
+        # subtree path -> (entry count, seconds), in the order of the scan
+        self.timings = {}
+        self.total_seconds = 0
+
+    def on_error(self, message):
+        # Threads share the error log
+        with self._error_lock:
+            self._on_error(message)
+
+    def read(self):
+        self.timings = {}
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if self.depth <= 0:
+                parts = [executor.submit(self._read_subtree, self.path, self.default_name)]
+            else:
+                parts = self._plan(executor, self.path, self.default_name, 1)
+
+            entries = []
+            for part in parts:
+                if isinstance(part, list):
+                    entries.extend(part)
+                    continue
+                subtree_path, subtree_entries, seconds = part.result()
+                self.timings[subtree_path] = (len(subtree_entries), seconds)
+                entries.extend(subtree_entries)
+        self.total_seconds = time.perf_counter() - start
+        return entries
+
+    def _read_subtree(self, path, default_name):
+        start = time.perf_counter()
+        entries = list(walk_registry(self.backend, self.root_key, path, default_name, self.on_error, self.cache,
+                                     self.prune, self.access))
+        return path, entries, time.perf_counter() - start
+
+    # Futures of the subtrees and lists of the entries read here, in walk_registry order
+    def _plan(self, executor, path, default_name, level):
+        backend = self.backend
+        frame = open_frame(backend, self.root_key, path, default_name, self.on_error, self.access)
+        if frame is None:
+            return []
+
+        parts = []
+        try:
+            load_subkeys(backend, frame, self.cache, self.on_error)
+            for subkey_name in frame.subkey_names:
+                subkey_path = ntpath.join(path, subkey_name)
+                if self.prune is not None and self.prune(subkey_path):
+                    continue
+                if level >= self.depth:
+                    parts.append(executor.submit(self._read_subtree, subkey_path, 'Default'))
+                else:
+                    parts.extend(self._plan(executor, subkey_path, 'Default', level + 1))
+                parts.append([(subkey_path, default_name, '', 'REG_SZ')])
+            parts.append(list(frame_values(backend, frame, self.cache)))
+        finally:
+            backend.CloseKey(frame.handle)
+        return parts
+
+    def timing_summary(self, slowest=5):
+        ranked = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)[:slowest]
+        subtrees = ", ".join(f"{path} {seconds:.3f}s ({entry_count} entries)"
+                             for path, (entry_count, seconds) in ranked)
+        return (f"Registry scan took {self.total_seconds:.3f}s on {self.workers} threads, "
+                f"{len(self.timings)} subtrees, slowest: {subtrees}")
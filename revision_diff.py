@@ -0,0 +1,179 @@
+'''Golden file revision diff.
+
+diff_revisions produces the Add/Delete/Edit action list of the Page 4 restore
+window (compare_golden_and_rev_json) with one dict lookup per entry instead of
+a scan of the other file.
+
+three_way_diff compares two golden file revisions with the current pc in one
+pass, to tell a change of the golden file from a change of the machine:
+
+    In Sync         the pc has the value of the new revision
+    Golden Drift    the pc still has the value of the old revision
+    Machine Drift   the pc has neither value
+
+The pc has a revision's value when the registry compare passes it
+(registry_compare.match_status): 'N/A' data on either side matches any value,
+and a password only has to exist, whatever its data.
+
+Usage:
+    python revision_diff.py <old revision.json> <new revision.json> <current pc.json> [-o result.json]
+'''
+
+import argparse
+import json
+
+from registry_compare import match_status
+
+ADD, DELETE, EDIT = 'Add', 'Delete', 'Edit'
+IN_SYNC, GOLDEN_DRIFT, MACHINE_DRIFT = 'In Sync', 'Golden Drift', 'Machine Drift'
+
+
+# (path, name) -> first entry with that key, like next(e for e in data if ...) finds it
+def first_entries(registry_data, key=lambda path, name: (path, name)):
+    entries = {}
+    for entry in registry_data:
+        entries.setdefault(key(entry[0], entry[1]), entry)
+    return entries
+
+
+# Same lists as compare_golden_and_rev_json: entries added to / deleted from golden_data
+# by restore_data, and entries whose data or type was edited. Keys are case sensitive.
+def diff_revisions(golden_data, restore_data):
+    golden_entries = first_entries(golden_data)
+    restore_keys = {(entry[0], entry[1]) for entry in restore_data}
+
+    added_deleted_entries = []
+    edited_entries = []
+
+    for path, name, data, reg_type in restore_data:
+        matching_entry = golden_entries.get((path, name))
+
+        if matching_entry:
+            previous_data = matching_entry[2]
+            previous_type = matching_entry[3]
+
+            # If the data or type differs, it's an edit
+            if data != previous_data or reg_type != previous_type:
+                edited_entries.append({
+                    'Registry Key/Subkey Path': path,
+                    'Registry Name': name,
+                    'Previous Data': previous_data,
+                    'Current Data': data,
+                    'Previous Type': previous_type,
+                    'Current Type': reg_type,
+                    'Action': EDIT
+                })
+        else:
+            added_deleted_entries.append({
+                'Registry Key/Subkey Path': path,
+                'Registry Name': name,
+                'Data': data,
+                'Type': reg_type,
+                'Action': ADD
+            })
+
+    for path, name, data, reg_type in golden_data:
+        # In the golden file but not in the restore file, it was deleted
+        if (path, name) not in restore_keys:
+            added_deleted_entries.append({
+                'Registry Key/Subkey Path': path,
+                'Registry Name': name,
+                'Data': data,
+                'Type': reg_type,
+                'Action': DELETE
+            })
+
+    return added_deleted_entries, edited_entries
+
+
+def lowercase_key(path, name):
+    return path.lower(), name.lower()
+
+
+# True when the current pc entry has the value of a revision entry, as the registry compare decides it
+def has_value(revision_entry, current_entry):
+    if revision_entry is None or current_entry is None:
+        return revision_entry is current_entry
+    return match_status(revision_entry[1], revision_entry[2], revision_entry[3],
+                        current_entry[1], current_entry[2], current_entry[3]) != 'Fail'
+
+
+# One row per (path, name) in either golden revision, compared case-insensitively like the
+# registry compare. 'Golden Change' is the Add/Delete/Edit from old_revision to new_revision
+# ('' when unchanged), 'Source' says whether the pc follows the new revision.
+def three_way_diff(old_revision, new_revision, current_pc_reg_data):
+    old_entries = first_entries(old_revision, lowercase_key)
+    new_entries = first_entries(new_revision, lowercase_key)
+    current_entries = first_entries(current_pc_reg_data, lowercase_key)
+
+    def value(entry):
+        return None if entry is None else (entry[2], entry[3])
+
+    rows = []
+    # New revision order first, then the keys the new revision deleted
+    keys = list(new_entries)
+    keys.extend(key for key in old_entries if key not in new_entries)
+    for key in keys:
+        old_entry, new_entry, current_entry = old_entries.get(key), new_entries.get(key), current_entries.get(key)
+        old_value, new_value, current_value = value(old_entry), value(new_entry), value(current_entry)
+
+        if old_value is None:
+            golden_change = ADD
+        elif new_value is None:
+            golden_change = DELETE
+        elif old_value != new_value:
+            golden_change = EDIT
+        else:
+            golden_change = ''
+
+        if has_value(new_entry, current_entry):
+            source = IN_SYNC
+        elif has_value(old_entry, current_entry):
+            source = GOLDEN_DRIFT
+        else:
+            source = MACHINE_DRIFT
+
+        path, name = (new_entry or old_entry)[:2]
+        rows.append({
+            'Registry Key/Subkey Path': path,
+            'Registry Name': name,
+            'Previous Data': '-' if old_value is None else old_value[0],
+            'Previous Type': '-' if old_value is None else old_value[1],
+            'Expected Data': '-' if new_value is None else new_value[0],
+            'Expected Type': '-' if new_value is None else new_value[1],
+            'Current Data': '-' if current_value is None else current_value[0],
+            'Current Type': '-' if current_value is None else current_value[1],
+            'Golden Change': golden_change,
+            'Source': source
+        })
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two golden file revisions with a current pc registry file")
+    parser.add_argument("old_revision")
+    parser.add_argument("new_revision")
+    parser.add_argument("current_pc")
+    parser.add_argument("-o", "--output", help="write the rows to this JSON file")
+    args = parser.parse_args()
+
+    registry_files = []
+    for file_path in (args.old_revision, args.new_revision, args.current_pc):
+        with open(file_path, 'r') as file:
+            registry_files.append(json.load(file))
+
+    rows = three_way_diff(*registry_files)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(rows, file, indent=4)
+
+    counts = {}
+    for row in rows:
+        counts[row['Source']] = counts.get(row['Source'], 0) + 1
+    for source in (IN_SYNC, GOLDEN_DRIFT, MACHINE_DRIFT):
+        print(f"{source}: {counts.get(source, 0)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+'''Registry scan profiles.
+
+A scan profile lists the registry roots a machine type's registry check reads.
+Profiles are declared in scan_profiles.json, by the machine type names of the
+Page 3 dropdown:
+
+    {
+        "MicroAOI": [
+            {"hive": "HKEY_LOCAL_MACHINE", "path": "Software\\\\WOW6432Node\\\\MV Technology",
+             "exclude": ["**\\\\Logs", "**\\\\Cache"]},
+            {"hive": "HKEY_CURRENT_USER", "view": "64", "path": "Software\\\\MV Technology",
+             "include": ["Settings", "Calib*\\\\**"]}
+        ]
+    }
+
+    hive     HKEY_LOCAL_MACHINE (default), HKEY_CURRENT_USER, HKEY_USERS, ...
+    view     "32" or "64" to open the keys in that registry view (KEY_WOW64_32KEY /
+             KEY_WOW64_64KEY), left out for the view of the process
+    include  globs of the keys to read below path, the keys above them are
+             opened to reach them; left out to read every key
+    exclude  globs of the keys not to read, with everything below them
+
+Globs are matched case-insensitively against the key path relative to the root
+path, one backslash separated part at a time: * and ? stay within a part and
+** matches any number of parts. Include beats exclude: a key an include glob
+matches, and the keys above it, are read even where an exclude glob matches
+them; the other keys below an included key can still be excluded. Excluded keys
+are pruned while the registry is walked, so they are never opened.
+
+Entries of HKEY_LOCAL_MACHINE keep their paths as before (relative to the
+hive), entries of other hives start with the hive name. A machine type without a
+profile, or every machine type when the file does not exist, reads
+MV_TECHNOLOGY_ROOT of HKEY_LOCAL_MACHINE like the registry check always did.
+'''
+
+import json
+import ntpath
+from fnmatch import fnmatchcase
+
+from reg_export import MV_TECHNOLOGY_ROOT
+from registry_walker import ParallelScan, print_error, walk_registry
+
+HKEY_LOCAL_MACHINE = 'HKEY_LOCAL_MACHINE'
+HIVES = ('HKEY_CLASSES_ROOT', 'HKEY_CURRENT_USER', 'HKEY_LOCAL_MACHINE', 'HKEY_USERS', 'HKEY_CURRENT_CONFIG')
+# winreg access flags of the views
+VIEW_FLAGS = {'32': 'KEY_WOW64_32KEY', '64': 'KEY_WOW64_64KEY'}
+
+
+# (full, inside, above) of a key path against a glob: the path matches it, some parent of the path (or the
+# path) matches it, or the path is a parent of keys that can match it
+def glob_state(pattern_parts, path_parts):
+    full = inside = above = False
+    pending = [(0, 0)]
+    seen = set()
+    while pending:
+        state = pending.pop()
+        if state in seen:
+            continue
+        seen.add(state)
+        pattern_index, path_index = state
+
+        if pattern_index == len(pattern_parts):
+            inside = True
+            full = full or path_index == len(path_parts)
+            continue
+        part = pattern_parts[pattern_index]
+        if path_index == len(path_parts):
+            above = True
+            if part == '**':
+                pending.append((pattern_index + 1, path_index))
+            continue
+        if part == '**':
+            pending.append((pattern_index + 1, path_index))
+            pending.append((pattern_index, path_index + 1))
+        elif fnmatchcase(path_parts[path_index], part):
+            pending.append((pattern_index + 1, path_index + 1))
+    return full, inside, above
+
+
+def split_glob(pattern):
+    return [part for part in pattern.lower().replace('/', '\\').split('\\') if part]
+
+
+class ScanRoot:
+    def __init__(self, path, hive=HKEY_LOCAL_MACHINE, view=None, include=None, exclude=None):
+        if hive not in HIVES:
+            raise ValueError(f"Unknown registry hive: {hive}")
+        if view is not None and str(view) not in VIEW_FLAGS:
+            raise ValueError(f"Unknown registry view: {view}")
+        self.path = path
+        self.hive = hive
+        self.view = None if view is None else str(view)
+        self.include = [split_glob(pattern) for pattern in include or ()]
+        self.exclude = [split_glob(pattern) for pattern in exclude or ()]
+
+    @property
+    def name(self):
+        view = f" ({self.view}-bit)" if self.view else ""
+        return f"{self.hive}\\{self.path}{view}"
+
+    # Start of the entry paths: nothing for HKEY_LOCAL_MACHINE, like the golden files
+    @property
+    def prefix(self):
+        return '' if self.hive == HKEY_LOCAL_MACHINE else self.hive + '\\'
+
+    def access(self, backend):
+        access = backend.KEY_READ
+        if self.view is not None:
+            access |= getattr(backend, VIEW_FLAGS[self.view])
+        return access
+
+    # True for a key below the root that is not read, nor anything below it
+    def prune(self, path):
+        parts = path[len(self.path) + 1:].lower().split('\\')
+        included = not self.include
+        for pattern in self.include:
+            full, inside, above = glob_state(pattern, parts)
+            # Named by an include glob, or on the way to keys that are
+            if full or above:
+                return False
+            included = included or inside
+        if not included:
+            return True
+        # The key or one of its parents is excluded
+        return any(glob_state(pattern, parts)[1] for pattern in self.exclude)
+
+    # Entries of the root, read on `threads` threads (1: yielded while they are read)
+    def scan(self, backend, threads=1, depth=1, cache=None, on_error=print_error):
+        prune = self.prune if self.include or self.exclude else None
+        with backend.ConnectRegistry(None, getattr(backend, self.hive)) as hkey:
+            if threads > 1:
+                scan = ParallelScan(backend, hkey, self.path, threads, depth, on_error=on_error, cache=cache,
+                                    prune=prune, access=self.access(backend))
+                entries = scan.read()
+                print(scan.timing_summary())
+            else:
+                entries = walk_registry(backend, hkey, self.path, on_error=on_error, cache=cache, prune=prune,
+                                        access=self.access(backend))
+            prefix = self.prefix
+            if not prefix:
+                yield from entries
+            else:
+                for path, name, data, reg_type in entries:
+                    yield prefix + path, name, data, reg_type
+
+
+class ScanProfile:
+    def __init__(self, name, roots):
+        self.name = name
+        self.roots = roots
+
+
+DEFAULT_PROFILE = ScanProfile('Default', [ScanRoot(MV_TECHNOLOGY_ROOT)])
+
+
+def parse_scan_profiles(config):
+    if not isinstance(config, dict):
+        raise ValueError("Scan profiles must be an object of machine type -> roots")
+    profiles = {}
+    for name, roots in config.items():
+        if not isinstance(roots, list) or not roots:
+            raise ValueError(f"Scan profile {name} has no roots")
+        profile_roots = []
+        for root in roots:
+            try:
+                profile_roots.append(ScanRoot(ntpath.normpath(root['path']), root.get('hive', HKEY_LOCAL_MACHINE),
+                                              root.get('view'), root.get('include'), root.get('exclude')))
+            except (KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f"Scan profile {name} has an unexpected root: {root} ({e})")
+        profiles[name] = ScanProfile(name, profile_roots)
+    return profiles
+
+
+class ScanProfiles:
+    def __init__(self, profiles=None):
+        self.profiles = profiles or {}
+
+    # Profile of a machine type, DEFAULT_PROFILE when it has none
+    def get(self, machine_type):
+        return self.profiles.get(machine_type, DEFAULT_PROFILE)
+
+
+def load_scan_profiles(config_file):
+    try:
+        with open(config_file, 'r') as file:
+            config = json.load(file)
+    except FileNotFoundError:
+        return ScanProfiles()
+    return ScanProfiles(parse_scan_profiles(config))
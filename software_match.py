@@ -0,0 +1,411 @@
+'''Software check of Page 1: matching the required programs of software.json
+with the installed programs.
+
+match_item decides whether an installed program is a required one (name
+similarity by fuzz.token_set_ratio, with the matching rules of software.json
+for special cases, see software_rules.py), generate_results gives the status of
+every required program, comparing versions by version_keys.version_key.
+
+generate_results used to call match_item for every required x installed
+program. InstalledNameIndex gives, for a required name, the installed programs
+match_item can match, and only those are passed to match_item:
+
+    - match_item only returns True when the name similarity is at least 70,
+      or the name threshold of a rule of the required name, except for
+      version_at_least rules, which need their version in the installed name
+    - token_set_ratio compares the tokens fuzzywuzzy makes of both names
+      (utils.full_process: lowercased, alphanumeric). Its score is the best
+      ratio of the sorted common tokens and each name's sorted tokens, or of
+      the two names' sorted tokens; a ratio is 2 * matched characters / total
+      length, at most 2 * (characters the strings have in common) / (total
+      length), and 69.5% rounds to 70
+    - names with a common token are found with an inverted index of the
+      installed names' tokens, and kept when that bound reaches the threshold
+    - names without one only have the ratio of the two sorted token strings:
+      only installed names of a near enough length are counted, from a list
+      sorted by length
+
+Every installed program that can match is still scored, in installed order,
+so the results are the ones of scoring every pair.
+
+generate_results reads the matches from the required x installed match matrix
+(match_matrix: the matched installed positions of every required program).
+Every name is normalized once for it (NormalizedName: the strings fuzzywuzzy
+makes of it), and the pairs are scored by the RequirementMatcher of the
+required program, which has the rules of its name selected once. For fleet
+runs on many programs the required programs can be split across a process
+pool (`workers`), like the registry compare (registry_parallel.py).
+match_profiles matches several requirement lists against one inventory in one
+pass (see software_profiles.py).
+
+Usage (benchmark against match_item on every pair on a synthetic inventory):
+    python software_match.py [--installed 5000] [--required 60] [--workers 1]
+'''
+
+import argparse
+import bisect
+import random
+import time
+from collections import Counter
+from functools import cached_property
+from itertools import repeat
+
+from fuzzywuzzy import fuzz, utils
+
+from software_rules import DEFAULT_RULES, DEFAULT_THRESHOLD
+from version_keys import version_at_least, version_key
+
+
+# A similarity of at least threshold as 400 * common >= bound * total length: threshold - 0.5 rounds to it
+def similarity_bound(threshold):
+    return 2 * threshold - 1
+
+
+# Smallest similarity match_item accepts without a rule (69.5%)
+SIMILARITY_BOUND = similarity_bound(DEFAULT_THRESHOLD)
+# Below this many required x installed pairs match_matrix stays in one process
+MATCH_PARALLEL_THRESHOLD = 500000
+
+
+def reaches_bound(common, total_length, bound=SIMILARITY_BOUND):
+    return 400 * common >= bound * total_length
+
+
+# fuzz.token_set_ratio of two names from their processed strings
+def token_set_score(processed1, processed2):
+    # Without processing token_set_ratio gives 100 for two equal strings, also empty ones
+    if not processed1 or not processed2:
+        return 0
+    return fuzz.token_set_ratio(processed1, processed2, full_process=False)
+
+
+# A name normalized once the way match_item's fuzz calls see it: the strings token_set_ratio makes
+# of the lowercased name and of its words
+class NormalizedName:
+    def __init__(self, name):
+        self.name = name
+        self.lower = name.lower()
+        self.processed = utils.full_process(self.lower, force_ascii=True)
+
+    # Only match_item's last case reads it
+    @cached_property
+    def processed_words(self):
+        # match_item passes the words as lists, which fuzzywuzzy processes as str(list)
+        return utils.full_process(self.lower.split(), force_ascii=True)
+
+
+# A normalized name with its tokens and the length and character counts of its sorted token string,
+# which has the characters of every string token_set_ratio compares the name's tokens as
+class IndexedName(NormalizedName):
+    def __init__(self, name):
+        super().__init__(name)
+        self.tokens = frozenset(self.processed.split())
+        joined = " ".join(sorted(self.tokens))
+        self.length = len(joined)
+        # character -> count, as a plain dict (Counter's & is much slower)
+        self.counts = dict(Counter(joined))
+
+    # False when fuzz.token_set_ratio of the two names is below the bound's threshold for sure (see the
+    # module docstring)
+    def may_match(self, other, bound=SIMILARITY_BOUND):
+        common = self.tokens & other.tokens
+        if common:
+            common_length = sum(map(len, common)) + len(common) - 1
+            if reaches_bound(common_length, common_length + min(self.length, other.length), bound):
+                return True
+        total_length = self.length + other.length
+        return reaches_bound(min(self.length, other.length), total_length, bound) and \
+            reaches_bound(sum(map(min, self.counts.values(), map(other.counts.get, self.counts, repeat(0)))),
+                          total_length, bound)
+
+
+class InstalledNameIndex:
+    def __init__(self, installed_items):
+        self.items = installed_items
+        # position -> IndexedName of the installed program's name
+        self.names = []
+        # token -> positions of the installed programs with that token in their name
+        self.by_token = {}
+        # Positions of the names with tokens, by the length of their sorted token string
+        self.by_length = []
+        # version regex -> positions of the names it finds a version in
+        self.version_positions = {}
+
+        for position, item in enumerate(installed_items):
+            name = IndexedName(item['Name'])
+            self.names.append(name)
+            for token in name.tokens:
+                self.by_token.setdefault(token, []).append(position)
+            if name.tokens:
+                self.by_length.append(position)
+        self.by_length.sort(key=lambda position: self.names[position].length)
+        self.lengths = [self.names[position].length for position in self.by_length]
+
+    def positions_with_version(self, version_regex):
+        positions = self.version_positions.get(version_regex)
+        if positions is None:
+            positions = [position for position, item in enumerate(self.items) if version_regex.search(item['Name'])]
+            self.version_positions[version_regex] = positions
+        return positions
+
+    # Positions of the installed programs a RequirementMatcher (of an IndexedName) can match, in installed order
+    def candidate_positions(self, matcher):
+        name = matcher.required
+        bound = similarity_bound(matcher.threshold)
+        # Any name reaches a threshold of 0, also one without tokens
+        if bound <= 0:
+            return list(range(len(self.items)))
+
+        sharing = set()
+        for token in name.tokens:
+            sharing.update(self.by_token.get(token, ()))
+        positions = {position for position in sharing if name.may_match(self.names[position], bound)}
+
+        # Without a common token only names of a near enough length can reach the bound
+        if name.tokens:
+            low = bisect.bisect_left(self.lengths, name.length * bound / (400 - bound))
+            high = bisect.bisect_right(self.lengths, name.length * (400 - bound) / bound)
+            for position in self.by_length[low:high]:
+                if position not in sharing and name.may_match(self.names[position], bound):
+                    positions.add(position)
+
+        for version_regex in matcher.version_regexes:
+            positions.update(self.positions_with_version(version_regex))
+        return sorted(positions)
+
+
+# Function to match installed items with required items
+def match_item(required_name, required_version, installed_item, rules=DEFAULT_RULES):
+    return RequirementMatcher(NormalizedName(required_name), required_version, rules).matches(
+        NormalizedName(installed_item['Name']), installed_item)
+
+
+# match_item of one required program, with the matching rules of its name selected once
+class RequirementMatcher:
+    def __init__(self, required, required_version, rules=DEFAULT_RULES):
+        self.required = required
+        self.required_version = required_version
+        self.rules = [rule for rule in rules if rule.applies(required.lower)]
+        self.fallback = next((rule for rule in self.rules if rule.fallback == 'version_ratio'), None)
+        # Smallest name similarity a match needs, and the version regexes that match whatever the similarity
+        self.threshold = min([DEFAULT_THRESHOLD] + [rule.name_threshold for rule in self.rules
+                                                    if rule.mode != 'version_at_least'])
+        self.version_regexes = [rule.version_regex for rule in self.rules if rule.mode == 'version_at_least']
+
+    def matches(self, installed, installed_item):
+        name_similarity = token_set_score(self.required.processed, installed.processed)
+
+        # Check if either version is 'N/A'
+        if self.required_version == 'N/A' or installed_item['Version'] == 'N/A':
+            return name_similarity >= DEFAULT_THRESHOLD
+
+        for rule in self.rules:
+            matched = rule.decide(self.required.name, self.required_version, name_similarity, installed_item)
+            if matched is not None:
+                return matched
+
+        if self.fallback is not None:
+            # Compare the version strings
+            version_similarity = fuzz.ratio(self.required_version, installed_item['Version'])
+            return name_similarity >= DEFAULT_THRESHOLD and version_similarity >= self.fallback.threshold
+
+        # For other cases, split the name into words and check if all words appear in the installed software name
+        name_similarity_words = token_set_score(self.required.processed_words, installed.processed_words)
+        return name_similarity >= DEFAULT_THRESHOLD and name_similarity_words >= DEFAULT_THRESHOLD
+
+
+# Positions of the installed programs match_item matches, for each required program. Every name is
+# normalized once, the rules are selected once per required program, and only the candidate pairs of
+# installed_index are scored.
+def match_rows(software_data, installed_index, rules=DEFAULT_RULES):
+    matches = []
+    for software_item in software_data:
+        matcher = RequirementMatcher(IndexedName(software_item['Name']), software_item['Required Version'], rules)
+        matches.append(matched_positions(matcher, installed_index))
+    return matches
+
+
+def matched_positions(matcher, installed_index):
+    return [position for position in installed_index.candidate_positions(matcher)
+            if matcher.matches(installed_index.names[position], installed_index.items[position])]
+
+
+# The match matrices of several requirement lists ((software_data, rules) pairs) against one inventory.
+# The installed programs are indexed once, every required name is normalized once, and a required
+# program that is in several lists with the same version and matching rules is matched once.
+def match_profiles(requirement_lists, current_pc_data):
+    installed_index = InstalledNameIndex(current_pc_data)
+    # required name -> IndexedName
+    names = {}
+    # (required name, required version, keys of the rules of the name) -> matched positions
+    rows = {}
+    matrices = []
+    for software_data, rules in requirement_lists:
+        matrix = []
+        for software_item in software_data:
+            required_name = software_item['Name']
+            if required_name not in names:
+                names[required_name] = IndexedName(required_name)
+            matcher = RequirementMatcher(names[required_name], software_item['Required Version'], rules)
+            row_key = (required_name, software_item['Required Version'], tuple(rule.key for rule in matcher.rules))
+            if row_key not in rows:
+                rows[row_key] = matched_positions(matcher, installed_index)
+            matrix.append(rows[row_key])
+        matrices.append(matrix)
+    return matrices
+
+
+# Worker: match_rows of some required programs
+def match_rows_worker(software_data, current_pc_data, rules):
+    return match_rows(software_data, InstalledNameIndex(current_pc_data), rules)
+
+
+# The required x installed match matrix as match_rows gives it. With `workers` processes (None: one per
+# CPU) and at least threshold pairs, the required programs are split across a process pool, each worker
+# indexing the installed programs itself.
+def match_matrix(software_data, current_pc_data, workers=1, threshold=MATCH_PARALLEL_THRESHOLD,
+                 rules=DEFAULT_RULES):
+    # registry_parallel has the pool helpers, imported here so the software check does not load the registry code
+    from registry_parallel import default_workers, worker_pool
+
+    if workers is None:
+        workers = default_workers()
+    workers = min(workers, len(software_data))
+    if workers <= 1 or len(software_data) * len(current_pc_data) < threshold:
+        return match_rows(software_data, InstalledNameIndex(current_pc_data), rules)
+
+    chunk_size = -(-len(software_data) // workers)
+    with worker_pool(workers) as executor:
+        futures = [executor.submit(match_rows_worker, software_data[start:start + chunk_size], current_pc_data,
+                                   rules)
+                   for start in range(0, len(software_data), chunk_size)]
+    return [row for future in futures for row in future.result()]
+
+
+# The required programs are split across `workers` processes when there are enough pairs (see match_matrix).
+# rules are the matching rules of software.json (software_rules.load_matching_rules).
+def generate_results(software_data, current_pc_data, workers=1, rules=DEFAULT_RULES):
+    matches = match_matrix(software_data, current_pc_data, workers, rules=rules)
+    return results_of_matches(software_data, current_pc_data, matches, rules)
+
+
+# Status of every required program from its row of the match matrix
+def results_of_matches(software_data, current_pc_data, matches, rules=DEFAULT_RULES):
+    results = {}
+
+    # Create a dictionary to store the highest version number for each software name
+    highest_versions = {}
+
+    for software_item, matched_positions in zip(software_data, matches):
+        software_name = software_item['Name']
+        required_version = software_item['Required Version']
+
+        matched_items = [current_pc_data[position] for position in matched_positions]
+
+        if matched_items:
+            # Sort matched items by version number (in descending order)
+            matched_items.sort(key=lambda x: version_key(x['Version']), reverse=True)
+
+            # Select the item with the highest version number
+            matched_item = matched_items[0]
+
+            installed_version = matched_item['Version']
+            if version_at_least(installed_version, required_version):
+                status = 'Pass'
+            else:
+                status = 'Failed'
+
+            # Update the highest version for this software
+            if software_name not in highest_versions:
+                highest_versions[software_name] = installed_version
+            else:
+                # Check if the current version is higher than the stored highest version
+                if version_key(installed_version) > version_key(highest_versions[software_name]):
+                    highest_versions[software_name] = installed_version
+        else:
+            status = 'Missing'
+            installed_version = 'N/A'
+
+        # A rule can display the software under another name, like "WinMerge" for every WinMerge version
+        software_name = display_name(software_name, rules)
+
+        results[software_name] = {
+            'Required Version': required_version,
+            'Installed Version': installed_version,
+            'Status': status
+        }
+
+    return results
+
+
+def display_name(software_name, rules=DEFAULT_RULES):
+    lower_name = software_name.lower()
+    return next((rule.display_name for rule in rules if rule.display_name and rule.applies(lower_name)),
+                software_name)
+
+
+def synthetic_inventory(installed_count, required_count, seed=0):
+    generator = random.Random(seed)
+    vendors = ["Microsoft", "Adobe", "NVIDIA", "Intel", "Google", "Mozilla", "Oracle", "MV Technology", "Python",
+               "Git", "WinMerge", "7-Zip", "Notepad++", "TeamViewer", "VLC", "Realtek", "Dell", "Cognex", "Basler"]
+    words = ["Runtime", "Driver", "Update", "Tools", "Redistributable", "SDK", "Client", "Service", "Viewer",
+             "Player", "Framework", "Studio", "Suite", "Agent", "Library", "Support", "Components", "Manager"]
+
+    def program_name():
+        name = " ".join([generator.choice(vendors)] + generator.sample(words, generator.randint(1, 3)))
+        if generator.random() < 0.3:
+            name += f" {generator.randint(1, 30)}.{generator.randint(0, 9)}"
+        if generator.random() < 0.2:
+            name += f" (x{generator.choice(['64', '86'])})"
+        return name
+
+    def program_version():
+        return f"{generator.randint(1, 30)}.{generator.randint(0, 9)}.{generator.randint(0, 999)}"
+
+    installed = [{'Name': program_name(), 'Version': program_version(), 'Publisher': generator.choice(vendors),
+                  'InstallLocation': None} for _ in range(installed_count)]
+    required = [{'Name': program_name(), 'Required Version': generator.choice([program_version(), 'N/A'])}
+                for _ in range(required_count)]
+    return installed, required
+
+
+# The match matrix calling match_item for every required x installed pair, to compare against
+def match_every_pair(software_data, current_pc_data):
+    return [[position for position, current_pc_item in enumerate(current_pc_data)
+             if match_item(software_item['Name'], software_item['Required Version'], current_pc_item)]
+            for software_item in software_data]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the match matrix against scoring every pair")
+    parser.add_argument("--installed", type=int, default=5000)
+    parser.add_argument("--required", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=1, help="processes of the match matrix")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    installed, required = synthetic_inventory(args.installed, args.required, args.seed)
+    runs = [("every pair", lambda: match_every_pair(required, installed)),
+            ("token index", lambda: match_matrix(required, installed))]
+    if args.workers > 1:
+        # Through the module, the pool workers look functions up by module name and this one is __main__
+        import software_match
+        runs.append((f"token index, {args.workers} workers",
+                     lambda: software_match.match_matrix(required, installed, args.workers, threshold=0)))
+
+    matrices = {}
+    for label, run in runs:
+        start = time.perf_counter()
+        matrices[label] = run()
+        print(f"{label}: {time.perf_counter() - start:.3f}s")
+
+    index = InstalledNameIndex(installed)
+    scored = sum(len(index.candidate_positions(RequirementMatcher(IndexedName(item['Name']), item['Required Version'])))
+                 for item in required)
+    matches = sum(len(row) for row in matrices["every pair"])
+    print(f"{scored} of {len(required) * len(installed)} pairs scored, {matches} matches, "
+          f"same matrix: {all(matrix == matrices['every pair'] for matrix in matrices.values())}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+'''Requirement profiles of the software check.
+
+A requirement profile is a software.json of one machine type (a
+"software_list" and optional "matching_rules", see software_rules.py). The
+profiles are the .json files of the software_profiles folder, named by their
+file name:
+
+    software_profiles\\MicroAOI.json
+    software_profiles\\SMT.json
+
+evaluate_profiles checks one collected inventory against every profile in one
+pass (software_match.match_profiles): the installed programs are indexed once,
+required names are normalized once, a required program that several profiles
+share with the same version and rules is matched once, and version strings are
+parsed once (version_keys.py). Each profile gets the results generate_results
+gives for it, written to <output folder>\\<profile>\\results.json, and the
+profiles are summarized side by side in <output folder>\\summary.json:
+
+    {
+        "best_profile": "MicroAOI",
+        "profiles": {"MicroAOI": {"Required": 12, "Pass": 11, "Failed": 1, "Missing": 0, "Compliance": 91.7}, ...},
+        "software": {"WinMerge": {"MicroAOI": "Pass", "SMT": "Missing"}, ...}
+    }
+
+The best profile is the one with the highest share of required programs that
+pass, then the most programs that pass.
+
+Usage:
+    python software_profiles.py [PROFILE_FILE ...] [--profiles-folder software_profiles]
+                                [--output-folder data\\software_profiles] [--installed currentpc_software.json]
+                                [--fake-registry registry.json]
+'''
+
+import argparse
+import glob
+import json
+import os
+
+from software_match import match_profiles, results_of_matches
+from software_rules import matching_rules_of
+
+PROFILES_FOLDER = "software_profiles"
+RESULTS_FOLDER = os.path.join("data", "software_profiles")
+RESULTS_FILE = "results.json"
+SUMMARY_FILE = "summary.json"
+STATUSES = ('Pass', 'Failed', 'Missing')
+
+
+class RequirementProfile:
+    def __init__(self, name, software_data, rules):
+        self.name = name
+        self.software_data = software_data
+        self.rules = rules
+
+
+def load_requirement_profile(name, file_path):
+    with open(file_path, 'r') as file:
+        config = json.load(file)
+    try:
+        software_data = config['software_list']
+    except (KeyError, TypeError):
+        raise ValueError(f"Requirement profile {file_path} has no software_list")
+    return RequirementProfile(name, software_data, matching_rules_of(config))
+
+
+def profile_files(folder):
+    return sorted(glob.glob(os.path.join(folder, "*.json")))
+
+
+def profile_name(file_path):
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+
+def load_requirement_profiles(files):
+    return [load_requirement_profile(profile_name(file_path), file_path) for file_path in files]
+
+
+# (path, mtime, size) of the files, equal as long as none of them was written
+def file_stamps(files):
+    stamps = []
+    for file_path in files:
+        stat = os.stat(file_path)
+        stamps.append((file_path, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+# Profile name -> results of every profile against one inventory, in profile order
+def evaluate_profiles(profiles, current_pc_data):
+    names = [profile.name for profile in profiles]
+    for name in names:
+        if names.count(name) > 1:
+            raise ValueError(f"Two requirement profiles are named {name}")
+
+    matrices = match_profiles([(profile.software_data, profile.rules) for profile in profiles], current_pc_data)
+    return {profile.name: results_of_matches(profile.software_data, current_pc_data, matches, profile.rules)
+            for profile, matches in zip(profiles, matrices)}
+
+
+def summarize_profiles(results_by_profile):
+    profiles = {}
+    software = {}
+    for name, results in results_by_profile.items():
+        counts = {'Required': len(results)}
+        for status in STATUSES:
+            counts[status] = sum(1 for result in results.values() if result['Status'] == status)
+        counts['Compliance'] = round(100 * counts['Pass'] / len(results), 1) if results else 0.0
+        profiles[name] = counts
+        for software_name, result in results.items():
+            software.setdefault(software_name, {})[name] = result['Status']
+
+    best = max(profiles, key=lambda name: (profiles[name]['Compliance'], profiles[name]['Pass']), default=None)
+    return {'best_profile': best, 'profiles': profiles, 'software': software}
+
+
+# One line per profile, the best one marked
+def summary_lines(summary):
+    lines = []
+    for name, counts in summary['profiles'].items():
+        best = "  <- best" if name == summary['best_profile'] else ""
+        lines.append(f"{name}: {counts['Pass']}/{counts['Required']} Pass, {counts['Failed']} Failed, "
+                     f"{counts['Missing']} Missing ({counts['Compliance']}%){best}")
+    return lines
+
+
+# The status of every required program in every profile, one column per profile
+def software_table_lines(summary):
+    names = list(summary['profiles'])
+    software_width = max([len("Software")] + [len(software_name) for software_name in summary['software']])
+    widths = [max(len(name), max(map(len, STATUSES))) for name in names]
+    rows = [["Software"] + names]
+    rows.extend([software_name] + [statuses.get(name, "-") for name in names]
+                for software_name, statuses in summary['software'].items())
+    return ["  ".join(cell.ljust(width) for cell, width in zip(row, [software_width] + widths)).rstrip()
+            for row in rows]
+
+
+def write_json(data, file_path):
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    # Write to a temp file first so a crash never leaves a half written file behind
+    temp_file = file_path + ".temp"
+    with open(temp_file, 'w') as file:
+        json.dump(data, file, indent=4)
+    os.replace(temp_file, file_path)
+
+
+# Writes <output_folder>\<profile>\results.json of every profile and <output_folder>\summary.json, returns the summary
+def write_profile_results(output_folder, results_by_profile):
+    for name, results in results_by_profile.items():
+        write_json(results, os.path.join(output_folder, name, RESULTS_FILE))
+    summary = summarize_profiles(results_by_profile)
+    write_json(summary, os.path.join(output_folder, SUMMARY_FILE))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the installed programs against several requirement profiles")
+    parser.add_argument("profile_files", nargs="*", help="software.json files, the profiles folder when left out")
+    parser.add_argument("--profiles-folder", default=PROFILES_FOLDER)
+    parser.add_argument("--output-folder", default=RESULTS_FOLDER)
+    parser.add_argument("--installed", help="installed programs JSON (like currentpc_software.json) instead of "
+                                            "reading the registry")
+    parser.add_argument("--fake-registry", help="read the programs from a fake_registry.py JSON file")
+    args = parser.parse_args()
+
+    files = args.profile_files or profile_files(args.profiles_folder)
+    if not files:
+        parser.error(f"no requirement profiles in {args.profiles_folder}")
+    profiles = load_requirement_profiles(files)
+
+    if args.installed:
+        with open(args.installed, 'r') as file:
+            current_pc_data = json.load(file)
+    else:
+        from installed_programs import collect_installed_programs
+        if args.fake_registry:
+            from fake_registry import load_fake_registry
+            backend = load_fake_registry(args.fake_registry)
+        else:
+            import winreg
+            backend = winreg
+        current_pc_data = collect_installed_programs(backend)
+
+    summary = write_profile_results(args.output_folder, evaluate_profiles(profiles, current_pc_data))
+    print("\n".join(software_table_lines(summary)))
+    print()
+    print("\n".join(summary_lines(summary)))
+
+
+if __name__ == '__main__':
+    main()
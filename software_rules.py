@@ -0,0 +1,162 @@
+'''Matching rules of the software check.
+
+Required programs whose names need another check than the name similarity of
+match_item are declared as rules in software.json, next to the software list:
+
+    {
+        "software_list": [...],
+        "matching_rules": [
+            {"name_contains": "chrome", "mode": "name_ratio", "target": "Google Chrome",
+             "name_threshold": 80, "threshold": 80},
+            {"name_contains": "winmerge", "mode": "version_at_least",
+             "version_regex": "WinMerge (\\\\d+(\\\\.\\\\d+)+)", "display_name": "WinMerge"}
+        ]
+    }
+
+    name_contains   text of the required name the rule is for, in any case
+    mode            how the installed program is checked:
+        name_ratio        name similarity >= name_threshold and fuzz.ratio of
+                          target and the installed name >= threshold
+        name_version      the versions version_regex finds in the required
+                          and the installed name: name similarity >=
+                          name_threshold and fuzz.ratio of the versions >=
+                          threshold; the next rules are tried when either
+                          name has no version
+        version_at_least  the version version_regex finds in the installed
+                          name is at least the required version (see
+                          version_keys.py), matched whatever the name
+                          similarity; else the next rules are tried
+    version_regex   regex of the version, group 1 when it has groups
+    fallback        "version_ratio" to end with fuzz.ratio of the required and
+                    installed versions >= threshold instead of the name
+                    similarity of the name's words, when no rule decided
+    display_name    name the results show the required program as
+
+Every rule whose name_contains is in the required name is tried, in order.
+A rule with another key than these is an error, like a misspelt threshold.
+Without a "matching_rules" key, or without software.json, DEFAULT_RULES are
+the special cases match_item always had (Chrome, Visual C++, WinMerge and
+NVIDIA). The NVIDIA case, and the 'Google Chrome' half of the Chrome case,
+compared mixed case text with the lowercased name and never applied; rules
+match in any case.
+
+Rules are selected once per required program (RequirementMatcher of
+software_match.py), not for every installed program.
+'''
+
+import json
+import re
+
+from fuzzywuzzy import fuzz
+
+from version_keys import version_at_least
+
+# Name similarity match_item needs without a rule
+DEFAULT_THRESHOLD = 70
+MODES = ('name_ratio', 'name_version', 'version_at_least')
+FALLBACKS = ('words', 'version_ratio')
+RULE_KEYS = ('name_contains', 'mode', 'version_regex', 'target', 'name_threshold', 'threshold', 'fallback',
+             'display_name')
+
+
+class MatchRule:
+    def __init__(self, name_contains, mode, version_regex=None, target=None, name_threshold=DEFAULT_THRESHOLD,
+                 threshold=DEFAULT_THRESHOLD, fallback='words', display_name=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown matching rule mode: {mode}")
+        if fallback not in FALLBACKS:
+            raise ValueError(f"Unknown matching rule fallback: {fallback}")
+        if mode != 'name_ratio' and version_regex is None:
+            raise ValueError(f"Matching rule {name_contains} has no version_regex")
+        if mode == 'name_ratio' and target is None:
+            raise ValueError(f"Matching rule {name_contains} has no target")
+        for value in (name_threshold, threshold):
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 100:
+                raise ValueError(f"Matching rule {name_contains} has a threshold outside 0 to 100: {value}")
+        self.name_contains = name_contains.lower()
+        self.mode = mode
+        try:
+            self.version_regex = None if version_regex is None else re.compile(version_regex, re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Matching rule {name_contains} has an unexpected version_regex: {e}")
+        self.target = target
+        self.name_threshold = name_threshold
+        self.threshold = threshold
+        self.fallback = fallback
+        self.display_name = display_name
+        # Equal for rules that match the same way, whatever list they are from
+        self.key = (self.name_contains, mode, version_regex, target, name_threshold, threshold, fallback)
+
+    def applies(self, lower_name):
+        return self.name_contains in lower_name
+
+    # Version version_regex finds in a name, None when there is none
+    def find_version(self, name):
+        version_match = self.version_regex.search(name)
+        if version_match is None:
+            return None
+        return version_match.group(1 if self.version_regex.groups else 0)
+
+    # True or False when the rule decides the match, None when the next rules are tried
+    def decide(self, required_name, required_version, name_similarity, installed_item):
+        if self.mode == 'name_ratio':
+            return name_similarity >= self.name_threshold and \
+                fuzz.ratio(self.target, installed_item['Name']) >= self.threshold
+
+        installed_version = self.find_version(installed_item['Name'])
+        if installed_version is None:
+            return None
+        if self.mode == 'version_at_least':
+            if version_at_least(installed_version, required_version):
+                return True
+            return None
+
+        required_name_version = self.find_version(required_name)
+        if required_name_version is None:
+            return None
+        return name_similarity >= self.name_threshold and \
+            fuzz.ratio(required_name_version, installed_version) >= self.threshold
+
+
+DEFAULT_RULES = [
+    MatchRule('chrome', 'name_ratio', target='Google Chrome', name_threshold=80, threshold=80),
+    MatchRule('microsoft visual c++', 'name_version', r'(\d+(\.\d+)+)', fallback='version_ratio'),
+    MatchRule('winmerge', 'version_at_least', r'WinMerge (\d+(\.\d+)+)', display_name='WinMerge'),
+    MatchRule('nvidia graphics driver', 'name_version', r'(\d+(\.\d+)+)'),
+]
+
+
+def parse_matching_rules(config):
+    if not isinstance(config, list):
+        raise ValueError("Matching rules must be a list of rules")
+    rules = []
+    for rule in config:
+        if isinstance(rule, dict):
+            unknown_keys = sorted(set(rule) - set(RULE_KEYS))
+            if unknown_keys:
+                raise ValueError(f"Unexpected matching rule: {rule} (unknown keys {unknown_keys})")
+        try:
+            rules.append(MatchRule(rule['name_contains'], rule['mode'], rule.get('version_regex'), rule.get('target'),
+                                   rule.get('name_threshold', DEFAULT_THRESHOLD),
+                                   rule.get('threshold', DEFAULT_THRESHOLD), rule.get('fallback', 'words'),
+                                   rule.get('display_name')))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Unexpected matching rule: {rule} ({e})")
+    return rules
+
+
+# Matching rules of the content of a software.json, DEFAULT_RULES when it declares none
+def matching_rules_of(config):
+    if not isinstance(config, dict) or 'matching_rules' not in config:
+        return DEFAULT_RULES
+    return parse_matching_rules(config['matching_rules'])
+
+
+# Matching rules of a software.json, DEFAULT_RULES when it declares none
+def load_matching_rules(config_file):
+    try:
+        with open(config_file, 'r') as file:
+            config = json.load(file)
+    except FileNotFoundError:
+        return DEFAULT_RULES
+    return matching_rules_of(config)
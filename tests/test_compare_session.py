@@ -0,0 +1,122 @@
+'''CompareSession results against the reference functions of test_registry_compare.py.
+
+A full compare takes the results of the paths that match the golden file from
+the golden file's self compare (registry_merkle.compare_by_digest), and a
+refresh only compares the keys that changed (CompareSession._compare_changed).
+Both have to give what comparing everything gives, also when result keys
+repeat.
+'''
+
+import json
+import random
+
+import pytest
+
+from registry_compare import CompareSession
+from test_registry_compare import (generate_compared_results, generate_redundant_data, generate_reg_data,
+                                   random_entry, random_snapshots)
+
+
+def same_as_reference(session, golden, current):
+    for actual, expected in ((session.result_reg_data, generate_reg_data(golden, current)),
+                             (session.compared_result_reg_data, generate_compared_results(golden, current)),
+                             (session.redundant_data, generate_redundant_data(golden, current))):
+        assert list(actual.items()) == list(expected.items())
+
+
+# A snapshot after a refresh: values changed, deleted, added or recased
+def changed_snapshot(generator, current):
+    current = [list(entry) for entry in current]
+    for _ in range(generator.randint(0, 4)):
+        choice = generator.random()
+        if choice < 0.4 and current:
+            current[generator.randrange(len(current))][2] = random_entry(generator)[2]
+        elif choice < 0.6 and current:
+            del current[generator.randrange(len(current))]
+        elif choice < 0.8:
+            current.insert(generator.randint(0, len(current)), random_entry(generator))
+        elif current:
+            entry = current[generator.randrange(len(current))]
+            entry[0] = entry[0].upper()
+    return current
+
+
+def new_session(tmp_path, golden, snapshots):
+    golden_file = tmp_path / "golden.json"
+    golden_file.write_text(json.dumps(golden))
+    return CompareSession(str(golden_file), lambda: snapshots[-1], str(tmp_path / "data"), workers=1)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_full_compare(tmp_path, seed):
+    golden, current = random_snapshots(seed)
+    session = new_session(tmp_path, golden, [current])
+    session.run()
+    same_as_reference(session, golden, current)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_refresh(tmp_path, seed):
+    generator = random.Random(seed)
+    golden, current = random_snapshots(seed)
+    snapshots = [current]
+    session = new_session(tmp_path, golden, snapshots)
+    session.run()
+    for _ in range(4):
+        snapshots.append(changed_snapshot(generator, snapshots[-1]))
+        session.run()
+        assert session.changed_keys is not None
+        same_as_reference(session, golden, snapshots[-1])
+
+
+def test_colliding_result_keys(tmp_path):
+    golden = [['A\\B', 'C', '1', 'REG_SZ'], ['A', 'B\\C', '2', 'REG_SZ'], ['A\\B', 'C', '3', 'REG_SZ']]
+    for current in (golden, [['A', 'B\\C', '5', 'REG_SZ'], ['A\\B', 'C', '1', 'REG_SZ']],
+                    [['A\\B', 'C', '1', 'REG_SZ'], ['A', 'B\\C', '2', 'REG_SZ'], ['A\\B', 'C', '4', 'REG_SZ']]):
+        session = new_session(tmp_path, golden, [current])
+        session.run()
+        same_as_reference(session, golden, current)
+
+
+def test_refresh_colliding_result_keys(tmp_path):
+    golden = [['A\\B', 'C', '1', 'REG_SZ'], ['A', 'B\\C', '2', 'REG_SZ']]
+    snapshots = [[['A\\B', 'C', '1', 'REG_SZ'], ['A', 'B\\C', '2', 'REG_SZ']]]
+    session = new_session(tmp_path, golden, snapshots)
+    session.run()
+    for current in ([['A\\B', 'C', '1', 'REG_SZ'], ['A', 'B\\C', '3', 'REG_SZ']],
+                    [['A\\B', 'C', '4', 'REG_SZ'], ['A', 'B\\C', '3', 'REG_SZ']],
+                    [['A', 'B\\C', '2', 'REG_SZ'], ['A\\B', 'C', '5', 'REG_SZ']],
+                    [['A', 'B\\C', '2', 'REG_SZ']]):
+        snapshots.append(current)
+        session.run()
+        assert session.changed_keys is not None
+        same_as_reference(session, golden, current)
+
+
+def test_save_replaces_files_of_other_writers(tmp_path):
+    golden, current = random_snapshots(3, size=30)
+    session = new_session(tmp_path, golden, [current])
+    session.run()
+    data_folder = tmp_path / "data"
+    result_file = data_folder / "result_reg_data.json"
+    stamp = result_file.stat().st_mtime_ns
+
+    # Nothing changed and nobody else wrote the files: they are left alone
+    session.run()
+    assert session.changed_files == set()
+    assert result_file.stat().st_mtime_ns == stamp
+
+    # Another session (the GUI with another golden file) wrote the same folder
+    other_golden, other_current = random_snapshots(4, size=30)
+    other_folder = tmp_path / "other"
+    other_folder.mkdir()
+    other_golden_file = other_folder / "golden.json"
+    other_golden_file.write_text(json.dumps(other_golden))
+    CompareSession(str(other_golden_file), lambda: other_current, str(data_folder), workers=1).run()
+
+    session.run()
+    assert session.changed_files == set()
+    for file_name, results in (("result_reg_data.json", session.result_reg_data),
+                               ("compared_result_reg_data.json", session.compared_result_reg_data),
+                               ("redundant_data.json", session.redundant_data)):
+        assert json.loads((data_folder / file_name).read_text()) == results
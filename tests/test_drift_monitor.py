@@ -0,0 +1,112 @@
+'''The drift monitor's change feed and results_fresh, on a fake registry.'''
+
+import json
+import os
+
+from drift_monitor import DriftMonitor, load_state, profile_source, results_fresh
+from fake_registry import REG_DWORD, REG_SZ, FakeRegistry
+from reg_export import MV_TECHNOLOGY_ROOT
+from registry_compare import CompareSession
+from scan_profiles import DEFAULT_PROFILE
+
+CALIB = MV_TECHNOLOGY_ROOT + '\\Calib'
+CAMERA = MV_TECHNOLOGY_ROOT + '\\Camera'
+
+
+def fake_registry():
+    registry = FakeRegistry()
+    registry.set_value(CALIB, 'Port', '1', REG_SZ, timestamp=1)
+    registry.set_value(CALIB, 'Mode', 3, REG_DWORD, timestamp=1)
+    registry.set_value(CAMERA, 'Exposure', '20', REG_SZ, timestamp=1)
+    return registry
+
+
+def write_golden(file_path, entries):
+    file_path.write_text(json.dumps(entries))
+    return str(file_path)
+
+
+def golden_entries(registry):
+    return [list(entry) for entry in profile_source(lambda: registry, DEFAULT_PROFILE)()]
+
+
+def new_monitor(tmp_path, registry, golden_file):
+    read_registry = profile_source(lambda: registry, DEFAULT_PROFILE, str(tmp_path / "data"))
+    session = CompareSession(golden_file, read_registry, str(tmp_path / "data"), workers=1)
+    return DriftMonitor(session, interval=60, profile_name=DEFAULT_PROFILE.name)
+
+
+def feed_lines(monitor):
+    with open(monitor.feed_file, 'r') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_change_feed(tmp_path):
+    registry = fake_registry()
+    golden_file = write_golden(tmp_path / "golden.json", golden_entries(registry))
+    (tmp_path / "data").mkdir()
+    monitor = new_monitor(tmp_path, registry, golden_file)
+
+    lines = monitor.check()
+    assert len(lines) == 1
+    assert lines[0]['baseline']['result_reg_data.json'] == {'Pass': 5}
+    assert monitor.check() == []
+
+    registry.set_value(CALIB, 'Port', '2', REG_SZ, timestamp=2)
+    registry.set_value(CAMERA, 'Gain', '5', REG_SZ, timestamp=2)
+    lines = monitor.check()
+    changes = {(line['file'], line['key'], line['from'], line['to']) for line in lines}
+    assert ('result_reg_data.json', CALIB + '\\Port', 'Pass', 'Fail') in changes
+    assert ('compared_result_reg_data.json', CALIB + '\\Port', 'Pass', 'Fail') in changes
+    assert ('redundant_data.json', CAMERA + '\\Gain', None, 'Missing') in changes
+    assert all(line['from'] != line['to'] for line in lines)
+
+    registry.delete_value(CAMERA, 'Gain', timestamp=3)
+    lines = monitor.check()
+    assert ('redundant_data.json', CAMERA + '\\Gain', 'Missing', None) in \
+        {(line['file'], line['key'], line['from'], line['to']) for line in lines}
+
+    # A restarted monitor goes on from the result files the last check left
+    restarted = new_monitor(tmp_path, registry, golden_file)
+    assert restarted.check() == []
+    assert len(feed_lines(restarted)) == 1 + len(changes) + len(lines)
+
+
+def test_results_fresh(tmp_path):
+    registry = fake_registry()
+    golden_file = write_golden(tmp_path / "golden.json", golden_entries(registry))
+    data_folder = tmp_path / "data"
+    data_folder.mkdir()
+    monitor = new_monitor(tmp_path, registry, golden_file)
+    assert not results_fresh(str(data_folder), golden_file, DEFAULT_PROFILE.name)
+
+    monitor.check()
+    checked = load_state(str(data_folder))['checked']
+    assert results_fresh(str(data_folder), golden_file, DEFAULT_PROFILE.name, now=checked)
+    assert results_fresh(str(data_folder), golden_file, DEFAULT_PROFILE.name, now=checked + 120)
+    assert not results_fresh(str(data_folder), golden_file, DEFAULT_PROFILE.name, now=checked + 121)
+    assert not results_fresh(str(data_folder), golden_file, 'MicroAOI', now=checked)
+
+    # The GUI compares another golden file into the same data folder between two checks
+    other_golden = golden_entries(registry)[:1]
+    other_golden_file = write_golden(tmp_path / "other.json", other_golden)
+    CompareSession(other_golden_file, lambda: golden_entries(registry), str(data_folder), workers=1).run()
+    assert not results_fresh(str(data_folder), golden_file, DEFAULT_PROFILE.name, now=checked)
+
+    # A quiet check writes the monitor's results back before it calls them fresh
+    assert monitor.check() == []
+    checked = load_state(str(data_folder))['checked']
+    assert results_fresh(str(data_folder), golden_file, DEFAULT_PROFILE.name, now=checked)
+    result_reg_data = json.loads((data_folder / "result_reg_data.json").read_text())
+    assert list(result_reg_data) == [f"{path}\\{name}" for path, name, data, reg_type in golden_entries(registry)]
+
+    # Result files put back with an older modification time (copied from elsewhere) are not the monitor's
+    result_file = data_folder / "compared_result_reg_data.json"
+    stat = result_file.stat()
+    result_file.write_text("{}")
+    os.utime(result_file, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+    assert not results_fresh(str(data_folder), golden_file, DEFAULT_PROFILE.name, now=checked)
+
+    # A changed golden file needs a compare
+    write_golden(tmp_path / "golden.json", golden_entries(registry)[1:])
+    assert not results_fresh(str(data_folder), golden_file, DEFAULT_PROFILE.name, now=checked)
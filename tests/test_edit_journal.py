@@ -0,0 +1,166 @@
+'''Page 4 golden editor journal and overlay.'''
+
+import json
+import os
+import random
+
+import pytest
+
+from edit_journal import ADD, DELETE, EDIT, NAME, PATH, EditJournal, EditorOverlay, journal_file_path
+
+GOLDEN = [[r"HKLM\Software\MV", "Camera", "1", "REG_SZ"],
+          [r"HKLM\Software\MV", "Gain", "2", "REG_DWORD"],
+          [r"HKLM\Software\MV\Light", "Level", "3", "REG_SZ"]]
+
+
+def add(path, name, data):
+    return {PATH: path, NAME: name, 'Data': data, 'Type': 'REG_SZ', 'Action': ADD}
+
+
+def edit(path, name, data):
+    return {PATH: path, NAME: name, 'Previous Data': 'N/A', 'Previous Type': 'N/A', 'Current Data': data,
+            'Current Type': 'REG_SZ', 'Action': EDIT}
+
+
+def delete(path, name):
+    return {PATH: path, NAME: name, 'Data': '', 'Type': 'REG_SZ', 'Action': DELETE}
+
+
+@pytest.fixture
+def edit_temp_file(tmp_path):
+    return str(tmp_path / "M1_edit.temp")
+
+
+def journal_lines(edit_temp_file):
+    with open(journal_file_path(edit_temp_file)) as file:
+        return file.readlines()
+
+
+def test_replay(edit_temp_file):
+    journal = EditJournal(edit_temp_file)
+    journal.append(add(r"HKLM\Software\MV", "Exposure", "10"))
+    journal.append(edit(r"HKLM\Software\MV", "Gain", "4"))
+    journal.update(0, {'Data': '20'})
+    assert len(journal_lines(edit_temp_file)) == 3
+
+    reopened = EditJournal(edit_temp_file)
+    assert reopened.changes == journal.changes
+    assert reopened.changes[0]['Data'] == '20'
+    assert reopened.find_added(r"hklm\software\mv", "Exposure") == 0
+    assert reopened.find_added(r"hklm\software\mv", "Exposure", match_path_case=True) is None
+
+
+def test_torn_last_line(edit_temp_file):
+    journal = EditJournal(edit_temp_file)
+    journal.append(add(r"HKLM\Software\MV", "Exposure", "10"))
+    journal.append(edit(r"HKLM\Software\MV", "Gain", "4"))
+    with open(journal.journal_file, 'a') as file:
+        file.write(json.dumps({'index': 2, 'change': delete(r"HKLM\Software\MV", "Camera")})[:30])
+
+    reopened = EditJournal(edit_temp_file)
+    assert reopened.changes == journal.changes
+    # The torn line made the journal be compacted, lines appended now are replayed
+    assert reopened.journal_lines == 0
+    reopened.append(delete(r"HKLM\Software\MV", "Camera"))
+    assert EditJournal(edit_temp_file).changes == journal.changes + [delete(r"HKLM\Software\MV", "Camera")]
+
+
+@pytest.mark.parametrize('line', ['{"index": 5, "change": {}}\n', '{"change": {}}\n', '[1, 2]\n', 'null\n'])
+def test_unexpected_line_ends_the_replay(edit_temp_file, line):
+    journal = EditJournal(edit_temp_file)
+    journal.append(add(r"HKLM\Software\MV", "Exposure", "10"))
+    with open(journal.journal_file, 'a') as file:
+        file.write(line)
+        file.write(json.dumps({'index': 1, 'change': edit(r"HKLM\Software\MV", "Gain", "4")}) + '\n')
+    assert EditJournal(edit_temp_file).changes == journal.changes
+
+
+def test_compaction(edit_temp_file):
+    journal = EditJournal(edit_temp_file, compact_every=3)
+    changes = [add(r"HKLM\Software\MV", f"Value{number}", str(number)) for number in range(7)]
+    for change in changes:
+        journal.append(change)
+
+    with open(edit_temp_file) as file:
+        assert json.load(file) == changes[:6]
+    assert len(journal_lines(edit_temp_file)) == 1
+    assert EditJournal(edit_temp_file).changes == changes
+
+    journal.compact()
+    with open(edit_temp_file) as file:
+        assert json.load(file) == changes
+    assert not (journal.journal_lines or os.path.exists(journal.journal_file))
+
+
+# A crash between compacting the list and removing the journal replays lines that are in the list already
+def test_replaying_again_changes_nothing(edit_temp_file):
+    journal = EditJournal(edit_temp_file)
+    journal.append(add(r"HKLM\Software\MV", "Exposure", "10"))
+    journal.append(edit(r"HKLM\Software\MV", "Gain", "4"))
+    journal.update(0, {'Action': DELETE})
+    lines = journal_lines(edit_temp_file)
+    journal.compact()
+    with open(journal.journal_file, 'w') as file:
+        file.writelines(lines + lines)
+
+    reopened = EditJournal(edit_temp_file)
+    assert reopened.changes == journal.changes
+    assert reopened.find_added(r"HKLM\Software\MV", "Exposure") is None
+    assert EditJournal(edit_temp_file).changes == journal.changes
+
+
+def test_discard(edit_temp_file):
+    journal = EditJournal(edit_temp_file, compact_every=2)
+    for number in range(3):
+        journal.append(add(r"HKLM\Software\MV", f"Value{number}", str(number)))
+    journal.discard()
+    assert journal.changes == [] and journal.generation == 1
+    assert EditJournal(edit_temp_file).changes == []
+
+
+# The rows update_editor_gui drew before the overlay: every change replayed on the golden rows
+def replayed_rows(golden, changes):
+    rows = [list(entry) for entry in golden]
+    for change in changes:
+        key = [change[PATH], change[NAME]]
+        if change['Action'] == ADD:
+            if not any(row[:2] == key for row in rows):
+                rows.append(key + [change['Data'], change['Type']])
+        elif change['Action'] == EDIT:
+            for row in rows:
+                if row[:2] == key:
+                    row[2:] = [change['Current Data'], change['Current Type']]
+        else:
+            rows = [row for row in rows if row[:2] != key]
+    return rows
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_overlay_sync_like_replay(tmp_path, seed):
+    generator = random.Random(seed)
+    keys = [(entry[0], entry[1]) for entry in GOLDEN] + [(r"HKLM\Software\MV", f"New{number}") for number in range(3)]
+    journal = EditJournal(str(tmp_path / "M1_edit.temp"), compact_every=generator.randint(2, 10))
+    overlay = EditorOverlay(GOLDEN, journal)
+
+    for step in range(generator.randint(1, 25)):
+        path, name = generator.choice(keys)
+        choice = generator.random()
+        added_index = journal.find_added(path, name, match_path_case=True)
+        if choice < 0.3 and added_index is not None:
+            journal.update(added_index, generator.choice([{'Data': str(step)}, {'Action': DELETE}]))
+        elif choice < 0.55:
+            journal.append(add(path, name, str(step)))
+        elif choice < 0.8:
+            journal.append(edit(path, name, str(step)))
+        else:
+            journal.append(delete(path, name))
+
+        touched_keys = overlay.sync()
+        assert touched_keys is None or touched_keys <= set(keys)
+        expected = replayed_rows(GOLDEN, journal.changes)
+        assert overlay.live_rows() == expected
+        assert overlay.count == len(expected)
+        for key in keys:
+            assert overlay.key_rows(key) == [row for row in expected if tuple(row[:2]) == key]
+
+    assert EditorOverlay(GOLDEN, EditJournal(journal.edit_temp_file)).live_rows() == overlay.live_rows()
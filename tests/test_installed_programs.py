@@ -0,0 +1,37 @@
+'''Installed programs inventory on a fake registry, read by one thread per source.'''
+
+from fake_registry import REG_SZ, FakeRegistry
+from installed_programs import UNINSTALL_PATH, collect_installed_programs
+
+
+def program_registry(count):
+    registry = FakeRegistry()
+    user_root = registry.ConnectRegistry(None, registry.HKEY_CURRENT_USER).key
+    for index in range(count):
+        values = (('DisplayName', f"Program {index}"), ('DisplayVersion', f"1.{index}"), ('Publisher', "MV"))
+        if index % 3 == 0:
+            key = user_root
+            for name in f"{UNINSTALL_PATH}\\User{index}".split('\\'):
+                key = key.add_key(name)
+            for name, data in values:
+                key.set_value(name, data, REG_SZ)
+            key.last_write = 1
+        else:
+            for name, data in values:
+                registry.set_value(f"{UNINSTALL_PATH}\\App{index}", name, data, REG_SZ, timestamp=1)
+    # A subkey without a publisher is not a program
+    registry.set_value(f"{UNINSTALL_PATH}\\Update", 'DisplayName', "Update", REG_SZ, timestamp=1)
+    return registry
+
+
+def test_collect_counts_every_lookup(tmp_path, capsys):
+    registry = program_registry(300)
+    cache_file = str(tmp_path / "inventory.cache")
+    programs = collect_installed_programs(registry, cache_file, on_error=lambda message: None)
+    assert sorted(program['Name'] for program in programs) == sorted(f"Program {index}" for index in range(300))
+    # The fake registry shows both views of a hive the same, every subkey is looked up once per source
+    subkeys = 2 * (300 + 1)
+    assert f"0 read from the cache, {subkeys} read from the registry" in capsys.readouterr().out
+
+    assert collect_installed_programs(registry, cache_file, on_error=lambda message: None) == programs
+    assert f"{subkeys} read from the cache, 0 read from the registry" in capsys.readouterr().out
@@ -0,0 +1,99 @@
+'''read_reg_export on hand written .reg files.'''
+
+import codecs
+
+from reg_export import MV_TECHNOLOGY_ROOT, read_reg_export
+
+ROOT = MV_TECHNOLOGY_ROOT
+EXPORT_ROOT = 'HKEY_LOCAL_MACHINE\\SOFTWARE\\WOW6432Node\\MV Technology'
+
+
+def write_reg(tmp_path, lines, encoding='utf-16-le', bom=codecs.BOM_UTF16_LE):
+    file_path = tmp_path / "export.reg"
+    file_path.write_bytes(bom + "\r\n".join(lines).encode(encoding))
+    return str(file_path)
+
+
+def test_unicode_export(tmp_path):
+    reg_file = write_reg(tmp_path, [
+        'Windows Registry Editor Version 5.00',
+        '',
+        f'[{EXPORT_ROOT}]',
+        '@="root default"',
+        '"Port"=dword:0000000a',
+        '',
+        f'[{EXPORT_ROOT}\\Calib]',
+        '"Path"=hex(2):43,00,3a,00,5c,00,00,00',
+        '"List"=hex(7):61,00,00,00,62,00,00,00,00,00',
+        '"Big"=hex(b):01,00,00,00,00,00,00,00',
+        '"Blob"=hex:01,02,03,\\',
+        '  04,05',
+        '"Quoted"="say \\"hi\\" C:\\\\dir"',
+        '"Lines"="line one',
+        'line two"',
+        '"Name \\"x\\""="\u00e9t\u00e9"',
+        '',
+    ])
+    calib = ROOT + '\\Calib'
+    assert list(read_reg_export(reg_file)) == [
+        (calib, 'Path', 'C:\\', 'REG_EXPAND_SZ'),
+        (calib, 'List', ['a', 'b'], 'REG_MULTI_SZ'),
+        (calib, 'Big', '0x0000000000000001', 'REG_QWORD_LITTLE_ENDIAN'),
+        (calib, 'Blob', '01 02 03 04 05', 'REG_BINARY'),
+        (calib, 'Quoted', 'say "hi" C:\\dir', 'REG_SZ'),
+        (calib, 'Lines', 'line one\r\nline two', 'REG_SZ'),
+        (calib, 'Name "x"', '\u00e9t\u00e9', 'REG_SZ'),
+        (calib, 'Default', '', 'REG_SZ'),
+        (ROOT, '', 'root default', 'REG_SZ'),
+        (ROOT, 'Port', '0x0000000a', 'REG_DWORD_LITTLE_ENDIAN'),
+    ]
+
+
+def test_regedit4_export(tmp_path):
+    reg_file = write_reg(tmp_path, [
+        'REGEDIT4',
+        '',
+        '[HKEY_LOCAL_MACHINE\\SOFTWARE\\Other]',
+        '"Skipped"="outside the root"',
+        '',
+        f'[{EXPORT_ROOT}\\Cam]',
+        '"Path"=hex(2):43,3a,5c,00',
+        '"Gone"=-',
+        '"Gain"=dword:00000005',
+        '',
+        f'[-{EXPORT_ROOT}\\Deleted]',
+        '"Never"="read"',
+    ], encoding='cp1252', bom=b'')
+    assert list(read_reg_export(reg_file)) == [
+        (ROOT + '\\Cam', 'Path', 'C:\\', 'REG_EXPAND_SZ'),
+        (ROOT + '\\Cam', 'Gain', '0x00000005', 'REG_DWORD_LITTLE_ENDIAN'),
+        (ROOT + '\\Cam', 'Default', '', 'REG_SZ'),
+    ]
+
+
+def test_parents_left_out(tmp_path):
+    reg_file = write_reg(tmp_path, [
+        'Windows Registry Editor Version 5.00',
+        f'[{EXPORT_ROOT}\\A\\B]',
+        '"Value"="1"',
+        f'[{EXPORT_ROOT}\\C]',
+        '@="c"',
+    ])
+    assert list(read_reg_export(reg_file)) == [
+        (ROOT + '\\A\\B', 'Value', '1', 'REG_SZ'),
+        (ROOT + '\\A\\B', 'Default', '', 'REG_SZ'),
+        (ROOT + '\\A', 'Default', '', 'REG_SZ'),
+        (ROOT + '\\C', '', 'c', 'REG_SZ'),
+        (ROOT + '\\C', 'Default', '', 'REG_SZ'),
+    ]
+
+
+def test_empty_binary_value_ends_the_key(tmp_path):
+    reg_file = write_reg(tmp_path, [
+        'Windows Registry Editor Version 5.00',
+        f'[{EXPORT_ROOT}]',
+        '"First"="1"',
+        '"Empty"=hex:',
+        '"After"="2"',
+    ])
+    assert list(read_reg_export(reg_file)) == [(ROOT, 'First', '1', 'REG_SZ')]
@@ -0,0 +1,37 @@
+'''The columnar fleet compare against generate_compared_results_indexed (see test_registry_compare.py).'''
+
+import json
+import sys
+
+import pytest
+
+import registry_columnar
+from registry_columnar import compare_fleet
+from registry_compare import generate_compared_results_indexed
+from test_registry_compare import random_snapshots
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_compare_fleet(seed):
+    golden, current = random_snapshots(seed)
+    _, other = random_snapshots(seed + 1000)
+    comparisons = dict(compare_fleet(golden, [('pc1', current), ('pc2', other)]))
+    for machine, snapshot in (('pc1', current), ('pc2', other)):
+        assert list(comparisons[machine].to_compared_results().items()) == \
+            list(generate_compared_results_indexed(golden, snapshot).items())
+
+
+def test_main(tmp_path, monkeypatch):
+    golden, current = random_snapshots(7, size=20)
+    golden_file = tmp_path / "golden.json"
+    golden_file.write_text(json.dumps(golden))
+    snapshot_file = tmp_path / "MicroAOI-01.json"
+    snapshot_file.write_text(json.dumps(current))
+    output_folder = tmp_path / "results"
+
+    monkeypatch.setattr(sys, 'argv', ["registry_columnar.py", str(golden_file), str(snapshot_file),
+                                      "--output-folder", str(output_folder)])
+    registry_columnar.main()
+
+    results = json.loads((output_folder / "MicroAOI-01.json").read_text())
+    assert results == generate_compared_results_indexed(golden, current)
@@ -0,0 +1,446 @@
+'''Equivalence of the indexed registry compare with the pair-by-pair functions it replaced.
+
+The reference functions below are match_reg_item, redundant_reg_keys,
+generate_reg_data, generate_redundant_data, match_reg_compared_item and
+generate_compared_results as main.py had them before registry_compare.py,
+unchanged except that errors are not written to the GUI's error log. Every
+test compares the results (values and key order) on randomized snapshots with
+blank names, password names, case differences, 'N/A' data and result keys
+that two golden rows share ('A\\B' + 'C' and 'A' + 'B\\C').
+'''
+
+import random
+
+import pytest
+
+from registry_compare import (generate_compared_results_indexed, generate_reg_data_indexed,
+                              generate_redundant_data_indexed)
+
+
+def write_into_error_log(content):
+    pass
+
+
+# Reference: the functions of main.py before the indexed compare
+
+def match_reg_item(registry_path, registry_name, registry_type, registry_data, registry):
+    try:
+        current_registry_path, current_registry_name, current_registry_type, current_registry_data = registry
+    except ValueError:
+        write_into_error_log(content="Registry item has unexpected structure: " + registry)
+        raise ValueError(f"Registry item has unexpected structure: {registry}")
+
+    # Check name similarity
+    if current_registry_name == "":
+        registry_name = current_registry_name
+
+        # Check if both path and name fully match
+    if current_registry_path.lower() == registry_path.lower() and current_registry_name.lower() == registry_name.lower():
+        # Check if either type is 'N/A'
+        if registry_type == 'N/A' or current_registry_type == 'N/A':
+            return "Pass"
+
+        if registry_name in ['Password', 'calib3dpassword'] or current_registry_name in ['Password', 'calib3dpassword']:
+            return "Exist"
+
+        # Convert data to string for comparison if necessary
+        if isinstance(current_registry_data, bytes):
+            current_registry_data = " ".join([f"{byte:02X}" for byte in current_registry_data])
+        if isinstance(registry_data, bytes):
+            registry_data = " ".join([f"{byte:02X}" for byte in registry_data])
+
+        # Compare type and data
+        if current_registry_type == registry_type and current_registry_data == registry_data:
+            return "Pass"
+        else:
+            return "Fail"
+
+    elif current_registry_path.lower() != registry_path.lower() and current_registry_name != registry_name and registry_name not in [
+        'Password', 'calib3dpassword']:
+
+        return "Missing"  # If path or name does not fully match, return missing
+
+    elif current_registry_path.lower() != registry_path.lower() and current_registry_name != registry_name and registry_name in [
+        'Password', 'calib3dpassword']:
+
+        return "Not Exist"
+
+
+# Compare the registry keys between the golden file with the current pc to get the redundant keys
+# Special case: current pc got, golden file dun have
+def redundant_reg_keys(registry_path, registry_name, registry_type, registry_data, registry):
+    try:
+        current_registry_path, current_registry_name, current_registry_type, current_registry_data = registry
+    except ValueError:
+        write_into_error_log(content="Registry item has unexpected structure: " + str(registry))
+        raise ValueError(f"Registry item has unexpected structure: {registry}")
+
+    # Step 1: Check if the path and name do not fully match
+    if current_registry_path.lower() != registry_path.lower() or current_registry_name.lower() != registry_name.lower():
+        # Condition preserved from previous code
+        if registry_name not in ['Password', 'calib3dpassword']:
+            return "Missing"  # Indicates it's present on current PC but absent in the golden file
+        else:
+            return "Not Exist"  # Special case for 'Password' or 'calib3dpassword'
+
+    # Step 2: Proceed with existing checks if the path and name fully match
+    # Check if both path and name fully match
+    if current_registry_path.lower() == registry_path.lower() and current_registry_name.lower() == registry_name.lower():
+        # Check if either type is 'N/A'
+        if registry_type == 'N/A' or current_registry_type == 'N/A':
+            return "Pass"
+
+        if registry_name in ['Password', 'calib3dpassword'] or current_registry_name in ['Password', 'calib3dpassword']:
+            return "Exist"
+
+        # Convert data to string for comparison if necessary
+        if isinstance(current_registry_data, bytes):
+            current_registry_data = " ".join([f"{byte:02X}" for byte in current_registry_data])
+        if isinstance(registry_data, bytes):
+            registry_data = " ".join([f"{byte:02X}" for byte in registry_data])
+
+        # Compare type and data
+        if current_registry_type == registry_type and current_registry_data == registry_data:
+            return "Pass"
+        else:
+            return "Fail"
+
+
+# generate the registry keys data and save to the result_reg_data.json
+# show the data in the first page table
+def generate_reg_data(software_pc_data, current_pc_reg_data):
+    results = {}
+
+    # Step 1: Create a lookup set for quick presence checks in current data
+    current_keys = {(registry[0].lower(), registry[1].lower()) for registry in current_pc_reg_data}
+
+    # Step 2: Process each entry in software data
+    for registry_path, registry_name, registry_type, registry_data in software_pc_data:
+        registry_key = (registry_path.lower(), registry_name.lower())
+
+        # Initialize matched_registry to store potential matches for Pass
+        matched_registry = []
+
+        # Step 3: Check for special cases of Exist and Not Exist
+        if any(match_reg_item(registry_path, registry_name, registry_type, registry_data, registry) == 'Exist'
+               for registry in current_pc_reg_data):
+            status = 'Exist'
+            matched_registry_dict = {
+                'Registry Key/Subkey Path': registry_path,
+                'Registry Name': registry_name,
+                'Registry Type': registry_data,
+                'Data': registry_type
+            }
+
+        elif any(match_reg_item(registry_path, registry_name, registry_type, registry_data, registry) == 'Not Exist'
+                 for registry in current_pc_reg_data):
+            status = 'Not Exist'
+            matched_registry_dict = {
+                'Registry Key/Subkey Path': registry_path,
+                'Registry Name': registry_name,
+                'Registry Type': registry_data,
+                'Data': registry_type
+            }
+
+        # Step 4: Handle Missing status if the key does not exist in current data
+        elif registry_key not in current_keys:
+            status = 'Missing'
+            matched_registry_dict = {
+                'Registry Key/Subkey Path': registry_path,
+                'Registry Name': registry_name,
+                'Registry Type': registry_data,
+                'Data': registry_type
+            }
+
+        else:
+            # Step 5: Process Pass and Fail statuses by checking current data entries
+            for registry in current_pc_reg_data:
+                try:
+                    # Use the match function to identify Pass or Fail
+                    match_status = match_reg_item(registry_path, registry_name, registry_type, registry_data, registry)
+                    if match_status == 'Pass':
+                        matched_registry.append(registry)  # Found a matching entry with Pass
+                    elif match_status == 'Fail':
+                        continue  # Skip to the next item if Fail
+                except ValueError as ve:
+                    print(ve)
+                    write_into_error_log(content="Value error: " + str(ve))
+                    continue
+
+            # Finalize status based on matches found
+            if matched_registry:
+                status = 'Pass'
+                matched_registry_item = matched_registry[0]  # Use first Pass match found
+                matched_registry_dict = {
+                    'Registry Key/Subkey Path': matched_registry_item[0],
+                    'Registry Name': matched_registry_item[1],
+                    'Registry Type': matched_registry_item[3],
+                    'Data': matched_registry_item[2]
+                }
+            else:
+                status = 'Fail'
+                matched_registry_dict = {
+                    'Registry Key/Subkey Path': registry_path,
+                    'Registry Name': registry_name,
+                    'Registry Type': registry_data,
+                    'Data': registry_type
+                }
+
+        # Step 6: Add the result to the results dictionary
+        results[f"{registry_path}\\{registry_name}"] = {
+            'Registry Key/Subkey Path': matched_registry_dict['Registry Key/Subkey Path'],
+            'Registry Name': matched_registry_dict['Registry Name'],
+            'Registry Type': matched_registry_dict['Registry Type'],
+            'Data': matched_registry_dict['Data'],
+            'Status': status
+        }
+
+    return results
+
+
+# Generate the redundant keys data show in the bottom table of the summary page
+def generate_redundant_data(software_pc_data, current_pc_reg_data):
+    results = {}
+    # sample registry
+    for registry_path, registry_name, registry_type, registry_data in current_pc_reg_data:
+        matched_registry = []
+        for registry in software_pc_data:
+            try:
+                match_status = redundant_reg_keys(registry_path, registry_name, registry_type, registry_data, registry)
+                if match_status == 'Pass':
+                    matched_registry.append(registry)
+                elif match_status == 'Fail':
+                    continue  # Do nothing, continue checking other items
+                elif match_status == 'Missing':
+                    continue  # Do nothing, continue checking other items
+            except ValueError as ve:
+                print(ve)
+                write_into_error_log(content="Value error: " + ve)
+                continue
+
+        # Determine the status based on whether a match was found
+        if matched_registry:
+            status = 'Pass'
+            matched_registry_item = matched_registry[0]
+            matched_registry_dict = {
+                'Registry Key/Subkey Path': matched_registry_item[0],
+                'Registry Name': matched_registry_item[1],
+                'Registry Type': matched_registry_item[3],
+                'Data': matched_registry_item[2]
+            }
+        else:
+            if any(redundant_reg_keys(registry_path, registry_name, registry_type, registry_data, registry) == 'Fail'
+                   for registry in software_pc_data):
+                status = 'Fail'
+
+            elif any(redundant_reg_keys(registry_path, registry_name, registry_type, registry_data, registry) == 'Exist'
+                     for registry in software_pc_data):
+                status = 'Exist'
+
+            elif any(match_reg_item(registry_path, registry_name, registry_type, registry_data, registry) == 'Not Exist'
+                     for registry in current_pc_reg_data):
+                status = 'Not Exist'
+
+            else:
+                status = 'Missing'
+
+            matched_registry_dict = {
+                'Registry Key/Subkey Path': registry_path,
+                'Registry Name': registry_name,
+                'Registry Type': registry_data,
+                'Data': registry_type
+            }
+
+        # Add the result to the results dictionary
+        results[f"{registry_path}\\{registry_name}"] = {
+            'Registry Key/Subkey Path': matched_registry_dict['Registry Key/Subkey Path'],
+            'Registry Name': matched_registry_dict['Registry Name'],
+            'Registry Type': matched_registry_dict['Registry Type'],
+            'Data': matched_registry_dict['Data'],
+            'Status': status
+        }
+
+    return results
+
+
+# Compare the registry keys and get the fail and missing keys data only
+# The data will be used to show in the upper table in the summary page
+def match_reg_compared_item(registry_path, registry_name, registry_type, registry_data, registry):
+    try:
+        current_registry_path, current_registry_name, current_registry_type, current_registry_data = registry
+    except ValueError:
+        write_into_error_log(content="Registry item has unexpected structure: " + registry)
+        raise ValueError(f"Registry item has unexpected structure: {registry}")
+
+    # Check name similarity
+    if current_registry_name == "":
+        registry_name = current_registry_name
+
+        # Check if both path and name fully match
+    # if registry_path.lower() == current_registry_path.lower() and name_similarity >= 100:
+    if current_registry_path.lower() == registry_path.lower() and current_registry_name.lower() == registry_name.lower():
+        # Check if either type is 'N/A'
+        if registry_type == 'N/A' or current_registry_type == 'N/A':
+            return "Pass"
+        # special case for password
+        if registry_name in ['Password', 'calib3dpassword'] or current_registry_name in ['Password', 'calib3dpassword']:
+            return "Exist"
+        # Convert data to string for comparison if necessary
+        if isinstance(current_registry_data, bytes):
+            current_registry_data = " ".join([f"{byte:02X}" for byte in current_registry_data])
+        if isinstance(registry_data, bytes):
+            registry_data = " ".join([f"{byte:02X}" for byte in registry_data])
+
+        # Compare type and data
+        if current_registry_type == registry_type and current_registry_data == registry_data:
+            return "Pass"
+        else:
+            return "Fail"
+
+    elif current_registry_path.lower() != registry_path.lower() and current_registry_name.lower() != registry_name.lower() and registry_name not in [
+        'Password', 'calib3dpassword']:
+
+        return "Missing"  # If path or name does not fully match, return missing
+
+    elif current_registry_path.lower() != registry_path.lower() and current_registry_name != registry_name and registry_name in [
+        'Password', 'calib3dpassword']:
+
+        return "Not Exist"
+
+
+# Generate the compared registry data for upper table in summary page
+def generate_compared_results(sample_reg_pc_data, current_pc_reg_data):
+    results = {}
+
+    # Step 1: Create a set of identifiers for fast lookup
+    current_keys = {
+        (registry[0].lower(), registry[1].lower()): registry for registry in current_pc_reg_data
+    }
+
+    # Step 2: Process each sample registry entry
+    for registry_path, registry_name, registry_type, registry_data in sample_reg_pc_data:
+        registry_key = (registry_path.lower(), registry_name.lower())
+
+        # Step 3: Check if this key exists in the current data set
+        if registry_key in current_keys:
+            # Retrieve the matching registry entry from current data
+            current_registry = current_keys[registry_key]
+
+            # Determine specific match status with helper function
+            status = match_reg_compared_item(
+                registry_path, registry_name, registry_type, registry_data, current_registry
+            )
+
+            # Build registry dictionary based on identified status
+            matched_registry_dict = {
+                'Registry Key/Subkey Path': current_registry[0],
+                'Registry Name': current_registry[1] or registry_name,
+                'Current Type': current_registry[3],
+                'Expected Type': registry_data,
+                'Current Data': current_registry[2],
+                'Expected Data': registry_type
+            }
+
+            # Differentiation for `Pass` and `Fail`
+            if status == 'Pass':
+                status = 'Pass'
+            elif status == 'Fail':
+                status = 'Fail'
+
+        else:
+            # Item is not found in current data; determine if it’s `Missing`, `Exist`, or `Not Exist`
+            if registry_name.lower() in ['password', 'calib3dpassword']:
+                status = 'Exist'
+                matched_registry_dict = {
+                    'Registry Key/Subkey Path': registry_path,
+                    'Registry Name': registry_name,
+                    'Current Type': '-',
+                    'Expected Type': registry_data,
+                    'Current Data': '-',
+                    'Expected Data': registry_type
+                }
+            else:
+                # Default to `Missing` when no match is found in current data
+                status = 'Missing'
+                matched_registry_dict = {
+                    'Registry Key/Subkey Path': registry_path,
+                    'Registry Name': registry_name,
+                    'Current Type': '-',
+                    'Expected Type': registry_data,
+                    'Current Data': '-',
+                    'Expected Data': registry_type
+                }
+
+        # Step 4: Add each processed entry to the results dictionary
+        results[f"{registry_path}\\{registry_name}"] = {
+            **matched_registry_dict,
+            'Status': status
+        }
+
+    return results
+
+
+PATHS = ['Software\\MV', 'SOFTWARE\\mv', 'Software\\MV\\Calib', 'Software\\MV\\Calib\\Cam1', 'A', 'A\\B', 'a\\b']
+NAMES = ['', 'Port', 'port', 'Mode', 'Password', 'password', 'calib3dpassword', 'C', 'B\\C', 'b\\c']
+DATA = ['1', '2', 'abc', 'N/A', '0x00000001', ['x', 'y']]
+TYPES = ['REG_SZ', 'REG_DWORD_LITTLE_ENDIAN', 'REG_MULTI_SZ', 'N/A']
+
+
+def random_entry(generator):
+    return [generator.choice(PATHS), generator.choice(NAMES), generator.choice(DATA), generator.choice(TYPES)]
+
+
+# A golden file and a current pc snapshot made from it: entries dropped, changed, recased and added
+def random_snapshots(seed, size=None):
+    generator = random.Random(seed)
+    size = generator.randint(0, 30) if size is None else size
+    golden = [random_entry(generator) for _ in range(size)]
+    current = []
+    for path, name, data, reg_type in golden:
+        choice = generator.random()
+        if choice < 0.15:
+            continue
+        if choice < 0.3:
+            data = generator.choice(DATA)
+        elif choice < 0.4:
+            path, name = path.upper(), name.lower()
+        elif choice < 0.45:
+            reg_type = generator.choice(TYPES)
+        current.append([path, name, data, reg_type])
+    for _ in range(generator.randint(0, 8)):
+        current.insert(generator.randint(0, len(current)), random_entry(generator))
+    return golden, current
+
+
+def same_results(actual, expected):
+    assert list(actual.items()) == list(expected.items())
+
+
+SEEDS = range(300)
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_reg_data(seed):
+    golden, current = random_snapshots(seed)
+    same_results(generate_reg_data_indexed(golden, current), generate_reg_data(golden, current))
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_compared_results(seed):
+    golden, current = random_snapshots(seed)
+    same_results(generate_compared_results_indexed(golden, current), generate_compared_results(golden, current))
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_redundant_data(seed):
+    golden, current = random_snapshots(seed)
+    same_results(generate_redundant_data_indexed(golden, current), generate_redundant_data(golden, current))
+
+
+def test_colliding_result_keys():
+    golden = [['A\\B', 'C', '1', 'REG_SZ'], ['A', 'B\\C', '2', 'REG_SZ']]
+    current = [['A', 'B\\C', '2', 'REG_SZ'], ['A\\B', 'C', '1', 'REG_SZ']]
+    for indexed, reference in ((generate_reg_data_indexed, generate_reg_data),
+                               (generate_compared_results_indexed, generate_compared_results),
+                               (generate_redundant_data_indexed, generate_redundant_data)):
+        same_results(indexed(golden, current), reference(golden, current))
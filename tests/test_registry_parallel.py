@@ -0,0 +1,70 @@
+'''Sharded registry compare over a process pool.'''
+
+import subprocess
+import sys
+
+import pytest
+
+from registry_parallel import (NamedEntryCounts, compare_shard, compare_sharded, merge_results, split_shards,
+                               trim_named_counts)
+from test_registry_compare import (generate_compared_results, generate_reg_data, generate_redundant_data,
+                                   random_snapshots, same_results)
+
+
+# The shards merged back without a pool: each shard compared the way the workers do
+def compare_shards_serially(golden, current, shard_count):
+    named = NamedEntryCounts()
+    for path, name, data, reg_type in current:
+        named.add(path, name)
+    shards, golden_shards, current_shards = split_shards(golden, current, shard_count)
+    shard_results = [compare_shard(shard.golden_entries, shard.current_entries, shard.own,
+                                   trim_named_counts(named, shard.password_paths))
+                     for shard in shards]
+    return (merge_results(golden, golden_shards, [results[0] for results in shard_results]),
+            merge_results(golden, golden_shards, [results[1] for results in shard_results]),
+            merge_results(current, current_shards, [results[2] for results in shard_results]))
+
+
+def assert_serial_results(results, golden, current):
+    reg_data, compared_results, redundant_data = results
+    same_results(reg_data, generate_reg_data(golden, current))
+    same_results(compared_results, generate_compared_results(golden, current))
+    same_results(redundant_data, generate_redundant_data(golden, current))
+
+
+@pytest.mark.parametrize('shard_count', [1, 2, 3, 7])
+@pytest.mark.parametrize('seed', range(300))
+def test_shards_merge_like_one_compare(seed, shard_count):
+    golden, current = random_snapshots(seed)
+    assert_serial_results(compare_shards_serially(golden, current, shard_count), golden, current)
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_compare_sharded_like_serial_compare(seed):
+    golden, current = random_snapshots(seed, size=40 + seed)
+    assert_serial_results(compare_sharded(golden, current, workers=2 + seed % 3, threshold=0), golden, current)
+
+
+def test_below_threshold_stays_in_process():
+    golden, current = random_snapshots(0, size=30)
+    assert_serial_results(compare_sharded(golden, current, workers=4), golden, current)
+
+
+# A script that opens a GUI when it is run declares a __main__ module spec like main.py, and the
+# workers do not run it again
+def test_workers_do_not_run_the_main_script(tmp_path):
+    script = tmp_path / 'script.py'
+    script.write_text(
+        "import importlib.machinery\n"
+        "import sys\n"
+        f"sys.path[:0] = {sys.path!r}\n"
+        "print('script ran', flush=True)\n"
+        "__spec__ = importlib.machinery.ModuleSpec('__main__', None)\n"
+        "from registry_parallel import compare_sharded\n"
+        "from test_registry_compare import random_snapshots\n"
+        "golden, current = random_snapshots(1, size=40)\n"
+        "compare_sharded(golden, current, workers=2, threshold=0)\n"
+        "print('compared', flush=True)\n")
+    completed = subprocess.run([sys.executable, str(script)], capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.splitlines() == ['script ran', 'compared']
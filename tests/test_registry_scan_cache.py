@@ -0,0 +1,151 @@
+'''ScanCache reuse and invalidation by last write time, on fake registries.'''
+
+import pytest
+
+from fake_registry import REG_SZ, FakeRegistry
+from registry_scan_cache import ScanCache, load_scan_cache
+from registry_walker import ParallelScan, walk_registry
+from test_registry_walker import ROOT, hive_key, random_registry, walk
+
+# An old FILETIME, a key with it is stored by the next scan
+OLD = 1
+
+
+class CountingRegistry(FakeRegistry):
+    def __init__(self, root):
+        super().__init__(root)
+        self.enumerated = 0
+
+    def EnumKey(self, handle, index):
+        self.enumerated += 1
+        return super().EnumKey(handle, index)
+
+    def EnumValue(self, handle, index):
+        self.enumerated += 1
+        return super().EnumValue(handle, index)
+
+
+def counting_registry(seed):
+    registry = CountingRegistry(random_registry(seed).root)
+    for path in key_paths(registry):
+        registry.key(path).last_write = OLD
+    return registry
+
+
+def key_paths(registry, path=ROOT):
+    paths = [path]
+    for name in registry.key(path).subkey_names():
+        paths.extend(key_paths(registry, path + '\\' + name))
+    return paths
+
+
+def cached_scan(registry, cache, threads=1):
+    cache.begin()
+    if threads > 1:
+        entries = ParallelScan(registry, hive_key(registry), ROOT, threads, 1, cache=cache).read()
+    else:
+        entries = list(walk_registry(registry, hive_key(registry), ROOT, cache=cache))
+    cache.finish()
+    return entries
+
+
+def new_cache(tmp_path):
+    return ScanCache(str(tmp_path / "registry_scan.cache"), ROOT)
+
+
+@pytest.mark.parametrize('threads', [1, 4])
+@pytest.mark.parametrize('seed', range(20))
+def test_unchanged_keys_are_reused(tmp_path, seed, threads):
+    registry = counting_registry(seed)
+    cache = new_cache(tmp_path)
+    expected = walk(registry)
+    assert cached_scan(registry, cache, threads) == expected
+    assert cache.misses == len(key_paths(registry))
+
+    registry.enumerated = 0
+    assert cached_scan(registry, cache, threads) == expected
+    assert registry.enumerated == 0
+    assert (cache.hits, cache.misses) == (len(key_paths(registry)), 0)
+
+    # The saved cache is reused by the next process
+    loaded = load_scan_cache(cache.cache_file, ROOT)
+    assert loaded.previous == cache.previous
+    assert cached_scan(registry, loaded, threads) == expected
+    assert registry.enumerated == 0
+
+
+def test_changed_key_is_read_again(tmp_path):
+    registry = counting_registry(5)
+    cache = new_cache(tmp_path)
+    cached_scan(registry, cache)
+    changed = key_paths(registry)[-1]
+    registry.set_value(changed, 'Port', 'changed', REG_SZ, timestamp=OLD + 1)
+
+    entries = cached_scan(registry, cache)
+    assert entries == walk(registry)
+    assert (changed, 'Port', 'changed', 'REG_SZ') in entries
+    assert cache.misses == 1
+
+
+def test_deleted_and_added_subkeys(tmp_path):
+    registry = counting_registry(7)
+    cache = new_cache(tmp_path)
+    cached_scan(registry, cache)
+    deleted = next(path for path in key_paths(registry) if path != ROOT and registry.key(path).subkeys)
+    below = [path for path in key_paths(registry) if path.startswith(deleted + '\\')]
+    registry.delete_key(deleted, timestamp=OLD + 1)
+    registry.add_key(ROOT + '\\Added', timestamp=OLD + 1)
+    registry.set_value(ROOT + '\\Added', 'New', '1', REG_SZ, timestamp=OLD + 1)
+
+    entries = cached_scan(registry, cache)
+    assert entries == walk(registry)
+    assert not any(path == deleted or path.startswith(deleted + '\\') for path, name, data, reg_type in entries)
+    assert (ROOT + '\\Added', 'New', '1', 'REG_SZ') in entries
+    # The deleted keys are gone from the cache too
+    assert deleted not in cache.previous and not any(path in cache.previous for path in below)
+
+
+def test_recently_written_keys_are_not_stored(tmp_path):
+    registry = counting_registry(2)
+    registry.set_value(ROOT, 'Now', '1', REG_SZ)
+    cache = new_cache(tmp_path)
+    cached_scan(registry, cache)
+    assert ROOT not in cache.previous
+
+    cached_scan(registry, cache)
+    assert cache.misses == 1
+
+
+def test_unfinished_scan_keeps_the_cache(tmp_path):
+    registry = counting_registry(4)
+    cache = new_cache(tmp_path)
+    cached_scan(registry, cache)
+    previous = cache.previous
+
+    cache.begin()
+    entries = walk_registry(registry, hive_key(registry), ROOT, cache=cache)
+    next(entries)
+    entries.close()
+    assert cache.previous is previous
+    assert load_scan_cache(cache.cache_file, ROOT).previous == previous
+
+
+@pytest.mark.parametrize('content', [b'', b'not marshal data', b'\xfb\x00\x01'])
+def test_corrupt_cache_file(tmp_path, content, capsys):
+    registry = counting_registry(9)
+    cache_file = tmp_path / "registry_scan.cache"
+    cache_file.write_bytes(content)
+
+    cache = load_scan_cache(str(cache_file), ROOT)
+    assert cache.previous == {}
+    assert 'not usable' in capsys.readouterr().out
+    assert cached_scan(registry, cache) == walk(registry)
+    assert load_scan_cache(str(cache_file), ROOT).previous == cache.previous
+
+
+def test_cache_of_another_root(tmp_path, capsys):
+    registry = counting_registry(9)
+    cache = new_cache(tmp_path)
+    cached_scan(registry, cache)
+    assert load_scan_cache(cache.cache_file, ROOT + '\\Other').previous == {}
+    assert 'not usable' in capsys.readouterr().out
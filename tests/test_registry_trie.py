@@ -0,0 +1,139 @@
+'''Key path trie of registry snapshots and the Merkle digests over it.'''
+
+import json
+import random
+
+import pytest
+
+from golden_index import compile_golden_file, read_golden_index, save_golden_index
+from registry_compare import CurrentRegistryIndex
+from registry_merkle import MerkleTree, differing_paths
+from registry_trie import ROOT, PathRows, PathTrie
+
+SEGMENTS = ["Software", "SOFTWARE", "MV Technology", "mv technology", "Cam", "cam", "", "Σ", "ΑΣ", "İ", "ß", "a b"]
+
+
+def random_path(generator):
+    return "\\".join(generator.choice(SEGMENTS) for _ in range(generator.randint(1, 5)))
+
+
+def random_paths(seed, count=60):
+    generator = random.Random(seed)
+    return [random_path(generator) for _ in range(count)]
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_nodes(seed):
+    paths = random_paths(seed)
+    trie = PathTrie()
+    nodes = [trie.node(path) for path in paths]
+
+    for path, node in zip(paths, nodes):
+        assert trie.lower_paths[node] == path.lower()
+        assert trie.find(path) == trie.find(path.lower()) == node
+        assert node != ROOT
+    # One node per lowercased path, whatever the spelling
+    assert len({path.lower() for path in paths}) == len(set(nodes))
+    for node in range(1, len(trie)):
+        parent = trie.parents[node]
+        assert parent < node and trie.children[parent][trie.segments[node]] == node
+        expected = trie.segments[node] if parent == ROOT else f"{trie.lower_paths[parent]}\\{trie.segments[node]}"
+        assert trie.lower_paths[node] == expected
+    assert trie.find("Not\\There") is None
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_under_is_a_prefix_scan(seed):
+    paths = random_paths(seed)
+    trie = PathTrie()
+    for path in paths:
+        trie.node(path)
+    for path in paths[:10]:
+        lower_path = path.lower()
+        under = trie.under(trie.find(path))
+        assert under[0] == trie.find(path)
+        assert sorted(under) == [node for node in range(1, len(trie))
+                                 if trie.lower_paths[node] == lower_path or
+                                 trie.lower_paths[node].startswith(lower_path + "\\")]
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_containing_is_a_substring_scan(seed):
+    generator = random.Random(seed)
+    paths = random_paths(seed)
+    rows = [[None, path, f"Value{number}"] for number, path in enumerate(paths)]
+    table = PathRows(rows)
+    texts = ["", "\\", "\\\\", "cam", "t\\c", "σ", "i̇", "ware\\mv", "zzz"] + \
+        [generator.choice(paths).lower()[generator.randint(0, 3):] for _ in range(5)]
+    for text in texts:
+        assert table.paths.containing(text) == {node for node in range(1, len(table.paths))
+                                                if text in table.paths.lower_paths[node]}
+        assert table.containing(text) == [row for row in rows if text in row[1].lower()]
+
+
+def test_rows_on_a_trie_with_their_paths():
+    trie = PathTrie()
+    first = PathRows([[None, "HKLM\\Software\\MV", "A"]], paths=trie)
+    second = PathRows([[None, "hklm\\software\\mv", "B"], [None, "HKLM\\Other", "C"]], paths=trie)
+    assert second.row_nodes[0] == first.row_nodes[0]
+    assert second.containing("other") == [[None, "HKLM\\Other", "C"]]
+
+
+def random_entries(generator, paths, count):
+    return [[generator.choice(paths), generator.choice(["", "Name", "name", "Other"]),
+             generator.choice(["1", "2", "N/A"]), "REG_SZ"] for _ in range(count)]
+
+
+# Lowercased paths whose entries differ, from the entries of every path
+def differing_by_scan(golden, current):
+    def entries_by_path(entries):
+        by_path = {}
+        for entry in entries:
+            by_path.setdefault(entry[0].lower(), []).append(entry)
+        return by_path
+
+    golden_by_path, current_by_path = entries_by_path(golden), entries_by_path(current)
+    return {path for path in golden_by_path.keys() | current_by_path.keys()
+            if golden_by_path.get(path) != current_by_path.get(path)}
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_differing_paths(seed):
+    generator = random.Random(seed)
+    paths = random_paths(seed, 20)
+    golden = random_entries(generator, paths, 30)
+    current = [list(entry) for entry in golden if generator.random() < 0.9]
+    for entry in current:
+        if generator.random() < 0.1:
+            entry[2] = generator.choice(["1", "2", "N/A"])
+    current += random_entries(generator, paths + random_paths(seed + 1, 3), generator.randint(0, 3))
+
+    golden_tree = MerkleTree.build(golden)
+    current_tree = MerkleTree.from_index(CurrentRegistryIndex(current))
+    differing, compared = differing_paths(golden_tree, current_tree)
+    assert differing == differing_by_scan(golden, current)
+    for path in differing:
+        assert [current[position] for position in current_tree.positions(path)] == \
+            [entry for entry in current if entry[0].lower() == path]
+
+    same, compared = differing_paths(golden_tree, MerkleTree.build([list(entry) for entry in golden]))
+    assert same == set() and compared == 1
+
+
+def test_golden_index_keeps_the_tree(tmp_path):
+    generator = random.Random(0)
+    paths = random_paths(0, 20)
+    golden = random_entries(generator, paths, 40)
+    golden_file = tmp_path / "golden.json"
+    golden_file.write_text(json.dumps(golden))
+
+    compiled = compile_golden_file(str(golden_file))
+    save_golden_index(compiled)
+    loaded = read_golden_index(str(golden_file))
+    assert loaded.tree.subtree == compiled.tree.subtree
+    assert loaded.tree.paths.lower_paths == compiled.tree.paths.lower_paths
+
+    current = golden[:30] + random_entries(generator, paths, 5)
+    current_tree = MerkleTree.build(current)
+    assert differing_paths(loaded.tree, current_tree) == differing_paths(compiled.tree, current_tree)
+    assert differing_paths(loaded.tree, current_tree)[0] == differing_by_scan(golden, current)
@@ -0,0 +1,25 @@
+'''RegistryValue indexes like the [path, name, data, type] list it replaces.'''
+
+import pytest
+
+from registry_value import RegistryValue
+
+
+def test_indexing():
+    entry = ['Software\\MV', 'Port', 1, 'REG_DWORD_LITTLE_ENDIAN']
+    value = RegistryValue.from_entry(entry)
+    expected = ['Software\\MV', 'Port', '0x00000001', 'REG_DWORD_LITTLE_ENDIAN']
+    for index in range(-4, 4):
+        assert value[index] == expected[index]
+    assert value[:2] == expected[:2]
+    assert value[1:] == expected[1:]
+    assert value[::-1] == expected[::-1]
+    with pytest.raises(IndexError):
+        value[4]
+
+
+def test_golden_only_type():
+    value = RegistryValue('Software\\MV', '', ['x', 'y'], 'N/A')
+    assert value[2] == ['x', 'y']
+    assert value[3] == 'N/A'
+    assert list(value) == value.as_list()
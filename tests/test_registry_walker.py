@@ -0,0 +1,239 @@
+'''walk_registry on fake registries, against the recursive reader it replaced and reg exports.'''
+
+import codecs
+import random
+
+import pytest
+
+from fake_registry import (REG_BINARY, REG_DWORD, REG_EXPAND_SZ, REG_MULTI_SZ, REG_QWORD, REG_SZ, FakeRegistry,
+                           read_recursive)
+from reg_export import MV_TECHNOLOGY_ROOT, read_reg_export
+from registry_walker import ParallelScan, walk_registry
+
+ROOT = MV_TECHNOLOGY_ROOT
+KEY_NAMES = ['Calib', 'Cam', 'Settings', 'Log Files', 'v1.2', 'Ünits']
+VALUE_NAMES = ['', 'Port', 'Mode', 'Password', 'Path', 'Name "quoted"', 'back\\slash', 'é']
+STRINGS = ['', '1', 'abc', 'C:\\dir\\"x"', 'été', 'a=b;c', '%SystemRoot%\\x']
+
+
+def random_data(generator, value_type):
+    if value_type in (REG_SZ, REG_EXPAND_SZ):
+        return generator.choice(STRINGS)
+    if value_type == REG_DWORD:
+        return generator.randrange(2 ** 32)
+    if value_type == REG_QWORD:
+        return generator.randrange(2 ** 64)
+    if value_type == REG_BINARY:
+        return bytes(generator.randrange(256) for _ in range(generator.randint(1, 60)))
+    return [generator.choice(STRINGS[1:]) for _ in range(generator.randint(0, 3))]
+
+
+def fill_key(generator, key, depth):
+    for _ in range(generator.randint(0, 4)):
+        value_type = generator.choice((REG_SZ, REG_EXPAND_SZ, REG_DWORD, REG_QWORD, REG_BINARY, REG_MULTI_SZ))
+        key.set_value(generator.choice(VALUE_NAMES), random_data(generator, value_type), value_type)
+    if depth < 4:
+        for index in range(generator.randint(2 if depth == 0 else 0, 3)):
+            fill_key(generator, key.add_key(f"{generator.choice(KEY_NAMES)}{index}"), depth + 1)
+
+
+# A random tree of keys and values under ROOT
+def random_registry(seed):
+    generator = random.Random(seed)
+    registry = FakeRegistry()
+    fill_key(generator, registry.key(ROOT, create=True), 0)
+    return registry
+
+
+def hive_key(registry):
+    return registry.ConnectRegistry(None, registry.HKEY_LOCAL_MACHINE)
+
+
+def walk(registry, path=ROOT, **options):
+    return list(walk_registry(registry, hive_key(registry), path, **options))
+
+
+def reg_string(text):
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def reg_hex(prefix, raw):
+    parts = [f"{byte:02x}" for byte in raw]
+    # regedit continues long hex data on indented lines
+    lines = [",".join(parts[start:start + 25]) for start in range(0, len(parts), 25)]
+    return prefix + ",\\\r\n  ".join(lines)
+
+
+def reg_value_line(name, data, value_type):
+    line = ('@' if name == '' else reg_string(name)) + '='
+    if value_type == REG_SZ:
+        return line + reg_string(data)
+    if value_type == REG_DWORD:
+        return line + f"dword:{data:08x}"
+    if value_type == REG_BINARY:
+        return line + reg_hex("hex:", data)
+    if value_type == REG_EXPAND_SZ:
+        raw = (data + '\x00').encode('utf-16-le')
+    elif value_type == REG_MULTI_SZ:
+        raw = (''.join(string + '\x00' for string in data) + '\x00').encode('utf-16-le')
+    else:
+        raw = data.to_bytes(8, 'little')
+    return line + reg_hex(f"hex({value_type:x}):", raw)
+
+
+# The lines regedit exports for a key and its subkeys
+def reg_key_lines(key, path):
+    lines = [f"[HKEY_LOCAL_MACHINE\\{path}]"]
+    lines.extend(reg_value_line(*value) for value in key.values)
+    lines.append('')
+    for name in key.subkey_names():
+        lines.extend(reg_key_lines(key.subkeys[name], path + '\\' + name))
+    return lines
+
+
+def write_reg_export(registry, file_path, path=ROOT):
+    lines = ['Windows Registry Editor Version 5.00', ''] + reg_key_lines(registry.key(path), path)
+    file_path.write_bytes(codecs.BOM_UTF16_LE + "\r\n".join(lines).encode('utf-16-le'))
+    return str(file_path)
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_same_as_recursive_reader(seed):
+    registry = random_registry(seed)
+    assert walk(registry) == read_recursive(registry, hive_key(registry), ROOT)
+    assert registry.open_handles == 0
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_same_as_reg_export(tmp_path, seed):
+    registry = random_registry(seed)
+    assert list(read_reg_export(write_reg_export(registry, tmp_path / "export.reg"))) == walk(registry)
+
+
+def test_deep_nesting():
+    registry = FakeRegistry()
+    depth = 1500
+    paths = [ROOT]
+    key = registry.key(ROOT, create=True)
+    for level in range(depth):
+        key.set_value('Level', level, REG_DWORD)
+        key = key.add_key('K')
+        paths.append(paths[-1] + '\\K')
+    key.set_value('Level', depth, REG_DWORD)
+
+    expected = []
+    for level in range(depth, -1, -1):
+        expected.append((paths[level], 'Level', f'0x{level:08x}', 'REG_DWORD_LITTLE_ENDIAN'))
+        if level:
+            expected.append((paths[level], 'Default', '', 'REG_SZ'))
+    # Deeper than the recursion limit: one stack frame per level, not one call
+    assert walk(registry) == expected
+    assert registry.open_handles == 0
+
+
+def test_stopped_early_closes_the_keys():
+    registry = random_registry(3)
+    entries = walk_registry(registry, hive_key(registry), ROOT)
+    next(entries)
+    assert registry.open_handles > 0
+    entries.close()
+    assert registry.open_handles == 0
+
+
+class DeniedRegistry(FakeRegistry):
+    def __init__(self, root, denied):
+        super().__init__(root)
+        self.denied = {path.lower() for path in denied}
+
+    def OpenKey(self, key, sub_key, reserved=0, access=None):
+        if sub_key.lower() in self.denied:
+            raise PermissionError(13, 'Access is denied', sub_key)
+        return super().OpenKey(key, sub_key, reserved, access)
+
+
+def test_access_denied():
+    registry = FakeRegistry()
+    registry.key(ROOT + '\\Open', create=True).set_value('Port', '1', REG_SZ)
+    registry.key(ROOT + '\\Secret\\Inner', create=True).set_value('Key', 'x', REG_SZ)
+    registry.key(ROOT + '\\Secret', create=True).set_value('Password', 'x', REG_SZ)
+    registry.key(ROOT, create=True).set_value('Mode', '2', REG_SZ)
+    denied = DeniedRegistry(registry.root, [ROOT + '\\Secret'])
+
+    errors = []
+    entries = walk(denied, on_error=errors.append)
+    assert entries == [
+        (ROOT + '\\Open', 'Port', '1', 'REG_SZ'),
+        (ROOT + '\\Open', 'Default', '', 'REG_SZ'),
+        (ROOT + '\\Secret', 'Default', '', 'REG_SZ'),
+        (ROOT, 'Mode', '2', 'REG_SZ'),
+    ]
+    assert entries == read_recursive(denied, hive_key(denied), ROOT)
+    assert len(errors) == 1 and 'Access is denied' in errors[0]
+    assert denied.open_handles == 0
+
+    # A root that cannot be opened gives no entries
+    errors = []
+    assert walk(DeniedRegistry(registry.root, [ROOT]), on_error=errors.append) == []
+    assert len(errors) == 1
+
+
+class FailingRegistry(FakeRegistry):
+    def __init__(self, root, failing):
+        super().__init__(root)
+        self.failing = failing
+
+    def QueryInfoKey(self, handle):
+        if handle.key is self.failing:
+            raise RuntimeError("registry read failed")
+        return super().QueryInfoKey(handle)
+
+
+def test_unexpected_error_closes_the_keys():
+    registry = FakeRegistry()
+    for index in range(6):
+        registry.key(f"{ROOT}\\Key{index}\\Inner", create=True).set_value('Value', str(index), REG_SZ)
+    failing = FailingRegistry(registry.root, registry.key(ROOT + '\\Key3\\Inner'))
+
+    # An unexpected error ends the walk, with every handle closed
+    with pytest.raises(RuntimeError):
+        walk(failing)
+    assert failing.open_handles == 0
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_parallel_scan_same_as_walk(seed):
+    registry = random_registry(seed)
+    expected = walk(registry)
+    for workers, depth in ((1, 1), (4, 0), (4, 1), (8, 2), (3, 5)):
+        scan = ParallelScan(registry, hive_key(registry), ROOT, workers, depth)
+        assert scan.read() == expected
+        assert registry.open_handles == 0
+
+
+def test_parallel_scan_worker_errors():
+    registry = random_registry(11)
+    paths = sorted({path for path, name, data, reg_type in walk(registry)}, key=len, reverse=True)
+    # Keys below the first level, read by the worker threads
+    denied = [path for path in paths if path.count('\\') > ROOT.count('\\') + 1][:3]
+    assert denied
+    denied_registry = DeniedRegistry(registry.root, denied)
+
+    serial_errors = []
+    expected = walk(denied_registry, on_error=serial_errors.append)
+    errors = []
+    scan = ParallelScan(denied_registry, hive_key(denied_registry), ROOT, 4, 1, on_error=errors.append)
+    assert scan.read() == expected
+    assert sorted(errors) == sorted(serial_errors) and len(errors) == len(denied)
+    assert denied_registry.open_handles == 0
+
+
+def test_parallel_scan_raises_worker_exceptions():
+    registry = FakeRegistry()
+    for index in range(6):
+        registry.key(f"{ROOT}\\Key{index}\\Inner", create=True).set_value('Value', str(index), REG_SZ)
+    failing = FailingRegistry(registry.root, registry.key(ROOT + '\\Key3\\Inner'))
+
+    # Like the serial walk, an unexpected error in a worker thread ends the scan, with every handle closed
+    with pytest.raises(RuntimeError):
+        ParallelScan(failing, hive_key(failing), ROOT, 4, 1).read()
+    assert failing.open_handles == 0
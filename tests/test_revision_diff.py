@@ -0,0 +1,35 @@
+'''three_way_diff matches the pc values like the registry compare does.'''
+
+from revision_diff import GOLDEN_DRIFT, IN_SYNC, MACHINE_DRIFT, three_way_diff
+
+
+def sources(old_revision, new_revision, current):
+    return [row['Source'] for row in three_way_diff(old_revision, new_revision, current)]
+
+
+def test_sources():
+    old = [['Software\\MV', 'Port', '1', 'REG_SZ'], ['Software\\MV', 'Mode', 'a', 'REG_SZ'],
+           ['Software\\MV', 'Gone', '1', 'REG_SZ']]
+    new = [['Software\\MV', 'Port', '2', 'REG_SZ'], ['Software\\MV', 'Mode', 'a', 'REG_SZ'],
+           ['Software\\MV', 'New', '1', 'REG_SZ']]
+    current = [['SOFTWARE\\mv', 'port', '1', 'REG_SZ'], ['Software\\MV', 'Mode', 'b', 'REG_SZ'],
+               ['Software\\MV', 'Gone', '1', 'REG_SZ']]
+    assert sources(old, new, current) == [GOLDEN_DRIFT, MACHINE_DRIFT, GOLDEN_DRIFT, GOLDEN_DRIFT]
+    assert sources(old, new, new) == [IN_SYNC] * 4
+
+
+def test_not_available_data():
+    old = [['Software\\MV', 'Port', '1', 'REG_SZ']]
+    new = [['Software\\MV', 'Port', 'N/A', 'REG_SZ']]
+    assert sources(old, new, [['Software\\MV', 'Port', '7', 'REG_DWORD']]) == [IN_SYNC]
+    assert sources(new, old, [['Software\\MV', 'Port', 'N/A', 'N/A']]) == [IN_SYNC]
+    assert sources(new, old, [['Software\\MV', 'Port', '2', 'REG_SZ']]) == [GOLDEN_DRIFT]
+    assert sources(new, old, []) == [MACHINE_DRIFT]
+
+
+def test_password_only_has_to_exist():
+    old = [['Software\\MV', 'Password', 'old', 'REG_SZ']]
+    new = [['Software\\MV', 'Password', 'new', 'REG_SZ']]
+    assert sources(old, new, [['Software\\MV', 'Password', 'secret', 'REG_SZ']]) == [IN_SYNC]
+    assert sources(old, new, [['Software\\MV', 'Port', '1', 'REG_SZ']]) == [MACHINE_DRIFT]
+    assert sources(old, [], [['Software\\MV', 'Password', 'secret', 'REG_SZ']]) == [GOLDEN_DRIFT]
@@ -0,0 +1,102 @@
+'''Scan profile roots on fake registries: include/exclude pruning, hives, views and threads.'''
+
+import pytest
+
+from fake_registry import REG_SZ, FakeRegistry
+from scan_profiles import (DEFAULT_PROFILE, ScanProfiles, ScanRoot, glob_state, load_scan_profiles,
+                           parse_scan_profiles, split_glob)
+from test_registry_walker import ROOT, random_registry, walk
+
+
+class RecordingRegistry(FakeRegistry):
+    def __init__(self, root=None):
+        super().__init__(root)
+        self.opened = []
+        self.access_flags = set()
+
+    def OpenKey(self, key, sub_key, reserved=0, access=None):
+        self.opened.append(sub_key)
+        self.access_flags.add(access)
+        return super().OpenKey(key, sub_key, reserved, access)
+
+
+def machine_registry():
+    registry = RecordingRegistry()
+    for path in ('Calib1', 'Calib1\\Logs', 'Calib1\\Logs\\Old', 'Cam\\Logs', 'Cam\\Logs\\Old', 'Cam\\Settings',
+                 'Settings', 'Settings\\CACHE', 'Settings\\Cache\\Deep'):
+        registry.set_value(f"{ROOT}\\{path}", 'Value', path, REG_SZ)
+    return registry
+
+
+# Key paths of the entries a root reads, relative to ROOT
+def read_keys(registry, root, threads=1):
+    return sorted({path[len(ROOT) + 1:] for path, name, data, reg_type in root.scan(registry, threads)
+                   if name == 'Value'})
+
+
+def test_glob_state():
+    assert glob_state(split_glob('**\\Logs'), ['cam', 'logs']) == (True, True, True)
+    assert glob_state(split_glob('**\\Logs'), ['cam', 'logs', 'old']) == (False, True, True)
+    assert glob_state(split_glob('Calib?\\**'), ['calib1']) == (True, True, True)
+    assert glob_state(split_glob('Cam\\Settings'), ['cam']) == (False, False, True)
+    assert glob_state(split_glob('Cam\\Settings'), ['calib1']) == (False, False, False)
+
+
+def test_exclude_prunes_the_whole_subtree():
+    registry = machine_registry()
+    root = ScanRoot(ROOT, exclude=['**\\logs', 'SETTINGS\\cache'])
+    assert read_keys(registry, root) == ['Calib1', 'Cam\\Settings', 'Settings']
+    # Excluded keys are never opened
+    assert not any('logs' in path.lower() or 'cache' in path.lower() for path in registry.opened)
+
+
+def test_include_reads_only_the_included_keys():
+    registry = machine_registry()
+    root = ScanRoot(ROOT, include=['cam\\SETTINGS', 'calib*\\**'])
+    assert read_keys(registry, root) == ['Calib1', 'Calib1\\Logs', 'Calib1\\Logs\\Old', 'Cam\\Settings']
+    assert not any(path.lower().startswith((ROOT + '\\settings').lower()) for path in registry.opened)
+
+
+def test_include_beats_exclude():
+    registry = machine_registry()
+    root = ScanRoot(ROOT, include=['Calib*\\**', 'Cam\\Logs', 'Settings'], exclude=['**\\Logs', '**\\Cache'])
+    # Calib1\Logs and Cam\Logs are named by include globs, Cam\Logs\Old and Settings\Cache are only below one
+    assert read_keys(registry, root) == ['Calib1', 'Calib1\\Logs', 'Calib1\\Logs\\Old', 'Cam\\Logs', 'Settings']
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_threads_read_like_the_walk(seed):
+    registry = random_registry(seed)
+    root = ScanRoot(ROOT, exclude=['**\\Cam*'])
+    expected = list(root.scan(registry))
+    assert expected == [entry for entry in walk(registry) if '\\cam' not in entry[0][len(ROOT):].lower()]
+    assert list(root.scan(registry, threads=4, depth=2)) == expected
+    assert list(ScanRoot(ROOT).scan(registry, threads=8)) == walk(registry)
+
+
+def test_hives_and_views():
+    registry = RecordingRegistry()
+    user_root = registry.ConnectRegistry(None, registry.HKEY_CURRENT_USER).key
+    user_root.add_key('Software').add_key('MV Technology').set_value('Mode', '1', REG_SZ)
+
+    root = ScanRoot('Software\\MV Technology', 'HKEY_CURRENT_USER', view=64)
+    assert list(root.scan(registry)) == [('HKEY_CURRENT_USER\\Software\\MV Technology', 'Mode', '1', 'REG_SZ')]
+    assert registry.access_flags == {registry.KEY_READ | registry.KEY_WOW64_64KEY}
+    assert root.name == 'HKEY_CURRENT_USER\\Software\\MV Technology (64-bit)'
+
+
+def test_parse_scan_profiles(tmp_path):
+    profiles = parse_scan_profiles({'MicroAOI': [{'path': 'Software/MV', 'exclude': ['**\\Logs']},
+                                                 {'hive': 'HKEY_CURRENT_USER', 'view': '32', 'path': 'Software'}]})
+    roots = profiles['MicroAOI'].roots
+    assert [(root.hive, root.path, root.view) for root in roots] == [
+        ('HKEY_LOCAL_MACHINE', 'Software\\MV', None), ('HKEY_CURRENT_USER', 'Software', '32')]
+    assert roots[0].exclude == [['**', 'logs']]
+
+    for config in ([], {'SMT': []}, {'SMT': [{'hive': 'HKEY_NOWHERE', 'path': 'x'}]}, {'SMT': [{'view': '16'}]},
+                   {'SMT': [{'path': 'x', 'view': '16'}]}):
+        with pytest.raises(ValueError):
+            parse_scan_profiles(config)
+
+    assert load_scan_profiles(str(tmp_path / "missing.json")).get('MicroAOI') is DEFAULT_PROFILE
+    assert ScanProfiles(profiles).get('SMT') is DEFAULT_PROFILE
@@ -0,0 +1,86 @@
+'''Candidate pairs and match matrix of the software check.'''
+
+import random
+
+import pytest
+
+pytest.importorskip('fuzzywuzzy')
+
+from software_match import (IndexedName, InstalledNameIndex, RequirementMatcher, match_every_pair, match_matrix,
+                            synthetic_inventory, token_set_score)
+from software_rules import DEFAULT_RULES, MatchRule
+
+WORDS = ["Microsoft", "Visual", "C++", "Runtime", "Driver", "NVIDIA", "Graphics", "WinMerge", "Google", "Chrome",
+         "SDK", "x64", "(x86)", "Update", "Tools", "a", "b", "ab", "ba", "abc", "Cognex", "Basler", "pylon",
+         "Redistributable", "-", "++", "7-Zip", "Notepad++", "MV", "Technology", "Éclair", "ß"]
+# Names the matching rules of DEFAULT_RULES apply to
+RULE_NAMES = ["Google Chrome", "Microsoft Visual C++", "WinMerge", "NVIDIA Graphics Driver"]
+
+
+def random_name(generator):
+    words = [generator.choice(WORDS) for _ in range(generator.randint(0, 5))]
+    if generator.random() < 0.3:
+        words.insert(0, generator.choice(RULE_NAMES))
+    if generator.random() < 0.4:
+        words.insert(generator.randint(0, len(words)), ".".join(str(generator.randint(0, 30))
+                                                                for _ in range(generator.randint(1, 3))))
+    name = " ".join(words)
+    if generator.random() < 0.2:
+        name = name.upper()
+    return name
+
+
+def random_version(generator):
+    if generator.random() < 0.2:
+        return 'N/A'
+    return ".".join(str(generator.randint(0, 20)) for _ in range(generator.randint(1, 4)))
+
+
+def random_programs(generator, count):
+    return [{'Name': random_name(generator), 'Version': random_version(generator)} for _ in range(count)]
+
+
+# Rules of software.json with thresholds below match_item's, down to 0
+LOW_THRESHOLD_RULES = DEFAULT_RULES + [
+    MatchRule('driver', 'name_version', r'(\d+(\.\d+)+)', name_threshold=40),
+    MatchRule('tools', 'name_ratio', target='Tools', name_threshold=55, threshold=0),
+    MatchRule('ab', 'name_ratio', target='ab', name_threshold=0, threshold=50),
+]
+
+
+@pytest.mark.parametrize('rules', [DEFAULT_RULES, LOW_THRESHOLD_RULES], ids=['default rules', 'low thresholds'])
+@pytest.mark.parametrize('seed', range(100))
+def test_candidates_hold_every_match(seed, rules):
+    generator = random.Random(seed)
+    installed = random_programs(generator, 80)
+    index = InstalledNameIndex(installed)
+    for required in random_programs(generator, 20):
+        matcher = RequirementMatcher(IndexedName(required['Name']), required['Version'], rules)
+        candidates = index.candidate_positions(matcher)
+        assert candidates == sorted(set(candidates))
+
+        # Every installed program the name similarity or a version rule can match is a candidate
+        reachable = {position for position, name in enumerate(index.names)
+                     if token_set_score(matcher.required.processed, name.processed) >= matcher.threshold
+                     or any(regex.search(name.name) for regex in matcher.version_regexes)}
+        assert reachable <= set(candidates)
+
+        assert [position for position in candidates
+                if matcher.matches(index.names[position], installed[position])] == [
+            position for position, item in enumerate(installed) if matcher.matches(index.names[position], item)]
+
+
+@pytest.mark.parametrize('seed', range(400))
+def test_match_matrix_is_match_item_of_every_pair(seed):
+    generator = random.Random(seed)
+    installed, required = synthetic_inventory(30, 8, seed)
+    # Names of any shape too, and required programs the rules apply to
+    installed += random_programs(generator, 10)
+    required += [{'Name': item['Name'], 'Required Version': item['Version']} for item in random_programs(generator, 4)]
+    assert match_matrix(required, installed) == match_every_pair(required, installed)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_match_matrix_on_workers(seed):
+    installed, required = synthetic_inventory(60, 12, seed)
+    assert match_matrix(required, installed, workers=3, threshold=0) == match_every_pair(required, installed)
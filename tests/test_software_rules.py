@@ -0,0 +1,166 @@
+'''Matching rules of software.json.'''
+
+import json
+import random
+import re
+
+import pytest
+
+pytest.importorskip('fuzzywuzzy')
+
+from fuzzywuzzy import fuzz
+from packaging import version
+
+from software_match import match_item
+from software_rules import DEFAULT_RULES, load_matching_rules, parse_matching_rules
+
+# DEFAULT_RULES as software.json declares them
+DEFAULT_RULES_CONFIG = [
+    {"name_contains": "chrome", "mode": "name_ratio", "target": "Google Chrome", "name_threshold": 80,
+     "threshold": 80},
+    {"name_contains": "microsoft visual c++", "mode": "name_version", "version_regex": r"(\d+(\.\d+)+)",
+     "fallback": "version_ratio"},
+    {"name_contains": "winmerge", "mode": "version_at_least", "version_regex": r"WinMerge (\d+(\.\d+)+)",
+     "display_name": "WinMerge"},
+    {"name_contains": "nvidia graphics driver", "mode": "name_version", "version_regex": r"(\d+(\.\d+)+)"},
+]
+
+
+# match_item as main.py had it, with the special cases hard-coded
+def hard_coded_match_item(required_name, required_version, installed_item):
+    name_similarity = fuzz.token_set_ratio(required_name.lower(), installed_item['Name'].lower())
+
+    if required_version == 'N/A' or installed_item['Version'] == 'N/A':
+        return name_similarity >= 70
+
+    if 'Google Chrome' in required_name.lower() or 'chrome' in required_name.lower():
+        return name_similarity >= 80 and fuzz.ratio('Google Chrome', installed_item['Name']) >= 80
+
+    if 'microsoft visual c++' in required_name.lower():
+        version_match_required = re.search(r'(\d+(\.\d+)+)', required_name, re.IGNORECASE)
+        version_match_installed = re.search(r'(\d+(\.\d+)+)', installed_item['Name'], re.IGNORECASE)
+
+        if version_match_required and version_match_installed:
+            version_similarity = fuzz.ratio(version_match_required.group(0), version_match_installed.group(0))
+            return name_similarity >= 70 and version_similarity >= 70
+
+    if 'winmerge' in required_name.lower():
+        version_match = re.search(r'WinMerge (\d+(\.\d+)+)', installed_item['Name'], re.IGNORECASE)
+        if version_match:
+            if version.parse(version_match.group(1)) >= version.parse(required_version):
+                return True
+
+    # The NVIDIA case compared 'NVIDIA Graphics Driver' with the lowercased name and never applied
+
+    name_similarity_words = fuzz.token_set_ratio(required_name.lower().split(), installed_item['Name'].lower().split())
+    version_similarity = fuzz.ratio(required_version, installed_item['Version'])
+    if 'microsoft visual c++' in required_name.lower():
+        return name_similarity >= 70 and version_similarity >= 70
+    else:
+        return name_similarity >= 70 and name_similarity_words >= 70
+
+
+NAMES = ["Google Chrome", "Chrome Beta", "Microsoft Visual C++ 2015-2022 Redistributable (x64) - 14.38.33130",
+         "Microsoft Visual C++ 2013 Redistributable (x86) - 12.0.40664", "Microsoft Visual C++ Redistributable",
+         "WinMerge 2.16.36.0 x64", "WinMerge", "WinMerge 2.16", "Cognex VisionPro 10.2", "Basler pylon 7.4.0",
+         "MV Technology Inspector 3.1", "Python 3.11.4 (64-bit)", "7-Zip 23.01 (x64)"]
+
+
+def random_version(generator):
+    if generator.random() < 0.15:
+        return 'N/A'
+    return ".".join(str(generator.randint(0, 40)) for _ in range(generator.randint(1, 4)))
+
+
+# A rule as software.json declares it
+def rule_fields(rule):
+    return (rule.name_contains, rule.mode, rule.version_regex and rule.version_regex.pattern, rule.target,
+            rule.name_threshold, rule.threshold, rule.fallback, rule.display_name)
+
+
+def random_program(generator):
+    name = generator.choice(NAMES)
+    if generator.random() < 0.3:
+        name = f"{name} {random_version(generator)}".replace(' N/A', '')
+    if generator.random() < 0.2:
+        name = name.upper()
+    return name, random_version(generator)
+
+
+@pytest.mark.parametrize('config', [
+    {"software_list": []},
+    {"software_list": [], "matching_rules_": []},
+    [],
+])
+def test_default_rules(tmp_path, config):
+    config_file = tmp_path / 'software.json'
+    config_file.write_text(json.dumps(config))
+    assert load_matching_rules(config_file) is DEFAULT_RULES
+
+
+def test_load_matching_rules(tmp_path):
+    assert load_matching_rules(tmp_path / 'software.json') is DEFAULT_RULES
+
+    config_file = tmp_path / 'software.json'
+    config_file.write_text(json.dumps({"software_list": [], "matching_rules": DEFAULT_RULES_CONFIG}))
+    rules = load_matching_rules(config_file)
+    assert [rule_fields(rule) for rule in rules] == [rule_fields(rule) for rule in DEFAULT_RULES]
+
+    config_file.write_text(json.dumps({"software_list": [], "matching_rules": []}))
+    assert load_matching_rules(config_file) == []
+
+
+def test_parse_defaults():
+    rule, = parse_matching_rules([{"name_contains": "Pylon", "mode": "name_ratio", "target": "Basler pylon"}])
+    assert (rule.name_contains, rule.name_threshold, rule.threshold, rule.fallback, rule.display_name) == \
+        ('pylon', 70, 70, 'words', None)
+    assert rule.applies('basler pylon 7')
+
+
+@pytest.mark.parametrize('config', [
+    {"name_contains": "chrome", "mode": "name_ratio", "target": "Google Chrome", "name_treshold": 80},
+    {"name_contains": "chrome", "mode": "name_ratio", "target": "Google Chrome", "Threshold": 80},
+    {"name_contains": "chrome", "mode": "name_ratio", "target": "Google Chrome", "comment": "browser"},
+    {"mode": "name_ratio", "target": "Google Chrome"},
+    {"name_contains": "chrome", "mode": "name_similarity", "target": "Google Chrome"},
+    {"name_contains": "chrome", "mode": "name_ratio"},
+    {"name_contains": "winmerge", "mode": "version_at_least"},
+    {"name_contains": "winmerge", "mode": "version_at_least", "version_regex": "WinMerge ("},
+    {"name_contains": "chrome", "mode": "name_ratio", "target": "Google Chrome", "threshold": 101},
+    {"name_contains": "chrome", "mode": "name_ratio", "target": "Google Chrome", "threshold": "80"},
+    {"name_contains": "chrome", "mode": "name_ratio", "target": "Google Chrome", "threshold": True},
+    {"name_contains": "chrome", "mode": "name_ratio", "target": "Google Chrome", "fallback": "ratio"},
+    {"name_contains": 5, "mode": "name_ratio", "target": "Google Chrome"},
+    "chrome",
+    ["chrome", "name_ratio"],
+])
+def test_unexpected_rules(config):
+    with pytest.raises(ValueError):
+        parse_matching_rules([config])
+
+
+def test_rules_must_be_a_list():
+    with pytest.raises(ValueError):
+        parse_matching_rules(DEFAULT_RULES_CONFIG[0])
+
+
+# The rules of software.json match like the special cases main.py had hard-coded, but for the NVIDIA
+# case, which never applied there
+@pytest.mark.parametrize('declared', [False, True], ids=['default rules', 'software.json rules'])
+@pytest.mark.parametrize('seed', range(50))
+def test_same_matches_as_hard_coded(seed, declared):
+    generator = random.Random(seed)
+    rules = parse_matching_rules(DEFAULT_RULES_CONFIG) if declared else DEFAULT_RULES
+    installed = [dict(zip(('Name', 'Version'), random_program(generator))) for _ in range(30)]
+    for _ in range(10):
+        required_name, required_version = random_program(generator)
+        for installed_item in installed:
+            assert match_item(required_name, required_version, installed_item, rules) == \
+                hard_coded_match_item(required_name, required_version, installed_item)
+
+
+def test_nvidia_rule_applies():
+    installed_item = {'Name': 'NVIDIA Graphics Driver 537.42', 'Version': '31.0.15.3742'}
+    assert match_item('NVIDIA Graphics Driver 537.42', '31.0.15.3742', installed_item)
+    assert not match_item('NVIDIA Graphics Driver 411.70', '31.0.15.3742', installed_item)
+    assert hard_coded_match_item('NVIDIA Graphics Driver 411.70', '31.0.15.3742', installed_item)
@@ -0,0 +1,41 @@
+'''Version ordering of the software check.'''
+
+import pytest
+
+from version_keys import version_at_least, version_key
+
+
+@pytest.mark.parametrize('installed, required', [
+    ('14.29.30133 (x64)', '14.29.30133'),
+    ('5.1 SP3', '5.1'),
+    ('1.0.0.0-release', '1.0'),
+    ('14.29.30133', '14.29.30133 (x64)'),
+    ('10.0', '9.1'),
+    ('10', '10.0'),
+    ('2.17.0', '2.17rc1'),
+    ('2.17.post1', '2.17'),
+    ('Build 14.30 (x64)', '14.29.30133'),
+    ('1!1.0', '2.0'),
+    ('1.0', 'N/A'),
+])
+def test_at_least(installed, required):
+    assert version_at_least(installed, required)
+
+
+@pytest.mark.parametrize('installed, required', [
+    ('9.1', '10.0'),
+    ('2.17rc1', '2.17'),
+    ('2.17', '2.17.post1'),
+    ('5.0 SP3', '5.1'),
+    ('14.29.30133 (x64)', '14.30'),
+    ('N/A', '1.0'),
+])
+def test_below(installed, required):
+    assert not version_at_least(installed, required)
+
+
+def test_sort_order():
+    versions = ['2.17.post1', '5.1 SP3', 'N/A', '2.17rc1', '10.0', '2.17', '9.1', '2.17.dev1']
+    assert sorted(versions, key=version_key) == ['N/A', '2.17.dev1', '2.17rc1', '2.17', '2.17.post1', '5.1 SP3',
+                                                 '9.1', '10.0']
+    assert version_key('5.1 SP3') == version_key('5.1')
@@ -0,0 +1,74 @@
+'''Sort keys of program version strings.
+
+Installed and required versions are compared as version numbers, not as
+strings ("10.0" is above "9.1", "10" equals "10.0"). A version string is read
+as
+
+    (epoch, release, parsed)
+
+    release  the release numbers without trailing zeros: those of the Version
+             when packaging.version reads the string (PEP 440), else the
+             first run of dotted numbers in it, like in "Build 14.29.30133
+             (x64)". A string without numbers, like 'N/A', has no release and
+             sorts first.
+    parsed   the packaging Version, None for any other string
+
+Versions compare by epoch and release first. Only when both strings are PEP 440
+versions do their pre-, post- and dev-releases decide a tie; a vendor suffix
+like "(x64)", "SP3" or "-release" counts as the release itself, so "5.1 SP3" is
+at least "5.1". version_key orders such a string like the final release.
+
+Versions are memoized: a version string is parsed once per process, not once
+per comparison.
+'''
+
+import re
+from functools import lru_cache
+
+from packaging import version
+
+VERSION_NUMBER = re.compile(r'(\d+(\.\d+)*)')
+# Distinct version strings kept parsed
+VERSION_CACHE_SIZE = 16384
+
+
+def trim_zeros(numbers):
+    numbers = list(numbers)
+    while numbers and numbers[-1] == 0:
+        numbers.pop()
+    return tuple(numbers)
+
+
+@lru_cache(maxsize=VERSION_CACHE_SIZE)
+def parse_version(version_str):
+    version_str = str(version_str)
+    try:
+        parsed = version.Version(version_str)
+    except version.InvalidVersion:
+        pass
+    else:
+        return parsed.epoch, trim_zeros(parsed.release), parsed
+
+    version_match = VERSION_NUMBER.search(version_str)
+    numbers = map(int, version_match.group(1).split('.')) if version_match else ()
+    return 0, trim_zeros(numbers), None
+
+
+@lru_cache(maxsize=VERSION_CACHE_SIZE)
+def version_key(version_str):
+    epoch, release, parsed = parse_version(version_str)
+    if parsed is None:
+        # Sorts with the final release of its numbers
+        parsed = version.Version('.'.join(map(str, release)) or '0')
+    return epoch, release, parsed
+
+
+# True when an installed version is at least the required one
+def version_at_least(installed_version, required_version):
+    installed_epoch, installed_release, installed_parsed = parse_version(installed_version)
+    required_epoch, required_release, required_parsed = parse_version(required_version)
+    if (installed_epoch, installed_release) != (required_epoch, required_release):
+        return (installed_epoch, installed_release) > (required_epoch, required_release)
+    if installed_parsed is None or required_parsed is None:
+        return True
+    return installed_parsed >= required_parsed